@@ -1,10 +1,23 @@
 from .resource_monitor import get_system_resources
 
-from typing import Tuple
+import os
+import statistics
+import threading
+import time
+from typing import List, Optional, Tuple
 
 class AdaptiveController:
     """
     Dynamically adjusts processing parameters based on system resource usage.
+
+    The first call to adjust_parameters picks starting values from the current
+    resource usage. With feedback enabled, the controller then closes the loop
+    on measured throughput: callers report each completed request via observe,
+    and every window seconds the concurrency (batch size) is hill-climbed
+    towards the best tokens/s, while the chunk size is steered towards the
+    target request latency (unless steer_chunk_size is off, for callers that
+    size chunks themselves). Changes smaller than the hysteresis band are
+    ignored, so the operating point settles instead of oscillating.
     """
 
     def __init__(
@@ -17,6 +30,11 @@ class AdaptiveController:
         max_chunk_size: int = 512,
         max_processes: int = 16,
         max_batch_size: int = 64,
+        feedback: bool = True,
+        window: float = 10.0,
+        hysteresis: float = 0.05,
+        target_latency: float = 30.0,
+        steer_chunk_size: bool = True,
     ) -> None:
         """
         Initializes the AdaptiveController.
@@ -30,6 +48,12 @@ class AdaptiveController:
             max_chunk_size: The maximum chunk size.
             max_processes: The maximum number of processes.
             max_batch_size: The maximum batch size.
+            feedback: Whether to tune parameters from observed throughput.
+            window: The measurement window in seconds between adjustments.
+            hysteresis: The relative throughput change treated as noise.
+            target_latency: The per-request latency in seconds the chunk size
+                            is steered towards.
+            steer_chunk_size: Whether feedback adjusts the chunk size.
         """
         self.min_ram = min_ram
         self.max_cpu = max_cpu
@@ -39,6 +63,29 @@ class AdaptiveController:
         self.max_chunk_size = max_chunk_size
         self.max_processes = max_processes
         self.max_batch_size = max_batch_size
+        self.feedback = feedback
+        self.window = window
+        self.hysteresis = hysteresis
+        self.target_latency = target_latency
+        self.steer_chunk_size = steer_chunk_size
+
+        self.chunk_size: Optional[int] = None
+        self.process_count: Optional[int] = None
+        self.batch_size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._reset_window()
+        self._last_throughput: Optional[float] = None
+        self._direction = 1
+        self._stable_windows = 0
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def adjust_parameters(self) -> Tuple[int, int, int]:
         """
@@ -51,6 +98,14 @@ class AdaptiveController:
         ram_ok = resources["ram_percent"] < (100 - self.min_ram)
         cpu_ok = resources["cpu_percent"] < self.max_cpu
 
+        if self.feedback and self.chunk_size is not None:
+            # Feedback owns the parameters; only back off under RAM pressure
+            if not ram_ok:
+                with self._lock:
+                    self.chunk_size = max(self.chunk_size // 2, 8)
+                    self.batch_size = max(1, self.batch_size // 2)
+            return self.chunk_size, self.process_count, self.batch_size
+
         if ram_ok:
             chunk_size = min(self.base_chunk_size * 2, self.max_chunk_size)
         else:
@@ -66,4 +121,109 @@ class AdaptiveController:
         else:
             batch_size = max(1, self.base_batch_size // 2)
 
-        return chunk_size, process_count, batch_size
\ No newline at end of file
+        self.chunk_size, self.process_count, self.batch_size = (
+            chunk_size, process_count, batch_size
+        )
+        return chunk_size, process_count, batch_size
+
+    def target_workers(self, current: int, pending: int) -> int:
+        """
+        Returns the worker count to scale a pool to, given measured contention.
+
+        Shrinks by one when CPU usage is above max_cpu or the load average
+        exceeds 1.5x the core count. Grows by one when CPU usage is below 75% of
+        max_cpu and there are more tasks waiting than workers. Never exceeds
+        max_processes or the number of waiting tasks (but keeps one worker).
+
+        Args:
+            current: The current number of workers.
+            pending: The number of tasks not yet started.
+        """
+        resources = get_system_resources()
+        cores = os.cpu_count() or 1
+        target = current
+        if (
+            resources["cpu_percent"] > self.max_cpu
+            or resources.get("load_avg", 0.0) > 1.5 * cores
+        ):
+            target = current - 1
+        elif resources["cpu_percent"] < 0.75 * self.max_cpu and pending > current:
+            target = current + 1
+        return max(1, min(target, self.max_processes, max(pending, 1)))
+
+    def concurrency(self) -> int:
+        """Returns the current number of requests to keep in flight."""
+        return self.batch_size or self.base_batch_size
+
+    def _reset_window(self) -> None:
+        self._window_start = time.monotonic()
+        self._tokens = 0.0
+        self._latencies: List[float] = []
+        self._depths: List[int] = []
+
+    def observe(self, tokens: float, latency: float, queue_depth: int) -> Optional[str]:
+        """
+        Records one completed request and adjusts parameters once per window.
+
+        Args:
+            tokens: The (estimated) tokens processed by the request.
+            latency: The request's wall-clock time in seconds.
+            queue_depth: The number of requests in flight when it completed.
+
+        Returns:
+            A description of the decision if the window closed, else None.
+        """
+        if not self.feedback or self.batch_size is None:
+            return None
+        with self._lock:
+            self._tokens += tokens
+            self._latencies.append(latency)
+            self._depths.append(queue_depth)
+            elapsed = time.monotonic() - self._window_start
+            if elapsed < self.window or len(self._latencies) < 2:
+                return None
+            throughput = self._tokens / elapsed
+            latency = statistics.median(self._latencies)
+            depth = statistics.mean(self._depths)
+            self._reset_window()
+            return self._step(throughput, latency, depth)
+
+    def _step(self, throughput: float, latency: float, depth: float) -> str:
+        """Hill-climbs concurrency on throughput and steers chunk size on latency."""
+        prev = self._last_throughput
+        self._last_throughput = throughput
+        move = self._direction
+        if prev:
+            change = (throughput - prev) / prev
+            if change < -self.hysteresis:
+                # The last move hurt: go back the other way
+                self._direction = -self._direction
+                move = self._direction
+                self._stable_windows = 0
+            elif change <= self.hysteresis:
+                # Within noise: hold, but probe upwards again after a while
+                self._stable_windows += 1
+                move = 0
+                if self._stable_windows >= 6:
+                    move = self._direction = 1
+                    self._stable_windows = 0
+            else:
+                self._stable_windows = 0
+        # More concurrency cannot help if the requests in flight did not fill it
+        if move > 0 and depth < 0.5 * self.batch_size:
+            move = 0
+
+        step = max(1, self.batch_size // 4)
+        self.batch_size = min(self.max_batch_size, max(1, self.batch_size + move * step))
+
+        decision = (
+            f"Controller: {throughput:.1f} tok/s, median latency {latency:.2f}s, "
+            f"depth {depth:.1f} -> concurrency {self.batch_size}"
+        )
+        if not self.steer_chunk_size:
+            return decision
+        if latency > self.target_latency * (1 + self.hysteresis):
+            self.chunk_size = max(8, int(self.chunk_size * 0.75))
+        elif latency < self.target_latency * 0.5:
+            self.chunk_size = min(self.max_chunk_size, int(self.chunk_size * 1.25) + 1)
+        return f"{decision}, chunk size {self.chunk_size}"
@@ -1,3 +1,5 @@
+import atexit
+import os
 import threading
 import queue
 import time
@@ -20,11 +22,33 @@ class AsyncLogger:
             while not self.stop_signal or not self.log_queue.empty():
                 try:
                     msg = self.log_queue.get(timeout=0.5)
-                    f.write(msg + "\n")
-                    f.flush()
                 except queue.Empty:
                     continue
+                f.write(msg + "\n")
+                f.flush()
+                self.log_queue.task_done()
+
+    def flush(self):
+        """Blocks until every queued message has been written."""
+        self.log_queue.join()
 
     def shutdown(self):
         self.stop_signal = True
-        self.thread.join()
\ No newline at end of file
+        self.thread.join()
+
+_logger = None
+_logger_pid = None
+_logger_lock = threading.Lock()
+
+def get_logger():
+    """
+    Returns this process's shared logger, for modules that log outside a
+    Harness. A forked worker gets a new one, since the writer thread does
+    not survive the fork; it is flushed when the interpreter exits.
+    """
+    global _logger, _logger_pid
+    with _logger_lock:
+        if _logger_pid != os.getpid():
+            _logger, _logger_pid = AsyncLogger(), os.getpid()
+            atexit.register(_logger.flush)
+        return _logger
@@ -0,0 +1,833 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import stat
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+from .async_logger import get_logger
+from .dispatcher import ordered_map
+from .http_client import TIMEOUT, get_session
+from .load_balancer import NoEndpointAvailable, get_balancer
+
+class LLMError(Exception):
+    """
+    A completion could not be produced.
+
+    Attributes:
+        retryable: True for transient failures (connection errors, timeouts,
+                   429 and 5xx responses, open circuits) that may succeed
+                   when retried.
+        retry_after: The minimum seconds to wait before retrying, when the
+                     server (Retry-After) or the load balancer knows it.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    def __reduce__(self) -> Any:
+        return (self.__class__, (str(self), self.retryable, self.retry_after))
+
+def _request_error(e: Exception, service: str) -> LLMError:
+    """Wraps a requests exception, deciding whether it is worth retrying."""
+    response = getattr(e, "response", None)
+    status = response.status_code if response is not None else None
+    retryable = status is None or status == 429 or status >= 500
+    retry_after = 0.0
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("Retry-After", 0))
+        except ValueError:  # an HTTP date; the backoff has to do
+            pass
+    return LLMError(f"Error communicating with {service}: {e}", retryable, retry_after)
+
+def _is_server_fault(e: Exception) -> bool:
+    """False for client errors (4xx other than 429), which say nothing about
+    the endpoint's health."""
+    response = getattr(e, "response", None)
+    if response is None:
+        return True
+    return response.status_code == 429 or response.status_code >= 500
+
+class Usage:
+    """
+    Token counts and model timings of one completion, as far as the backend
+    reports them; values it does not report stay None.
+
+    Attributes:
+        prompt_tokens: Tokens in the prompt.
+        completion_tokens: Tokens generated.
+        prompt_eval_ms: Milliseconds the model spent evaluating the prompt
+                        (only the part not already in its cache).
+        eval_ms: Milliseconds the model spent generating.
+    """
+
+    def __init__(self) -> None:
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.prompt_eval_ms: Optional[float] = None
+        self.eval_ms: Optional[float] = None
+
+    def update(self, data: Dict[str, Any]) -> None:
+        """Reads the usage fields a response carries: llama.cpp's
+        "tokens_evaluated"/"tokens_predicted" and "timings", OpenAI-style
+        "usage" (also returned by llama-cpp-python), and Ollama's
+        "prompt_eval_count"/"eval_count" and durations in nanoseconds."""
+        usage = data.get("usage")
+        if isinstance(usage, dict):
+            self.prompt_tokens = usage.get("prompt_tokens", self.prompt_tokens)
+            self.completion_tokens = usage.get("completion_tokens", self.completion_tokens)
+        self.prompt_tokens = data.get("tokens_evaluated", self.prompt_tokens)
+        self.completion_tokens = data.get("tokens_predicted", self.completion_tokens)
+        timings = data.get("timings")
+        if isinstance(timings, dict):
+            self.prompt_eval_ms = timings.get("prompt_ms", self.prompt_eval_ms)
+            self.eval_ms = timings.get("predicted_ms", self.eval_ms)
+            if self.completion_tokens is None:
+                self.completion_tokens = timings.get("predicted_n")
+        if "prompt_eval_count" in data or "eval_count" in data:
+            self.prompt_tokens = data.get("prompt_eval_count", self.prompt_tokens)
+            self.completion_tokens = data.get("eval_count", self.completion_tokens)
+            if "prompt_eval_duration" in data:
+                self.prompt_eval_ms = data["prompt_eval_duration"] / 1e6
+            if "eval_duration" in data:
+                self.eval_ms = data["eval_duration"] / 1e6
+
+class LLMBackend:
+    """
+    Interface shared by all inference backends.
+
+    Subclasses implement generate(); generate_batch() and stream() have
+    generic fallbacks that backends override when they can do better. All of
+    them raise LLMError when no completion can be produced; retrying is left
+    to the caller (see retry). Given a Usage, they fill in the token counts
+    and timings the backend reports.
+
+    Attributes:
+        name: Backend name, as accepted by unified_llm_wrapper.get_backend.
+        model: Model identifier; part of the response cache key.
+        n_ctx: Context size; part of the response cache key.
+        max_concurrency: Requests generate_batch keeps in flight.
+    """
+
+    name = ""
+    model = ""
+    n_ctx = 0
+    max_concurrency = 1
+
+    def generate(self, prompt: str, usage: Optional[Usage] = None) -> str:
+        """Returns the completion for one prompt."""
+        raise NotImplementedError
+
+    def generate_batch(
+        self, prompts: List[str], usages: Optional[List[Usage]] = None
+    ) -> List[str]:
+        """Returns one completion per prompt, in order. usages, if given, has
+        one Usage per prompt."""
+        return _map_generate(self.generate, prompts, usages, self.max_concurrency)
+
+    def stream(self, prompt: str, usage: Optional[Usage] = None) -> Iterator[str]:
+        """Yields the completion piece by piece. Closing the generator abandons
+        the rest of it."""
+        yield self.generate(prompt, usage)
+
+    async def agenerate(self, prompt: str) -> str:
+        """Awaitable generate(), run in the event loop's default executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.generate, prompt)
+
+    async def agenerate_batch(self, prompts: List[str]) -> List[str]:
+        """Awaitable generate_batch(), run in the event loop's default executor."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.generate_batch, prompts
+        )
+
+    def cache_params(self) -> Dict[str, Any]:
+        """Generation parameters that, besides model and n_ctx, identify a
+        response in the response cache."""
+        return {"mode": self.name}
+
+def _map_generate(
+    generate: Callable[[str, Optional[Usage]], str],
+    prompts: List[str],
+    usages: Optional[List[Usage]],
+    max_in_flight: int,
+) -> List[str]:
+    """Runs generate on every prompt, max_in_flight at a time, in order."""
+    pairs = zip(prompts, usages if usages is not None else [None] * len(prompts))
+    return list(ordered_map(lambda p: generate(*p), pairs, max_in_flight))
+
+def _parse_batch_response(data: Any, expected: int) -> Optional[List[str]]:
+    """Extracts one response per prompt from a batched server reply.
+
+    Accepts {"responses": [...]}, {"response": [...]} or a list of result
+    objects carrying "response" or "content" (llama.cpp's /completion).
+    Returns None if the reply does not hold exactly one result per prompt.
+    """
+    if isinstance(data, dict):
+        data = data.get("responses", data.get("response"))
+    if not isinstance(data, list) or len(data) != expected:
+        return None
+    responses = []
+    for item in data:
+        if isinstance(item, dict):
+            item = item.get("response", item.get("content"))
+        if not isinstance(item, str):
+            return None
+        responses.append(item)
+    return responses
+
+def _sse_text(event: Dict[str, Any]) -> str:
+    """Extracts the new text from one streamed event.
+
+    Understands llama.cpp's /completion ("content"), OpenAI-style
+    completions ("choices[0].text" or "choices[0].delta.content") and this
+    harness's own {"response": ...} shape.
+    """
+    if "content" in event:
+        return event["content"] or ""
+    choices = event.get("choices")
+    if choices:
+        choice = choices[0]
+        if "text" in choice:
+            return choice["text"] or ""
+        return (choice.get("delta") or {}).get("content") or ""
+    return event.get("response") or ""
+
+class ServerBackend(LLMBackend):
+    """
+    HTTP inference server taking {"prompt", "model", "n_threads", "n_ctx"}
+    and answering {"response": ...}, such as a llama.cpp server behind the
+    harness's /generate endpoint. max_tokens and stop are sent as llama.cpp's
+    "n_predict" and "stop". Settings left as None (or no stop strings) are
+    not sent.
+
+    url may list several servers running the same model; requests are then
+    spread over them by the process's LoadBalancer (see load_balancer). A
+    single server still goes through one, as its circuit breaker.
+
+    With batch=True, generate_batch sends all prompts in one request with
+    "prompt" set to the list. If the server rejects that or answers with an
+    unexpected shape, batching is turned off for this backend and the
+    prompts are sent as concurrent single requests.
+    """
+
+    name = "server"
+
+    def __init__(
+        self,
+        url: Union[str, Sequence[str]],
+        model: Optional[str],
+        n_threads: Optional[int],
+        n_ctx: Optional[int],
+        batch: bool = False,
+        max_tokens: Optional[int] = 512,
+        stop: Sequence[str] = ("</s>",),
+    ) -> None:
+        self.urls = [url] if isinstance(url, str) else list(url)
+        self.url = self.urls[0]
+        self.model = model
+        self.n_ctx = n_ctx
+        self.batch = batch
+        self.max_tokens = max_tokens
+        self.stop = list(stop)
+        # Prompt-independent part of every request
+        self._payload: Dict[str, Any] = {
+            k: v for k, v in (
+                ("model", model), ("n_threads", n_threads), ("n_ctx", n_ctx),
+                ("n_predict", max_tokens),
+            )
+            if v is not None
+        }
+        if self.stop:
+            self._payload["stop"] = self.stop
+
+    def cache_params(self) -> Dict[str, Any]:
+        return {"mode": self.name, "max_tokens": self.max_tokens, "stop": self.stop}
+
+    @contextmanager
+    def _route(self) -> Iterator[str]:
+        """Yields the URL for one request and reports how it went to the load
+        balancer, which also acts as each endpoint's circuit breaker. Closing
+        a stream early or a client error does not count as a failure."""
+        balancer = get_balancer(self.urls)
+        try:
+            endpoint = balancer.acquire()
+        except NoEndpointAvailable as e:
+            raise LLMError(str(e), retryable=True, retry_after=e.retry_after) from e
+        start = time.monotonic()
+        ok = True
+        try:
+            yield endpoint.url
+        except Exception as e:
+            ok = not _is_server_fault(e)
+            raise
+        finally:
+            balancer.release(endpoint, time.monotonic() - start, ok)
+
+    def generate(self, prompt: str, usage: Optional[Usage] = None) -> str:
+        if not requests:
+            raise ImportError("requests library is required for server mode")
+        try:
+            with self._route() as url:
+                response = get_session().post(
+                    url, json=dict(self._payload, prompt=prompt), timeout=TIMEOUT
+                )
+                response.raise_for_status()
+            data = response.json()
+            if usage is not None:
+                usage.update(data)
+            return data.get("response", "")
+        except requests.exceptions.RequestException as e:
+            raise _request_error(e, "LLM server") from e
+        except ValueError as e:
+            raise LLMError(f"Invalid response from LLM server: {e}") from e
+
+    def generate_batch(
+        self, prompts: List[str], usages: Optional[List[Usage]] = None
+    ) -> List[str]:
+        if not requests:
+            raise ImportError("requests library is required for server mode")
+        if not prompts:
+            return []
+        if self.batch:
+            payload = dict(self._payload, prompt=list(prompts))
+            try:
+                with self._route() as url:
+                    response = get_session().post(url, json=payload, timeout=TIMEOUT)
+                    if response.status_code == 429 or response.status_code >= 500:
+                        response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise _request_error(e, "LLM server") from e
+            if 400 <= response.status_code < 500:
+                get_logger().log(
+                    f"LLM server rejected batched request ({response.status_code}); "
+                    "falling back to single requests"
+                )
+                self.batch = False
+            else:
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = None
+                responses = _parse_batch_response(data, len(prompts))
+                if responses is not None:
+                    if usages is not None and isinstance(data, list):
+                        for usage, item in zip(usages, data):
+                            usage.update(item)
+                    return responses
+                get_logger().log(
+                    "LLM server does not return batched responses; "
+                    "falling back to single requests"
+                )
+                self.batch = False
+        return _map_generate(self.generate, prompts, usages, len(prompts))
+
+    def stream(self, prompt: str, usage: Optional[Usage] = None) -> Iterator[str]:
+        """Sends "stream": true and reads server-sent events (llama.cpp server
+        and OpenAI-compatible servers). A server that ignores "stream" and
+        replies with plain JSON yields its whole response as a single piece."""
+        if not requests:
+            raise ImportError("requests library is required for server mode")
+        payload = dict(self._payload, prompt=prompt, stream=True)
+        try:
+            with self._route() as url, get_session().post(
+                url, json=payload, timeout=TIMEOUT, stream=True
+            ) as response:
+                response.raise_for_status()
+                if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                    data = response.json()
+                    if usage is not None:
+                        usage.update(data)
+                    yield data.get("response", "")
+                    return
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    event = json.loads(data)
+                    if usage is not None:
+                        usage.update(event)
+                    text = _sse_text(event)
+                    if text:
+                        yield text
+                    if event.get("stop"):
+                        return
+        except requests.exceptions.RequestException as e:
+            raise _request_error(e, "LLM server") from e
+        except ValueError as e:
+            raise LLMError(f"Invalid response from LLM server: {e}") from e
+
+# Loaded llama.cpp models by path, shared by all LocalBackend instances
+_llm_cache: Dict[str, Any] = {}
+# (model path, prefix) -> llama.cpp state after evaluating the prefix
+_prefix_states: Dict[Tuple[Any, str], Any] = {}
+
+# llama.cpp models are not thread-safe; serializes loading and inference
+_llm_lock = threading.Lock()
+
+# Prefix state files: magic, little-endian header length, JSON header, buffers
+_PREFIX_STATE_MAGIC = b"LLMPREFIX1\n"
+
+def _prefix_state_path(llm: Any, prefix: str, cache_dir: str) -> str:
+    """Returns the on-disk location of a model's saved prefix state."""
+    ident = f"{getattr(llm, 'model_path', '')}\0{llm.n_ctx()}\0{prefix}"
+    name = hashlib.sha256(ident.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{name}.prefix.state")
+
+def _prefix_state_header(llm: Any, prefix: str) -> Dict[str, Any]:
+    """Returns what a saved prefix state must have been computed for."""
+    return {
+        "model": getattr(llm, "model_path", ""),
+        "n_ctx": llm.n_ctx(),
+        "prefix": hashlib.sha256(prefix.encode("utf-8")).hexdigest(),
+    }
+
+def _write_prefix_state(path: str, state: Any, header: Dict[str, Any]) -> None:
+    """Saves a llama.cpp LlamaState as a JSON header followed by its raw
+    buffers, readable only by the current user.
+
+    Raises:
+        ValueError: If the state has a field that is not an int, bytes or a
+                    numeric array.
+    """
+    fields, buffers = [], []
+    for name, value in vars(state).items():
+        if isinstance(value, int):
+            fields.append({"name": name, "int": value})
+        elif isinstance(value, (bytes, bytearray)):
+            fields.append({"name": name, "bytes": len(value)})
+            buffers.append(bytes(value))
+        elif hasattr(value, "dtype") and not value.dtype.hasobject:
+            data = value.tobytes()
+            fields.append({
+                "name": name, "array": len(data),
+                "dtype": value.dtype.str, "shape": list(value.shape),
+            })
+            buffers.append(data)
+        else:
+            raise ValueError(f"cannot save {type(value).__name__} field {name}")
+    meta = json.dumps(dict(header, fields=fields)).encode("utf-8")
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(_PREFIX_STATE_MAGIC)
+        f.write(struct.pack("<I", len(meta)))
+        f.write(meta)
+        for data in buffers:
+            f.write(data)
+    os.replace(tmp, path)
+
+def _read_exact(f: Any, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated file")
+    return data
+
+def _read_prefix_state(path: str, header: Dict[str, Any]) -> Any:
+    """Loads a state saved by _write_prefix_state.
+
+    Returns:
+        The LlamaState, or None if there is no file or it was saved for
+        another model, context size or prefix.
+
+    Raises:
+        ValueError: If the file is not owned by the current user, is writable
+                    by others or is malformed.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        st = os.fstat(f.fileno())
+        if hasattr(os, "getuid") and st.st_uid != os.getuid():
+            raise ValueError("not owned by the current user")
+        if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise ValueError("writable by group or others")
+        if f.read(len(_PREFIX_STATE_MAGIC)) != _PREFIX_STATE_MAGIC:
+            raise ValueError("not a prefix state file")
+        (size,) = struct.unpack("<I", _read_exact(f, 4))
+        meta = json.loads(_read_exact(f, size))
+        if any(meta.get(k) != v for k, v in header.items()):
+            return None
+        fields: Dict[str, Any] = {}
+        for field in meta["fields"]:
+            if "int" in field:
+                fields[field["name"]] = field["int"]
+            elif "bytes" in field:
+                fields[field["name"]] = _read_exact(f, field["bytes"])
+            else:
+                import numpy
+
+                data = _read_exact(f, field["array"])
+                array = numpy.frombuffer(data, dtype=field["dtype"])
+                fields[field["name"]] = array.reshape(field["shape"]).copy()
+    from llama_cpp import LlamaState
+
+    return LlamaState(**fields)
+
+def _load_prefix_state(llm: Any, prefix: str, cache_dir: str) -> Any:
+    """Returns the model's state after evaluating prefix, computing it once.
+
+    The state is kept per model and, if cache_dir is set, saved there so
+    later runs skip the evaluation too. Must be called with _llm_lock held.
+    """
+    key = (getattr(llm, "model_path", id(llm)), prefix)
+    state = _prefix_states.get(key)
+    if state is not None:
+        return state
+    path = _prefix_state_path(llm, prefix, cache_dir) if cache_dir else None
+    header = _prefix_state_header(llm, prefix)
+    if path:
+        try:
+            state = _read_prefix_state(path, header)
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            get_logger().log(f"Ignoring prefix state {path}: {e}")
+    if state is None:
+        llm.reset()
+        llm.eval(llm.tokenize(prefix.encode("utf-8")))
+        state = llm.save_state()
+        if path:
+            try:
+                _write_prefix_state(path, state, header)
+            except (OSError, ValueError) as e:
+                get_logger().log(f"Could not save prefix state {path}: {e}")
+    _prefix_states[key] = state
+    return state
+
+def _llama_timings(llm: Any) -> Optional[Tuple[float, float, int]]:
+    """Returns llama.cpp's cumulative (prompt eval ms, eval ms, prompt tokens
+    evaluated) for a model's context, the figures behind its perf printout,
+    or None if this llama-cpp-python version does not expose them."""
+    try:
+        import llama_cpp
+
+        ctx = llm.ctx
+        if hasattr(llama_cpp, "llama_perf_context"):
+            t = llama_cpp.llama_perf_context(ctx)
+        else:
+            t = llama_cpp.llama_get_timings(ctx)
+        return t.t_p_eval_ms, t.t_eval_ms, t.n_p_eval
+    except Exception:
+        return None
+
+def _timings_delta(
+    usage: Usage,
+    before: Optional[Tuple[float, float, int]],
+    after: Optional[Tuple[float, float, int]],
+) -> None:
+    """Sets usage's timings from two _llama_timings snapshots."""
+    if before is None or after is None:
+        return
+    usage.prompt_eval_ms = after[0] - before[0]
+    usage.eval_ms = after[1] - before[1]
+
+class LocalBackend(LLMBackend):
+    """
+    llama-cpp-python model loaded in this process, or, with shared=True, the
+    model owned by the shared inference process (see local_model_server).
+
+    The model is loaded on first use and kept for the life of the process.
+    If prefix is set, prompts starting with it reuse the llama.cpp state saved
+    after evaluating it once, so only the rest of the prompt pays prompt-eval
+    cost; with prefix_cache_dir that state also persists between runs.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_path: str,
+        n_threads: int,
+        n_ctx: int,
+        max_tokens: int = 512,
+        stop: Sequence[str] = ("</s>",),
+        shared: bool = False,
+        prefix: str = "",
+        prefix_cache_dir: str = "",
+    ) -> None:
+        self.model = model_path
+        self.n_threads = n_threads
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.stop = list(stop)
+        self.shared = shared
+        self.prefix = prefix
+        self.prefix_cache_dir = prefix_cache_dir
+
+    def cache_params(self) -> Dict[str, Any]:
+        return {"mode": self.name, "max_tokens": self.max_tokens, "stop": self.stop}
+
+    def _get_model(self) -> Any:
+        """Returns the loaded model, loading it on first use.
+
+        Must be called with _llm_lock held. Raises LLMError if loading fails.
+        """
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            raise ImportError("llama-cpp-python is required for local mode")
+
+        if self.model in _llm_cache:
+            return _llm_cache[self.model]
+        try:
+            llm = Llama(
+                model_path=self.model,
+                n_ctx=self.n_ctx,
+                n_threads=self.n_threads,
+                verbose=False,
+            )
+            _llm_cache[self.model] = llm
+            return llm
+        except Exception as e:
+            raise LLMError(f"Error loading local LLM model: {e}") from e
+
+    def _restore_prefix(self, llm: Any, prompt: str) -> None:
+        """Restores the evaluated prefix before running prompt.
+
+        llama-cpp-python only evaluates the tokens after the longest prefix its
+        context already holds, so the prefix costs nothing after the first time.
+        Failures fall back to a full evaluation. Must hold _llm_lock.
+        """
+        if not self.prefix or not prompt.startswith(self.prefix):
+            return
+        try:
+            llm.load_state(_load_prefix_state(llm, self.prefix, self.prefix_cache_dir))
+        except Exception as e:
+            get_logger().log(f"Error restoring prompt prefix state: {e}")
+
+    def _completion(self, llm: Any, prompt: str, usage: Optional[Usage] = None) -> str:
+        """Runs one completion on the loaded model. Must hold _llm_lock."""
+        try:
+            self._restore_prefix(llm, prompt)
+            before = _llama_timings(llm) if usage is not None else None
+            result = llm(prompt=prompt, max_tokens=self.max_tokens, stop=self.stop)
+            if usage is not None:
+                usage.update(result)
+                _timings_delta(usage, before, _llama_timings(llm))
+            return result["choices"][0]["text"]
+        except Exception as e:
+            raise LLMError(f"Error during local LLM inference: {e}") from e
+
+    def _shared_completions(
+        self, prompts: List[str], usages: Optional[List[Usage]] = None
+    ) -> List[str]:
+        """Runs prompts on the model owned by the shared inference process."""
+        from .local_model_server import complete
+
+        try:
+            return complete(prompts, usages=usages)
+        except (OSError, EOFError) as e:
+            raise LLMError(
+                f"Error communicating with local model server: {e}", retryable=True
+            ) from e
+
+    def generate(self, prompt: str, usage: Optional[Usage] = None) -> str:
+        return self.generate_batch([prompt], [usage] if usage is not None else None)[0]
+
+    def generate_batch(
+        self, prompts: List[str], usages: Optional[List[Usage]] = None
+    ) -> List[str]:
+        """Holds the model for the whole batch and evaluates the prompts back to
+        back. llama-cpp-python's high-level API decodes one sequence at a time,
+        so this saves lock handoffs rather than forward passes."""
+        if not prompts:
+            return []
+        if self.shared:
+            return self._shared_completions(prompts, usages)
+        with _llm_lock:
+            llm = self._get_model()
+            if usages is None:
+                return [self._completion(llm, p) for p in prompts]
+            return [self._completion(llm, p, u) for p, u in zip(prompts, usages)]
+
+    def stream(self, prompt: str, usage: Optional[Usage] = None) -> Iterator[str]:
+        """Runs llama-cpp-python with stream=True, holding the model until the
+        stream ends. The shared model process does not stream, so its
+        completion arrives as a single piece. Streamed pieces are counted as
+        completion tokens."""
+        if self.shared:
+            yield self._shared_completions([prompt], [usage] if usage is not None else None)[0]
+            return
+        with _llm_lock:
+            llm = self._get_model()
+            try:
+                self._restore_prefix(llm, prompt)
+                before = _llama_timings(llm) if usage is not None else None
+                pieces = 0
+                for part in llm(
+                    prompt=prompt, max_tokens=self.max_tokens, stop=self.stop, stream=True
+                ):
+                    text = part["choices"][0]["text"]
+                    if text:
+                        pieces += 1
+                        yield text
+                if usage is not None:
+                    usage.completion_tokens = pieces
+                    _timings_delta(usage, before, _llama_timings(llm))
+            except GeneratorExit:
+                raise
+            except Exception as e:
+                raise LLMError(f"Error during local LLM inference: {e}") from e
+
+class OllamaBackend(LLMBackend):
+    """
+    Ollama server, through its /api/generate HTTP endpoint.
+
+    max_tokens=None leaves the completion length to Ollama.
+    """
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        model: str,
+        url: str = "http://localhost:11434",
+        n_ctx: int = 0,
+        max_tokens: Optional[int] = 512,
+        stop: Sequence[str] = (),
+        timeout: Any = TIMEOUT,
+    ) -> None:
+        self.model = model
+        self.url = url.rstrip("/") + "/api/generate"
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.stop = list(stop)
+        self.timeout = timeout
+        # Ollama serves up to 4 requests in parallel by default (OLLAMA_NUM_PARALLEL)
+        self.max_concurrency = 4
+        options: Dict[str, Any] = {}
+        if n_ctx:
+            options["num_ctx"] = n_ctx
+        if max_tokens is not None:
+            options["num_predict"] = max_tokens
+        if self.stop:
+            options["stop"] = self.stop
+        self._payload = {"model": model, "options": options}
+
+    def cache_params(self) -> Dict[str, Any]:
+        return {"mode": self.name, "max_tokens": self.max_tokens, "stop": self.stop}
+
+    def generate(self, prompt: str, usage: Optional[Usage] = None) -> str:
+        if not requests:
+            raise ImportError("requests library is required for the Ollama backend")
+        try:
+            response = get_session().post(
+                self.url, json=dict(self._payload, prompt=prompt, stream=False),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            if usage is not None:
+                usage.update(data)
+            return data.get("response", "")
+        except requests.exceptions.RequestException as e:
+            raise _request_error(e, "Ollama") from e
+        except ValueError as e:
+            raise LLMError(f"Invalid response from Ollama: {e}") from e
+
+    def stream(self, prompt: str, usage: Optional[Usage] = None) -> Iterator[str]:
+        """Reads Ollama's newline-delimited JSON stream."""
+        if not requests:
+            raise ImportError("requests library is required for the Ollama backend")
+        try:
+            with get_session().post(
+                self.url, json=dict(self._payload, prompt=prompt, stream=True),
+                timeout=self.timeout, stream=True,
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("response"):
+                        yield event["response"]
+                    if event.get("done"):
+                        if usage is not None:
+                            usage.update(event)
+                        return
+        except requests.exceptions.RequestException as e:
+            raise _request_error(e, "Ollama") from e
+        except ValueError as e:
+            raise LLMError(f"Invalid response from Ollama: {e}") from e
+
+_TOKEN = re.compile(r"\s*\S+|\s+\Z")
+
+class MockBackend(LLMBackend):
+    """
+    Deterministic in-process model for measuring the harness without one.
+
+    The completion echoes the prompt. Each request waits latency seconds
+    before the first token, then produces tokens (whitespace-separated
+    words) at tokens_per_second (0 means instantly). Only slots requests run
+    at a time, like the parallel slots of a llama.cpp server; the rest queue.
+    A failure_rate share of requests fails with a retryable LLMError after
+    the latency, like a busy server answering 503.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        slots: int = 1,
+        failure_rate: float = 0.0,
+    ) -> None:
+        self.model = "mock"
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.tokens_per_second = tokens_per_second
+        self.slots = max(1, slots)
+        self.max_concurrency = self.slots
+        self._slots = threading.BoundedSemaphore(self.slots)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_slots"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._slots = threading.BoundedSemaphore(self.slots)
+
+    def cache_params(self) -> Dict[str, Any]:
+        return {"mode": self.name}
+
+    def generate(self, prompt: str, usage: Optional[Usage] = None) -> str:
+        return "".join(self.stream(prompt, usage))
+
+    def stream(self, prompt: str, usage: Optional[Usage] = None) -> Iterator[str]:
+        """The latency counts as prompt evaluation and the token production as
+        generation in usage."""
+        tokens = _TOKEN.findall(prompt)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        with self._slots:
+            time.sleep(self.latency)
+            if self.failure_rate and random.random() < self.failure_rate:
+                raise LLMError("Mock backend failure", retryable=True)
+            start = time.monotonic()
+            for token in tokens:
+                if delay:
+                    time.sleep(delay)
+                yield token
+            if usage is not None:
+                usage.prompt_tokens = usage.completion_tokens = len(tokens)
+                usage.prompt_eval_ms = self.latency * 1000
+                usage.eval_ms = (time.monotonic() - start) * 1000
@@ -0,0 +1,390 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import psutil
+
+from .mock_llm_server import MockLLMServer
+
+CORPUS_SHAPES = ("uniform", "skewed", "single")
+
+_VOCABULARY = [f"w{i}" for i in range(5000)]
+# Zipf-like word frequencies, as in natural text
+_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(_VOCABULARY))]
+
+class Scenario(NamedTuple):
+    """
+    One point of a benchmark sweep.
+
+    Attributes:
+        workers: Worker processes.
+        concurrency: Requests each worker keeps in flight.
+        chunk_size: Characters per chunk.
+        batch_size: Prompts per batched call (BATCHED_INFERENCE with
+                    LLM_SERVER_BATCH); 0 sends single requests, with
+                    concurrency in flight.
+    """
+
+    workers: int = 2
+    concurrency: int = 4
+    chunk_size: int = 512
+    batch_size: int = 0
+
+def make_corpus(
+    directory: str,
+    files: int = 20,
+    total_bytes: int = 1 << 20,
+    shape: str = "uniform",
+    seed: int = 0,
+) -> List[str]:
+    """
+    Writes a reproducible synthetic corpus of text files.
+
+    Args:
+        directory: Where to write the files; created if missing.
+        files: The number of files.
+        total_bytes: The approximate size of the whole corpus.
+        shape: How the bytes are spread over the files: "uniform" (equal
+               sizes), "skewed" (heavy-tailed, a few large files) or
+               "single" (one file holds half the corpus).
+        seed: The random seed; the same arguments always give the same corpus.
+
+    Returns:
+        The paths of the written files.
+    """
+    if shape not in CORPUS_SHAPES:
+        raise ValueError(f"Unknown corpus shape: {shape}")
+    rng = random.Random(seed)
+    if shape == "uniform":
+        weights = [1.0] * files
+    elif shape == "skewed":
+        weights = [rng.paretovariate(1.2) for _ in range(files)]
+    else:
+        weights = [float(max(1, files - 1))] + [1.0] * (files - 1)
+    total = sum(weights)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, weight in enumerate(weights):
+        size = max(1, int(total_bytes * weight / total))
+        path = os.path.join(directory, f"doc{i:04d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            written = 0
+            while written < size:
+                line = " ".join(rng.choices(_VOCABULARY, _WEIGHTS, k=12)) + "\n"
+                f.write(line)
+                written += len(line)
+        paths.append(path)
+    return paths
+
+def sweep(
+    workers: Sequence[int] = (2,),
+    concurrency: Sequence[int] = (4,),
+    chunk_size: Sequence[int] = (512,),
+    batch_size: Sequence[int] = (0,),
+) -> List[Scenario]:
+    """Returns every combination of the given values."""
+    return [
+        Scenario(*values)
+        for values in itertools.product(workers, concurrency, chunk_size, batch_size)
+    ]
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Returns the nearest-rank q-th percentile (0-100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))]
+
+def _scenario_env(
+    scenario: Scenario, corpus_dir: str, server_url: str, max_tokens: int
+) -> Dict[str, str]:
+    """Environment that pins the harness to the scenario's parameters and the
+    server's completion length."""
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env.update(
+        PYTHONPATH=os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")])),
+        DATA_DIR=corpus_dir,
+        LLM_MODE="server",
+        LLM_BACKEND="server",
+        LLM_SERVER_URL=server_url,
+        LLM_SERVER_BATCH="1" if scenario.batch_size else "0",
+        BATCHED_INFERENCE="1" if scenario.batch_size else "0",
+        CHUNK_MODE="chars",
+        # Base and max equal, and no resource back-off: the controller keeps them
+        BASE_CHUNK_SIZE=str(scenario.chunk_size),
+        MAX_CHUNK_SIZE=str(scenario.chunk_size),
+        BASE_BATCH_SIZE=str(scenario.batch_size or scenario.concurrency),
+        MAX_BATCH_SIZE=str(scenario.batch_size or scenario.concurrency),
+        MAX_PROCESSES=str(scenario.workers),
+        MIN_RAM="0",
+        MAX_CPU="100",
+        FEEDBACK_CONTROL="0",
+        CHUNK_METRICS="1",
+        OUTPUT_FORMAT="jsonl",
+        INPUT_BY_REFERENCE="0",
+        RESUME="0",
+        MANIFEST_PATH="",
+        LLM_CACHE_PATH="",
+        METRICS_PATH="",
+        METRICS_PORT="0",
+        STREAM_TOKENS="0",
+        RESERVED_OUTPUT_TOKENS=str(max_tokens),
+    )
+    return env
+
+def run_scenario(
+    scenario: Scenario, corpus_dir: str, server_url: str, workdir: str, max_tokens: int = 32
+) -> Dict[str, Any]:
+    """
+    Runs the harness on a corpus in a fresh process and measures it.
+
+    Outputs are written to workdir. Completions are capped at max_tokens,
+    the server's own default. Peak RSS is the largest combined
+    resident memory of the harness process and its workers, sampled every
+    50 ms.
+
+    Returns:
+        The scenario's parameters and measurements.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    package = __package__ or "mixtral_harness"
+    code = (
+        "import time\n"
+        f"from {package}.harness import Harness\n"
+        "start = time.perf_counter()\n"
+        f"Harness().process_directory(num_workers={scenario.workers})\n"
+        "print('BENCHMARK_SECONDS', time.perf_counter() - start)\n"
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=workdir,
+        env=_scenario_env(scenario, os.path.abspath(corpus_dir), server_url, max_tokens),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    peak_rss = 0
+    watched = psutil.Process(process.pid)
+    while process.poll() is None:
+        try:
+            rss = watched.memory_info().rss + sum(
+                child.memory_info().rss for child in watched.children(recursive=True)
+            )
+            peak_rss = max(peak_rss, rss)
+        except psutil.Error:
+            pass
+        time.sleep(0.05)
+    stdout, stderr = process.communicate()
+
+    result: Dict[str, Any] = scenario._asdict()
+    seconds = None
+    for line in stdout.splitlines():
+        if line.startswith("BENCHMARK_SECONDS "):
+            seconds = float(line.split()[1])
+    latencies: List[float] = []
+    chunks = failed = files = 0
+    for path in glob.glob(os.path.join(workdir, "*.llm_output.jsonl")):
+        files += 1
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                chunks += 1
+                metrics = record.get("metrics") or {}
+                if "error" in record:
+                    failed += 1
+                elif "latency" in metrics:
+                    latencies.append(metrics["latency"])
+    result.update(
+        seconds=seconds,
+        files=files,
+        chunks=chunks,
+        failed=failed,
+        files_per_second=files / seconds if seconds else None,
+        chunks_per_second=chunks / seconds if seconds else None,
+        latency_p50=percentile(latencies, 50),
+        latency_p95=percentile(latencies, 95),
+        latency_p99=percentile(latencies, 99),
+        peak_rss_mb=peak_rss / (1 << 20),
+    )
+    if process.returncode != 0:
+        result["error"] = stderr.strip().splitlines()[-1] if stderr.strip() else (
+            f"exit code {process.returncode}"
+        )
+    return result
+
+def run_benchmark(
+    scenarios: Sequence[Scenario],
+    files: int = 20,
+    total_bytes: int = 1 << 20,
+    shape: str = "uniform",
+    seed: int = 0,
+    slots: int = 4,
+    prompt_ms_per_token: float = 0.5,
+    ms_per_token: float = 20.0,
+    max_tokens: int = 32,
+    workdir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Runs every scenario against a MockLLMServer on the same synthetic corpus.
+
+    Args:
+        scenarios: The scenarios to run, in order.
+        files, total_bytes, shape, seed: The corpus (see make_corpus).
+        slots, prompt_ms_per_token, ms_per_token, max_tokens: The simulated
+            server (see MockLLMServer).
+        workdir: Where to put the corpus and outputs; a temporary directory
+                 that is removed afterwards if None.
+
+    Returns:
+        A report with the environment, corpus and server settings, and one
+        result per scenario (see run_scenario).
+    """
+    with tempfile.TemporaryDirectory(prefix="harness-bench-") as tmp:
+        root = workdir or tmp
+        corpus_dir = os.path.join(root, "corpus")
+        make_corpus(corpus_dir, files, total_bytes, shape, seed)
+        results = []
+        with MockLLMServer(
+            slots=slots,
+            prompt_ms_per_token=prompt_ms_per_token,
+            ms_per_token=ms_per_token,
+            max_tokens=max_tokens,
+        ) as server:
+            for i, scenario in enumerate(scenarios):
+                out = os.path.join(root, f"run{i:03d}")
+                results.append(run_scenario(scenario, corpus_dir, server.url, out, max_tokens))
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "corpus": {"files": files, "total_bytes": total_bytes, "shape": shape, "seed": seed},
+        "server": {
+            "slots": slots,
+            "prompt_ms_per_token": prompt_ms_per_token,
+            "ms_per_token": ms_per_token,
+            "max_tokens": max_tokens,
+        },
+        "results": results,
+    }
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.1
+) -> List[str]:
+    """
+    Compares a report with a baseline report, scenario by scenario.
+
+    A scenario regressed if its chunks/s dropped, or its p95 latency or
+    peak RSS grew, by more than threshold (a fraction). Scenarios missing
+    from either report are skipped.
+
+    Returns:
+        One message per regression.
+    """
+    def key(result: Dict[str, Any]) -> tuple:
+        return tuple(result.get(field) for field in Scenario._fields)
+
+    before = {key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report.get("results", []):
+        old = before.get(key(result))
+        if old is None:
+            continue
+        name = ", ".join(f"{f}={result[f]}" for f in Scenario._fields)
+        for metric, higher_is_better in (
+            ("chunks_per_second", True),
+            ("latency_p95", False),
+            ("peak_rss_mb", False),
+        ):
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append(
+                    f"{name}: {metric} {old_value:.3f} -> {new_value:.3f} ({change:+.0%})"
+                )
+    return regressions
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the harness against a simulated llama.cpp server."
+    )
+    parser.add_argument("--workers", type=_ints, default=[2], help="e.g. 1,2,4")
+    parser.add_argument("--concurrency", type=_ints, default=[4], help="e.g. 1,4,8")
+    parser.add_argument("--chunk-size", type=_ints, default=[512], help="e.g. 256,512")
+    parser.add_argument(
+        "--batch-size", type=_ints, default=[0], help="e.g. 0,8 (0: single requests)"
+    )
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--total-bytes", type=int, default=1 << 20)
+    parser.add_argument("--shape", choices=CORPUS_SHAPES, default="uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--prompt-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--ms-per-token", type=float, default=20.0)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--workdir", help="Keep the corpus and outputs here")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path")
+    parser.add_argument("--baseline", help="Report to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Tolerated regression (fraction)"
+    )
+    args = parser.parse_args()
+
+    scenarios = sweep(args.workers, args.concurrency, args.chunk_size, args.batch_size)
+    report = run_benchmark(
+        scenarios,
+        files=args.files,
+        total_bytes=args.total_bytes,
+        shape=args.shape,
+        seed=args.seed,
+        slots=args.slots,
+        prompt_ms_per_token=args.prompt_ms_per_token,
+        ms_per_token=args.ms_per_token,
+        max_tokens=args.max_tokens,
+        workdir=args.workdir,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    def fmt(value: Any, spec: str) -> str:
+        return format(value, spec) if value is not None else "-"
+
+    print(f"{'scenario':<40} {'files/s':>8} {'chunks/s':>9} {'p50':>7} {'p95':>7} "
+          f"{'p99':>7} {'RSS MB':>7}")
+    for r in report["results"]:
+        name = f"w={r['workers']} c={r['concurrency']} cs={r['chunk_size']} b={r['batch_size']}"
+        print(
+            f"{name:<40} {fmt(r['files_per_second'], '8.2f')} "
+            f"{fmt(r['chunks_per_second'], '9.2f')} {fmt(r['latency_p50'], '7.3f')} "
+            f"{fmt(r['latency_p95'], '7.3f')} {fmt(r['latency_p99'], '7.3f')} "
+            f"{fmt(r['peak_rss_mb'], '7.1f')}"
+            + (f"  ERROR: {r['error']}" if "error" in r else "")
+        )
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
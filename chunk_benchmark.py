@@ -0,0 +1,276 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import psutil
+
+from .chunk_engine import ChunkIndex, align_to_char
+from .chunk_manager import batch_chunks, chunk_blocks
+
+VARIANTS = ("lists", "engine", "engine_index")
+
+def parse_size(value: str) -> int:
+    """Parses a byte count with an optional K, M or G (binary) suffix."""
+    value = value.strip().upper().rstrip("B")
+    scale = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}.get(value[-1:], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+def make_text_file(path: str, size: int, text: str = "ascii", seed: int = 0) -> None:
+    """
+    Writes a file of about size bytes of words, quickly enough for inputs of
+    many gigabytes: a 1 MB block is generated once and repeated.
+
+    Args:
+        path: The file to write.
+        size: Its size in bytes.
+        text: "ascii", "utf8" to mix in multibyte characters, or "crlf" for
+              that with Windows line endings.
+        seed: The random seed.
+    """
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(2000)]
+    if text in ("utf8", "crlf"):
+        words += ["grüße", "naïve", "东京", "Ωμέγα", "emoji😀"] * 100
+    eol = "\r\n" if text == "crlf" else "\n"
+    lines, length = [], 0
+    while length < 1 << 20:
+        line = " ".join(rng.choices(words, k=12)) + eol
+        lines.append(line)
+        length += len(line.encode("utf-8"))
+    block = "".join(lines).encode("utf-8")
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        # Do not end the file inside a multibyte character
+        f.write(block[:align_to_char(block, size % len(block))])
+
+def _run_lists(path: str, block_size: int, batch_size: int, consume: Callable[[str], None]) -> int:
+    """The current non-streaming path: decode the file, then list-based chunking."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        text = f.read()
+    chunks = 0
+    for batch in batch_chunks(chunk_blocks(text, block_size), batch_size):
+        for chunk in batch:
+            consume(chunk)
+            chunks += 1
+    return chunks
+
+def _run_engine(
+    path: str, block_size: int, batch_size: int, consume: Optional[Callable[[str], None]]
+) -> int:
+    """The chunk engine over an mmap; chunks are decoded as they are consumed.
+    Without consume, only the chunk boundaries are found."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with ChunkIndex(mm, block_size) as index:
+                if consume is None:
+                    return sum(1 for _ in index.spans())
+                chunks = 0
+                for batch in index.batches(batch_size):
+                    for chunk in batch:
+                        consume(chunk)
+                        chunks += 1
+                return chunks
+        finally:
+            mm.close()
+
+class _AnonPeak:
+    """Samples the process's anonymous (heap) RSS, which unlike the total RSS
+    leaves out file pages mapped from the page cache."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.peak = self._read()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _read() -> Optional[int]:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("RssAnon:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            value = self._read()
+            if value is not None and (self.peak is None or value > self.peak):
+                self.peak = value
+
+    def stop(self) -> Optional[int]:
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+def run_variant(
+    variant: str, path: str, block_size: int, batch_size: int, verify: bool = False
+) -> Dict[str, Any]:
+    """
+    Runs one variant on a file in this process and measures it. Run it in a
+    fresh process (see measure) for a meaningful peak RSS.
+
+    Returns:
+        The chunk count, seconds, peak RSS and peak anonymous RSS in MB, and
+        with verify, a CRC32 of all chunks (to check variants agree).
+    """
+    crc = [0]
+
+    def consume(chunk: str) -> None:
+        if verify:
+            crc[0] = zlib.crc32(chunk.encode("utf-8"), crc[0])
+
+    anon = _AnonPeak()
+    start = time.perf_counter()
+    if variant == "lists":
+        chunks = _run_lists(path, block_size, batch_size, consume)
+    elif variant == "engine":
+        chunks = _run_engine(path, block_size, batch_size, consume)
+    elif variant == "engine_index":
+        chunks = _run_engine(path, block_size, batch_size, None)
+    else:
+        raise ValueError(f"Unknown variant: {variant}")
+    seconds = time.perf_counter() - start
+    anon_peak = anon.stop()
+    result: Dict[str, Any] = {
+        "variant": variant,
+        "chunks": chunks,
+        "seconds": seconds,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_anon_rss_mb": anon_peak / (1 << 20) if anon_peak is not None else None,
+    }
+    if verify and variant != "engine_index":
+        result["crc32"] = crc[0]
+    return result
+
+def measure(
+    variant: str, path: str, block_size: int, batch_size: int, verify: bool = False
+) -> Dict[str, Any]:
+    """Runs run_variant in a fresh interpreter and returns its result."""
+    package = __package__ or "mixtral_harness"
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+    args = [sys.executable, "-m", f"{package}.chunk_benchmark", "--run", variant, path,
+            "--block-size", str(block_size), "--batch-size", str(batch_size)]
+    if verify:
+        args.append("--verify")
+    process = subprocess.run(args, capture_output=True, text=True, env=env)
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return {"variant": variant, "error": lines[-1] if lines else "failed"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def run_suite(
+    sizes: Iterable[int],
+    block_size: int = 512,
+    batch_size: int = 10,
+    text: str = "ascii",
+    variants: Iterable[str] = VARIANTS,
+    directory: Optional[str] = None,
+    verify: bool = False,
+) -> Dict[str, Any]:
+    """
+    Runs every variant on a generated input of each size.
+
+    The "lists" variant holds the decoded text and every chunk in memory at
+    once, so it is skipped for inputs that would not fit in about half of
+    the available memory.
+
+    Returns:
+        A report with the settings and one result per size and variant.
+    """
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="chunk-bench-", dir=directory) as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"input-{size}.txt")
+            make_text_file(path, size, text)
+            for variant in variants:
+                # Decoded str plus chunk copies (up to 4 bytes per character each)
+                needed = size * (3 if text == "ascii" else 9)
+                if variant == "lists" and needed > psutil.virtual_memory().available // 2:
+                    result = {"variant": variant, "skipped": f"needs about {needed >> 20} MB"}
+                else:
+                    result = measure(variant, path, block_size, batch_size, verify)
+                result["bytes"] = size
+                results.append(result)
+            os.remove(path)
+    return {
+        "block_size": block_size,
+        "batch_size": batch_size,
+        "text": text,
+        "results": results,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the chunk engine with list-based chunking."
+    )
+    parser.add_argument("--sizes", default="1M,10M,100M", help="e.g. 1M,10M,100M,1G,10G")
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--text", choices=("ascii", "utf8", "crlf"), default="ascii")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--dir", help="Where to write the generated inputs")
+    parser.add_argument("--verify", action="store_true", help="Check the variants agree")
+    parser.add_argument("--output", default="chunk_benchmark.json", help="JSON report path")
+    parser.add_argument("--run", nargs=2, metavar=("VARIANT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(
+            run_variant(args.run[0], args.run[1], args.block_size, args.batch_size, args.verify)
+        ))
+        return
+
+    report = run_suite(
+        [parse_size(s) for s in args.sizes.split(",") if s],
+        args.block_size,
+        args.batch_size,
+        args.text,
+        [v for v in args.variants.split(",") if v],
+        args.dir,
+        args.verify,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'bytes':>12} {'variant':<13} {'chunks':>10} {'seconds':>9} "
+          f"{'RSS MB':>8} {'heap MB':>8}")
+    for r in report["results"]:
+        if "skipped" in r or "error" in r:
+            print(f"{r['bytes']:>12} {r['variant']:<13} {r.get('skipped') or r['error']}")
+            continue
+        anon = r["peak_anon_rss_mb"]
+        print(
+            f"{r['bytes']:>12} {r['variant']:<13} {r['chunks']:>10} {r['seconds']:>9.3f} "
+            f"{r['peak_rss_mb']:>8.1f} {anon if anon is None else format(anon, '8.1f'):>8}"
+        )
+    if args.verify:
+        for size in {r["bytes"] for r in report["results"]}:
+            crcs = {r.get("crc32") for r in report["results"]
+                    if r["bytes"] == size and "crc32" in r}
+            if len(crcs) > 1:
+                print(f"MISMATCH: variants disagree on the {size}-byte input")
+                sys.exit(1)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
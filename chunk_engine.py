@@ -0,0 +1,157 @@
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+def _is_continuation(byte: int) -> bool:
+    return byte & 0xC0 == 0x80
+
+def align_to_char(buffer: Any, offset: int, start: int = 0) -> int:
+    """Moves offset back to the start of the UTF-8 character it falls in,
+    but not before start."""
+    while offset > start and offset < len(buffer) and _is_continuation(buffer[offset]):
+        offset -= 1
+    return offset
+
+class ChunkIndex(Iterable[str]):
+    """
+    Chunk boundaries of UTF-8 text held in a buffer (bytes, memoryview or an
+    mmap), found without decoding the text into one str.
+
+    The chunks are the same as chunk_manager.chunk_blocks gives on the decoded
+    text: block_size characters each, the last one shorter. Boundaries are
+    found lazily, one window at a time, as the chunks are iterated, so only
+    the current window's offsets are held and only one window is copied at a
+    time. A chunk is decoded when it is accessed. An ASCII window has its
+    boundaries computed arithmetically; any other window is decoded once to
+    place them on character boundaries.
+    """
+
+    def __init__(
+        self,
+        buffer: Any,
+        block_size: int,
+        start: int = 0,
+        end: Optional[int] = None,
+        window: int = 1 << 22,
+    ) -> None:
+        """
+        Initializes the ChunkIndex; no boundaries are found yet.
+
+        Args:
+            buffer: A bytes-like object holding UTF-8 text; it must stay open
+                    while the index is used.
+            block_size: Characters per chunk.
+            start: The first byte of the text; must be a character boundary.
+            end: The byte to stop before; must be a character boundary.
+                 Defaults to the end of the buffer.
+            window: Bytes examined at a time while finding boundaries.
+        """
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.view = memoryview(buffer).cast("B")
+        self.block_size = block_size
+        self.start = start
+        self.end = len(self.view) if end is None else end
+        self.window = max(window, 4)  # room for a whole character
+
+    def _window_starts(self, pos: int, stop: int, carry: int) -> Tuple[Iterable[int], int]:
+        """Returns the chunk starts in [pos, stop) and the new carry (characters
+        since the last start)."""
+        size = self.block_size
+        first = (size - carry) % size
+        data = bytes(self.view[pos:stop])
+        if data.isascii():
+            return range(pos + first, stop, size), (carry + stop - pos) % size
+        text = str(data, "utf-8")
+        del data
+        starts = []
+        offset, prev = pos, 0
+        for k in range(first, len(text), size):
+            offset += len(text[prev:k].encode("utf-8"))
+            prev = k
+            starts.append(offset)
+        return starts, (carry + len(text)) % size
+
+    def spans(self) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the byte range [start, end) of each chunk, in order.
+
+        Raises:
+            UnicodeDecodeError: If a non-ASCII window is not valid UTF-8.
+        """
+        carry = 0
+        prev: Optional[int] = None
+        pos = self.start
+        while pos < self.end:
+            stop = self.end
+            if stop - pos > self.window:
+                stop = align_to_char(self.view, pos + self.window, pos + 1)
+            starts, carry = self._window_starts(pos, stop, carry)
+            for offset in starts:
+                if prev is not None:
+                    yield prev, offset
+                prev = offset
+            pos = stop
+        if prev is not None:
+            yield prev, self.end
+
+    def __iter__(self) -> Iterator[str]:
+        for start, end in self.spans():
+            yield str(self.view[start:end], "utf-8")
+
+    def batches(self, batch_size: int) -> Iterator["ChunkBatch"]:
+        """Groups the chunks like chunk_manager.batch_chunks, as lazy views,
+        finding each batch's boundaries as it is reached."""
+        spans: List[Tuple[int, int]] = []
+        for span in self.spans():
+            spans.append(span)
+            if len(spans) == batch_size:
+                yield ChunkBatch(self, spans)
+                spans = []
+        if spans:
+            yield ChunkBatch(self, spans)
+
+    def release(self) -> None:
+        """Releases the buffer, e.g. so that an mmap can be closed. The index
+        and its batches cannot be used afterwards."""
+        self.view.release()
+
+    def __enter__(self) -> "ChunkIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+class ChunkBatch(Sequence[str]):
+    """A batch of consecutive chunks of a ChunkIndex, as byte ranges of its
+    buffer; chunks are decoded when accessed."""
+
+    def __init__(self, index: ChunkIndex, spans: List[Tuple[int, int]]) -> None:
+        self.index = index
+        self.spans = spans
+
+    @property
+    def end(self) -> int:
+        """The byte the batch's last chunk ends before."""
+        return self.spans[-1][1]
+
+    def chunk_view(self, i: int) -> memoryview:
+        """Returns chunk i's bytes without copying them."""
+        start, end = self.spans[i]
+        return self.index.view[start:end]
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[str]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        return str(self.chunk_view(i), "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for start, end in self.spans:
+            yield str(self.index.view[start:end], "utf-8")
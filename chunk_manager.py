@@ -1,3 +1,7 @@
+import re
+from collections import deque
+from itertools import islice
+
 def fast_split(data, pre_token_count):
     """
     Splits preamble tokens or metadata from data block.
@@ -28,4 +32,128 @@ def batch_chunks(chunks, batch_size):
         chunks = [1,2,3,4,5], batch_size=2
         output = [[1,2],[3,4],[5]]
     """
-    return [chunks[i:i+batch_size] for i in range(0, len(chunks), batch_size)]
\ No newline at end of file
+    return [chunks[i:i+batch_size] for i in range(0, len(chunks), batch_size)]
+
+def iter_text(f, window_size, pre_token_count=0, post_token_count=0, normalize=False):
+    """
+    Incrementally reads text from file object f, window_size characters at a time.
+    When pre_token_count or post_token_count is set, drops that many whitespace
+    tokens from the head/tail in a single pass and yields the remaining tokens
+    joined by single spaces, matching " ".join(text.split()[pre:-post]).
+    normalize=True joins tokens by single spaces even when nothing is dropped.
+    Yields text pieces; memory is bounded by window_size + post_token_count tokens.
+    """
+    if pre_token_count <= 0 and post_token_count <= 0 and not normalize:
+        while True:
+            block = f.read(window_size)
+            if not block:
+                return
+            yield block
+
+    carry = ""
+    skipped = 0
+    tail = deque()
+    started = False
+    while True:
+        block = f.read(window_size)
+        if block:
+            block = carry + block
+            tokens = block.split()
+            # The last token may continue in the next window
+            carry = tokens.pop() if tokens and not block[-1].isspace() else ""
+        else:
+            tokens = [carry] if carry else []
+            carry = ""
+
+        emitted = []
+        for token in tokens:
+            if skipped < pre_token_count:
+                skipped += 1
+                continue
+            if post_token_count > 0:
+                tail.append(token)
+                if len(tail) <= post_token_count:
+                    continue
+                token = tail.popleft()
+            emitted.append(token)
+
+        if emitted:
+            yield (" " if started else "") + " ".join(emitted)
+            started = True
+        if not block:
+            return
+
+def iter_chunks(pieces, block_size):
+    """
+    Lazily chunks an iterable of text pieces into blocks of block_size.
+    Yields the same chunks chunk_blocks would produce on the joined text.
+    """
+    rest = ""
+    for piece in pieces:
+        if rest:
+            piece = rest + piece
+        end = len(piece) - len(piece) % block_size
+        for i in range(0, end, block_size):
+            yield piece[i:i+block_size]
+        rest = piece[end:]
+    if rest:
+        yield rest
+
+def iter_batches(chunks, batch_size):
+    """
+    Lazily groups an iterable of chunks into lists of batch_size.
+    The final batch may be smaller.
+    """
+    chunks = iter(chunks)
+    while True:
+        batch = list(islice(chunks, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+_SEGMENT = re.compile(r"\s*\S+")
+
+def iter_segments(pieces):
+    """
+    Splits an iterable of text pieces into words, each carrying the whitespace
+    that precedes it, so that "".join(segments) reproduces the text.
+    A word spanning two pieces is yielded whole.
+    """
+    rest = ""
+    for piece in pieces:
+        text = rest + piece
+        end = 0
+        for match in _SEGMENT.finditer(text):
+            if match.end() == len(text):
+                break  # may continue in the next piece
+            yield match.group()
+            end = match.end()
+        rest = text[end:]
+    if rest:
+        yield rest
+
+def iter_token_chunks(pieces, max_tokens, count_tokens):
+    """
+    Lazily chunks an iterable of text pieces into chunks of at most max_tokens
+    model tokens, as counted by count_tokens. Chunks end on word boundaries;
+    a single word longer than max_tokens is split on characters.
+    """
+    chunk, used = [], 0
+    for segment in iter_segments(pieces):
+        n = count_tokens(segment)
+        if n > max_tokens:
+            if chunk:
+                yield "".join(chunk)
+                chunk, used = [], 0
+            step = max(1, len(segment) * max_tokens // n)
+            for i in range(0, len(segment), step):
+                yield segment[i:i+step]
+            continue
+        if used + n > max_tokens and chunk:
+            yield "".join(chunk)
+            chunk, used = [], 0
+        chunk.append(segment)
+        used += n
+    if chunk:
+        yield "".join(chunk)
@@ -1,11 +1,25 @@
 import os
 
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
 # Directory containing data files to process
 DATA_DIR = os.getenv("DATA_DIR", "data/")
 
+# Input discovery: comma-separated fnmatch patterns, matched against the path
+# relative to DATA_DIR and the bare file name
+RECURSIVE = _env_flag("RECURSIVE", "1")
+INCLUDE = [p for p in os.getenv("INCLUDE", "*").split(",") if p]
+EXCLUDE = [p for p in os.getenv("EXCLUDE", "*.llm_output.*,.*").split(",") if p]
+FOLLOW_SYMLINKS = _env_flag("FOLLOW_SYMLINKS")
+# Manifest of processed files; when set, re-runs only process new or changed files
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "")
+
 # Model and server config
 MODEL_PATH = os.getenv("LLM_MODEL_PATH", "Mixtral-8x7B-Instruct-v0.1.Q6_K.gguf")
 SERVER_PORT = int(os.getenv("LLM_SERVER_PORT", "8000"))
+# Inference backend: "server", "local", "ollama" or "mock"; empty follows LLM_MODE
+LLM_BACKEND = os.getenv("LLM_BACKEND", "")
 N_THREADS = int(os.getenv("LLM_THREADS", "8"))
 N_CTX = int(os.getenv("LLM_CTX", "4096"))
 
@@ -13,6 +27,15 @@ N_CTX = int(os.getenv("LLM_CTX", "4096"))
 PRE_TOKEN_COUNT = int(os.getenv("PRE_TOKEN_COUNT", "0"))
 POST_TOKEN_COUNT = int(os.getenv("POST_TOKEN_COUNT", "0"))
 
+# Chunk sizing: "chars" (fixed character blocks), "tokens" (model tokenizer)
+# or "approx" (estimated tokens, CHARS_PER_TOKEN characters each)
+CHUNK_MODE = os.getenv("CHUNK_MODE", "chars")
+# Token budget per chunk; 0 uses everything N_CTX leaves after the reserves
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "0"))
+RESERVED_OUTPUT_TOKENS = int(os.getenv("RESERVED_OUTPUT_TOKENS", "512"))
+PROMPT_RESERVE_TOKENS = int(os.getenv("PROMPT_RESERVE_TOKENS", "32"))
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4.0"))
+
 # Adaptive controller defaults
 MIN_RAM = float(os.getenv("MIN_RAM", "10.0"))
 MAX_CPU = float(os.getenv("MAX_CPU", "80.0"))
@@ -21,4 +44,66 @@ BASE_PROCESSES = int(os.getenv("BASE_PROCESSES", "4"))
 BASE_BATCH_SIZE = int(os.getenv("BASE_BATCH_SIZE", "10"))
 MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "512"))
 MAX_PROCESSES = int(os.getenv("MAX_PROCESSES", "16"))
-MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
\ No newline at end of file
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+
+# Closed-loop tuning of concurrency and chunk size from measured throughput;
+# disable to keep the static resource-based parameters
+FEEDBACK_CONTROL = _env_flag("FEEDBACK_CONTROL", "1")
+FEEDBACK_WINDOW = float(os.getenv("FEEDBACK_WINDOW", "10.0"))
+FEEDBACK_HYSTERESIS = float(os.getenv("FEEDBACK_HYSTERESIS", "0.05"))
+TARGET_LATENCY = float(os.getenv("TARGET_LATENCY", "30.0"))
+
+# Streaming mode: read input incrementally instead of loading whole files
+STREAMING = _env_flag("STREAMING")
+STREAM_WINDOW_SIZE = int(os.getenv("STREAM_WINDOW_SIZE", str(1 << 20)))
+
+# Memory-map input files instead of reading them: only the current window is
+# decoded, so files may exceed RAM, and workers processing shards of one file
+# (SHARD_SIZE) share its pages through the page cache. Takes precedence over
+# STREAMING
+MMAP_INPUT = _env_flag("MMAP_INPUT")
+
+# .jsonl outputs are buffered (JSONL_BUFFER_SIZE bytes at a time) into a
+# temporary file that replaces the output once the file is done. JSONL_FSYNC
+# is when it is fsynced: "close", "always", "never", or seconds between fsyncs
+JSONL_BUFFER_SIZE = int(os.getenv("JSONL_BUFFER_SIZE", str(1 << 20)))
+JSONL_FSYNC = os.getenv("JSONL_FSYNC", "close")
+
+# Format of the records output next to each .txt output: "jsonl", "jsonl.gz",
+# "jsonl.zst" (needs zstandard), "parquet" or "arrow" (need pyarrow)
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "jsonl")
+# Store each chunk's input as its byte range in the input file instead of
+# the text itself
+INPUT_BY_REFERENCE = _env_flag("INPUT_BY_REFERENCE")
+
+# Stream completions token by token and log time to first token and
+# inter-token latency per chunk (ignored with BATCHED_INFERENCE)
+STREAM_TOKENS = _env_flag("STREAM_TOKENS")
+
+# Send each batch to the LLM as one call (see unified_llm_wrapper.get_llm_responses)
+BATCHED_INFERENCE = _env_flag("BATCHED_INFERENCE")
+
+# In local LLM mode, load the model once in a shared inference process that
+# serves all workers, instead of once per worker
+SHARED_LOCAL_MODEL = _env_flag("SHARED_LOCAL_MODEL", "1")
+
+# Resume mode: journal progress per chunk and skip completed work on re-runs
+RESUME = _env_flag("RESUME")
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", ".harness_journal")
+
+# Split files larger than this many bytes into shards processed in parallel;
+# 0 disables sharding
+SHARD_SIZE = int(os.getenv("SHARD_SIZE", "0"))
+
+# Watch mode (Harness.watch_directory / run.py --watch)
+WATCH_SETTLE = float(os.getenv("WATCH_SETTLE", "2.0"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1.0"))
+# Queued tasks before new files wait in a backlog; 0 means twice MAX_PROCESSES
+WATCH_MAX_PENDING = int(os.getenv("WATCH_MAX_PENDING", "0"))
+
+# Chunk metrics (see metrics): Prometheus text file rewritten after every file
+# (e.g. for node_exporter's textfile collector), HTTP port serving /metrics
+# (0 disables), and whether .jsonl records carry their chunk's measurements
+METRICS_PATH = os.getenv("METRICS_PATH", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+CHUNK_METRICS = _env_flag("CHUNK_METRICS")
@@ -0,0 +1,151 @@
+import fnmatch
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple, Sequence
+
+class FileEntry(NamedTuple):
+    """A discovered input file."""
+
+    path: str
+    relpath: str
+    size: int
+    mtime: float
+
+def path_matches(relpath: str, patterns: Sequence[str]) -> bool:
+    """Returns True if relpath or its base name matches any fnmatch pattern."""
+    name = os.path.basename(relpath)
+    return any(
+        fnmatch.fnmatch(relpath, p) or fnmatch.fnmatch(name, p) for p in patterns
+    )
+
+def scan(
+    directory: str,
+    recursive: bool = True,
+    include: Sequence[str] = ("*",),
+    exclude: Sequence[str] = (),
+    follow_symlinks: bool = False,
+) -> Iterator[FileEntry]:
+    """
+    Finds input files under directory with os.scandir.
+
+    Patterns are fnmatch globs tested against both the path relative to
+    directory and the bare name. A directory matching an exclude pattern is
+    not descended into. Symlinks are skipped unless follow_symlinks is set;
+    symlinked directory loops are then visited only once.
+
+    Args:
+        directory: The directory to scan.
+        recursive: Whether to descend into subdirectories.
+        include: Files must match one of these patterns.
+        exclude: Files and directories matching any of these are skipped.
+        follow_symlinks: Whether to follow symlinked files and directories.
+
+    Yields:
+        A FileEntry per matching regular file, using the stat data scandir
+        already fetched. A missing directory yields nothing.
+    """
+    try:
+        st = os.stat(directory)
+    except OSError:
+        return
+    seen = {(st.st_dev, st.st_ino)}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(directory, rel_dir)) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            relpath = os.path.join(rel_dir, entry.name)
+            if path_matches(relpath, exclude):
+                continue
+            if entry.is_symlink() and not follow_symlinks:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if recursive:
+                        st = entry.stat(follow_symlinks=True)
+                        if (st.st_dev, st.st_ino) not in seen:
+                            seen.add((st.st_dev, st.st_ino))
+                            stack.append(relpath)
+                elif entry.is_file(follow_symlinks=follow_symlinks):
+                    if path_matches(relpath, include):
+                        st = entry.stat(follow_symlinks=follow_symlinks)
+                        yield FileEntry(entry.path, relpath, st.st_size, st.st_mtime)
+            except OSError:
+                continue
+
+def file_hash(path: str) -> str:
+    """Returns the BLAKE2b content hash of a file, read in 1 MiB blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class Manifest:
+    """
+    Record of processed files as (path, size, mtime, content hash).
+
+    A file counts as changed if it is new or its size differs. If only its
+    mtime differs, its content is re-hashed and compared, so a touched but
+    unchanged file is not reprocessed. Unchanged files cost no I/O beyond the
+    stat data already returned by scandir.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the Manifest, loading it from path if it exists.
+
+        Args:
+            path: The JSON manifest file.
+        """
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self._pending: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f)
+
+    def changed(self, entries: Sequence[FileEntry]) -> List[FileEntry]:
+        """
+        Returns the entries that are new or changed since they were recorded.
+
+        Changed files are hashed now, before processing, so that record stores
+        the hash of the content that was actually processed.
+        """
+        result = []
+        for entry in entries:
+            key = os.path.abspath(entry.path)
+            known = self.files.get(key)
+            if known is not None and known["size"] == entry.size:
+                if known["mtime"] == entry.mtime:
+                    continue
+                content_hash = file_hash(entry.path)
+                if content_hash == known["hash"]:
+                    known["mtime"] = entry.mtime
+                    continue
+            else:
+                content_hash = file_hash(entry.path)
+            self._pending[key] = content_hash
+            result.append(entry)
+        return result
+
+    def record(self, entry: FileEntry) -> None:
+        """Records a file returned by changed as processed."""
+        key = os.path.abspath(entry.path)
+        self.files[key] = {
+            "size": entry.size,
+            "mtime": entry.mtime,
+            "hash": self._pending.pop(key, None) or file_hash(entry.path),
+        }
+
+    def save(self) -> None:
+        """Writes the manifest atomically."""
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.files, f)
+        os.replace(tmp, self.path)
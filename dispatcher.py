@@ -0,0 +1,47 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar, Union
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+def ordered_map(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    max_in_flight: Union[int, Callable[[], int]],
+    max_workers: Optional[int] = None,
+) -> Iterator[R]:
+    """
+    Applies func to each item, keeping up to max_in_flight calls running at once.
+
+    Items are pulled lazily, so at most max_in_flight items are held in memory.
+    Results are yielded in input order, even if later calls finish first.
+
+    Args:
+        func: The blocking function to call for each item (e.g. an LLM request).
+        items: The items to process.
+        max_in_flight: The maximum number of concurrent calls, or a callable
+                       returning it; a callable is re-read before every
+                       submission, so the limit can change during the run.
+        max_workers: The thread pool size. Required to be at least the largest
+                     limit a callable max_in_flight can return; defaults to
+                     max_in_flight when it is an int.
+
+    Yields:
+        The result of func for each item, in input order.
+    """
+    limit = max_in_flight if callable(max_in_flight) else (lambda: max_in_flight)
+    workers = max_workers or limit()
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            while pending and len(pending) >= max(1, min(limit(), workers)):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -41,6 +41,13 @@ BACKUP_BEFORE_VALIDATION = True
 BACKUP_DIRECTORY = "./backups"
 # ============================================================
 
+# Talk to Ollama over HTTP through the harness's backend when the package is
+# installed; otherwise fall back to the `ollama run` CLI
+try:
+    from mixtral_harness.backends import OllamaBackend
+except ImportError:
+    OllamaBackend = None
+
 # 10 Code Validators Configuration
 VALIDATORS = {
     "black": ["black", "--check"],
@@ -354,28 +361,32 @@ class EnhancedPythonCodeGenerator:
             progress_thread = threading.Thread(target=show_thinking_progress, daemon=True)
             progress_thread.start()
             
-            # Start the subprocess without timeout
-            process = subprocess.Popen(
-                ["ollama", "run", self.model_name],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            # Send the prompt and wait for response
-            stdout, stderr = process.communicate(input=prompt.encode())
+            if OllamaBackend is not None:
+                # Ollama's HTTP API, through the harness backend (no timeout)
+                output = OllamaBackend(self.model_name, max_tokens=None, timeout=None).generate(prompt)
+                error_msg = "" if output else "empty response from Ollama"
+            else:
+                # Start the subprocess without timeout
+                process = subprocess.Popen(
+                    ["ollama", "run", self.model_name],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                stdout, stderr = process.communicate(input=prompt.encode())
+                output = stdout.decode()
+                error_msg = (stderr.decode().strip() or f"exit code {process.returncode}") if process.returncode != 0 else ""
             
             # Stop the thinking indicator
             thinking_active.clear()
             if progress_thread:
                 progress_thread.join(timeout=1)
             
-            if process.returncode != 0:
-                error_msg = stderr.decode().strip()
+            if error_msg:
                 print(f"Error calling model: {error_msg}")
                 return None
             
-            output = stdout.decode().strip()
+            output = output.strip()
             if purpose == "generation":
                 print("✓ Model finished thinking!")
             else:
@@ -0,0 +1,39 @@
+import codecs
+import io
+from typing import BinaryIO
+
+class ByteRangeReader:
+    """
+    Text reader over the byte range [start, end) of a binary file.
+
+    Provides the read(size) interface chunk_manager.iter_text expects and
+    decodes UTF-8 incrementally, so a character split across two reads is
+    decoded whole. Line endings are translated to "\n" as in text mode, so
+    a range reads the same as the file opened with open(path, "r").
+    """
+
+    def __init__(self, f: BinaryIO, start: int, end: int) -> None:
+        """
+        Initializes the ByteRangeReader.
+
+        Args:
+            f: A file opened in binary mode, or an mmap of one.
+            start: The first byte to read; must be a character boundary.
+            end: The byte to stop before; must be a character boundary.
+        """
+        self.f = f
+        self.remaining = end - start
+        self.decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder("utf-8")(), translate=True
+        )
+        f.seek(start)
+
+    def read(self, size: int) -> str:
+        """Returns up to about size characters, or "" at the end of the range."""
+        while self.remaining > 0:
+            data = self.f.read(min(max(size, 4), self.remaining))
+            self.remaining = self.remaining - len(data) if data else 0
+            text = self.decoder.decode(data, final=self.remaining == 0)
+            if text:
+                return text
+        return ""
@@ -1,18 +1,56 @@
+import mmap
 import os
-import glob
+import threading
 import time
+import traceback
+import types
 
 from . import config as default_config
-from .chunk_manager import chunk_blocks, batch_chunks
+from .chunk_manager import (
+    chunk_blocks,
+    batch_chunks,
+    iter_text,
+    iter_chunks,
+    iter_batches,
+    iter_token_chunks,
+)
 from .adaptive_controller import AdaptiveController
-from .unified_llm_wrapper import get_llm_response
-from .jsonl_output import write_jsonl
-from .async_logger import AsyncLogger
+from . import unified_llm_wrapper as llm_wrapper
+from . import local_model_server
+from .backends import LLMBackend, LLMError, LocalBackend, Usage
+from .unified_llm_wrapper import (
+    StreamStats,
+    get_backend,
+    get_llm_response,
+    get_llm_responses,
+    stream_llm_response,
+)
+from .output_sinks import merge_outputs, open_sink, output_format, read_input, read_records
+from .async_logger import AsyncLogger, get_logger
+from .dispatcher import ordered_map
+from .progress_journal import ProgressJournal
+from .response_cache import get_response_cache
+from .worker_pool import ElasticPool, TaskFailed
+from .scheduler import Task, plan_tasks
+from .file_reader import ByteRangeReader
+from .chunk_engine import ChunkBatch, ChunkIndex
+from .discovery import FileEntry, Manifest, scan
+from .watcher import DirectoryWatcher
+from .tokenizer import TokenCounter
+from .metrics import ChunkMetrics, Metrics, RunMetrics
 
-import glob
-import os
-from typing import Any, Dict, List, Optional
-from multiprocessing import Pool, cpu_count
+from collections import deque
+from contextlib import contextmanager
+from typing import (
+    Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple,
+    Union,
+)
+from multiprocessing import cpu_count
+
+import psutil
+
+# (seq, batch_idx, chunk_idx, chunk, last in batch), response or error, measurements
+Result = Tuple[Tuple[int, int, int, str, bool], Union[str, LLMError], Optional[ChunkMetrics]]
 
 class Harness:
     """
@@ -23,14 +61,20 @@ class Harness:
     processing parameters based on system resources.
     """
 
-    def __init__(self, config: Optional[Any] = None) -> None:
+    def __init__(
+        self, config: Optional[Any] = None, backend: Optional[LLMBackend] = None
+    ) -> None:
         """
         Initializes the Harness.
 
         Args:
             config: A configuration object. If None, the default config is used.
+            backend: The inference backend for this harness. If None, the backend
+                     named by config.LLM_BACKEND is used, or LLM_MODE's if that
+                     is empty (see unified_llm_wrapper.get_backend).
         """
         self.config = config or default_config
+        self.backend = backend
         self.logger = AsyncLogger()
         self.controller = AdaptiveController(
             min_ram=self.config.MIN_RAM,
@@ -41,7 +85,34 @@ class Harness:
             max_chunk_size=self.config.MAX_CHUNK_SIZE,
             max_processes=self.config.MAX_PROCESSES,
             max_batch_size=self.config.MAX_BATCH_SIZE,
+            feedback=self.config.FEEDBACK_CONTROL,
+            window=self.config.FEEDBACK_WINDOW,
+            hysteresis=self.config.FEEDBACK_HYSTERESIS,
+            target_latency=self.config.TARGET_LATENCY,
+            # Token modes size chunks from the context budget instead
+            steer_chunk_size=self.config.CHUNK_MODE == "chars",
         )
+        self._token_counter: Optional[TokenCounter] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Makes the harness picklable for multiprocessing workers.
+
+        The logger thread cannot cross process boundaries and a config module
+        cannot be pickled, so the config is snapshotted into a namespace and
+        the logger is recreated in the worker.
+        """
+        state = self.__dict__.copy()
+        del state["logger"]
+        state["_token_counter"] = None
+        if isinstance(self.config, types.ModuleType):
+            state["config"] = types.SimpleNamespace(
+                **{k: v for k, v in vars(self.config).items() if k.isupper()}
+            )
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.logger = AsyncLogger()
 
     def process_file(self, filepath: str) -> List[Dict[str, Any]]:
         """
@@ -54,7 +125,109 @@ class Harness:
             A list of dictionaries, where each dictionary contains the input chunk,
             the LLM output, and metadata.
         """
+        return list(self.iter_process_file(filepath))
+
+    def iter_process_file(
+        self,
+        filepath: str,
+        journal: Optional[ProgressJournal] = None,
+        shard: Optional[Task] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Processes a single text file, yielding each result as soon as it is ready.
+
+        In streaming mode (config.STREAMING) the file is read incrementally and
+        chunks and batches are produced lazily, so peak memory is bounded by
+        config.STREAM_WINDOW_SIZE rather than by the file size.
+
+        With config.CHUNK_MODE set to "tokens" or "approx", chunks are sized in
+        model tokens to fit the context budget (see _token_budget) and end on
+        word boundaries instead of being cut every chunk_size characters.
+
+        Up to the adaptive controller's concurrency (initially its batch size)
+        chunk requests are kept in flight at once; results are still yielded in
+        chunk order. Each completed request is reported back to the controller.
+
+        If a progress journal is given, chunks it already records as completed
+        are not sent to the LLM again, the file is split with the chunk and batch
+        sizes the journal was started with, and each new output is recorded.
+
+        If a shard is given, only its byte range of the file is read, streamed,
+        and PRE/POST_TOKEN_COUNT apply only to the first/last shard (every shard
+        still gets the same whitespace normalization). Each result
+        then carries the shard number.
+
+        With config.MMAP_INPUT the file is memory-mapped instead of read (see
+        _mapped_batches), so it may be larger than RAM and shards of it share
+        pages through the page cache.
+
+        If metrics is given, every chunk sent to the LLM is measured into it
+        (see metrics.ChunkMetrics); with config.CHUNK_METRICS each result
+        also carries its measurements under "metrics".
+
+        Args:
+            filepath: The path to the text file.
+            journal: An optional loaded or empty ProgressJournal for filepath.
+            shard: An optional byte-range Task for a part of filepath.
+            metrics: An optional Metrics to aggregate chunk measurements into.
+
+        Yields:
+            A dictionary containing the input chunk, the LLM output, and metadata.
+        """
         self.logger.log(f"Processing file: {filepath}")
+        chunk_size, _, batch_size = self.controller.adjust_parameters()
+        if self.config.CHUNK_MODE != "chars":
+            chunk_size = self._token_budget()
+        if journal is not None:
+            if journal.chunk_size is None:
+                journal.start(chunk_size, batch_size)
+            else:
+                chunk_size, batch_size = journal.chunk_size, journal.batch_size
+        name = os.path.basename(filepath)
+
+        if self.config.MMAP_INPUT:
+            if shard is not None:
+                name = f"{name} [shard {shard.shard + 1}/{shard.shards}]"
+            with self._mapped_batches(filepath, shard, chunk_size, batch_size) as batches:
+                for r in self._process_batches(batches, name, journal, metrics):
+                    if shard is not None:
+                        r["shard"] = shard.shard
+                    yield r
+            return
+
+        if shard is not None:
+            with open(filepath, "rb") as f:
+                pieces = iter_text(
+                    ByteRangeReader(f, shard.start, shard.end),
+                    self.config.STREAM_WINDOW_SIZE,
+                    self.config.PRE_TOKEN_COUNT if shard.shard == 0 else 0,
+                    self.config.POST_TOKEN_COUNT if shard.shard == shard.shards - 1 else 0,
+                    normalize=self.config.PRE_TOKEN_COUNT > 0 or self.config.POST_TOKEN_COUNT > 0,
+                )
+                batches = iter_batches(
+                    self._chunk(pieces, chunk_size), batch_size
+                )
+                name = f"{name} [shard {shard.shard + 1}/{shard.shards}]"
+                for r in self._process_batches(batches, name, journal, metrics):
+                    r["shard"] = shard.shard
+                    yield r
+            return
+
+        if self.config.STREAMING:
+            with open(filepath, "r", encoding="utf-8") as f:
+                pieces = iter_text(
+                    f,
+                    self.config.STREAM_WINDOW_SIZE,
+                    self.config.PRE_TOKEN_COUNT,
+                    self.config.POST_TOKEN_COUNT,
+                )
+                batches = iter_batches(
+                    self._chunk(pieces, chunk_size), batch_size
+                )
+                yield from self._process_batches(batches, name, journal, metrics)
+            return
+
         with open(filepath, "r", encoding="utf-8") as f:
             text = f.read()
 
@@ -63,69 +236,771 @@ class Harness:
         if self.config.POST_TOKEN_COUNT > 0:
             text = " ".join(text.split()[: -self.config.POST_TOKEN_COUNT])
 
-        chunk_size, _, batch_size = self.controller.adjust_parameters()
-        chunks = chunk_blocks(text, block_size=chunk_size)
+        if self.config.CHUNK_MODE == "chars":
+            chunks = chunk_blocks(text, block_size=chunk_size)
+        else:
+            chunks = list(self._chunk([text], chunk_size))
         batches = batch_chunks(chunks, batch_size=batch_size)
+        yield from self._process_batches(batches, name, journal, metrics, len(batches))
+
+    @contextmanager
+    def _mapped_batches(
+        self,
+        filepath: str,
+        shard: Optional[Task],
+        chunk_size: int,
+        batch_size: int,
+    ) -> Iterator[Iterable[Sequence[str]]]:
+        """
+        Memory-maps filepath and yields the batches of the file, or of the
+        shard's byte range, with the same chunks the other read paths produce.
+
+        In "chars" chunk mode without PRE/POST_TOKEN_COUNT, chunk boundaries
+        are indexed on the raw bytes (see chunk_engine.ChunkIndex) and each
+        chunk is decoded when it is sent. Otherwise, or if the range holds a
+        carriage return whose line ending text mode would translate, the
+        mapped bytes are decoded config.STREAM_WINDOW_SIZE at a time, as in
+        streaming mode. The map is closed on exit.
+        """
+        with open(filepath, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start, end = (shard.start, shard.end) if shard is not None else (0, size)
+            if start >= end:
+                yield []  # an empty file cannot be mapped
+                return
+            first = shard is None or shard.shard == 0
+            last = shard is None or shard.shard == shard.shards - 1
+            pre = self.config.PRE_TOKEN_COUNT if first else 0
+            post = self.config.POST_TOKEN_COUNT if last else 0
+            normalize = self.config.PRE_TOKEN_COUNT > 0 or self.config.POST_TOKEN_COUNT > 0
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if (
+                    self.config.CHUNK_MODE == "chars"
+                    and not normalize
+                    and mapped.find(b"\r", start, end) == -1
+                ):
+                    with ChunkIndex(mapped, chunk_size, start, end) as index:
+                        yield index.batches(batch_size)
+                else:
+                    pieces = iter_text(
+                        ByteRangeReader(mapped, start, end),
+                        self.config.STREAM_WINDOW_SIZE,
+                        pre,
+                        post,
+                        normalize=normalize,
+                    )
+                    yield iter_batches(self._chunk(pieces, chunk_size), batch_size)
+            finally:
+                mapped.close()
+
+    def _backend(self) -> LLMBackend:
+        """Returns the backend requests from this harness go to. Completions
+        are capped at config.RESERVED_OUTPUT_TOKENS, the output space token
+        chunking leaves free."""
+        if self.backend is not None:
+            return self.backend
+        return get_backend(
+            self.config.LLM_BACKEND or None, max_tokens=self.config.RESERVED_OUTPUT_TOKENS
+        )
+
+    def _token_budget(self) -> int:
+        """Returns the token budget per chunk: N_CTX minus the tokens reserved
+        for the output, prompt overhead and the shared prompt prefix, capped by
+        config.CHUNK_TOKENS."""
+        budget = (
+            self.config.N_CTX
+            - self.config.RESERVED_OUTPUT_TOKENS
+            - self.config.PROMPT_RESERVE_TOKENS
+        )
+        if llm_wrapper.PROMPT_PREFIX:
+            budget -= self._get_token_counter().count(llm_wrapper.PROMPT_PREFIX)
+        if self.config.CHUNK_TOKENS > 0:
+            budget = min(budget, self.config.CHUNK_TOKENS)
+        return max(1, budget)
+
+    def _get_token_counter(self) -> TokenCounter:
+        """Returns the token counter for config.CHUNK_MODE, creating it on first use."""
+        if self._token_counter is None:
+            self._token_counter = TokenCounter(
+                model_path=self.config.MODEL_PATH,
+                approximate=self.config.CHUNK_MODE == "approx",
+                chars_per_token=self.config.CHARS_PER_TOKEN,
+            )
+        return self._token_counter
+
+    def _chunk(self, pieces: Iterable[str], chunk_size: int) -> Iterator[str]:
+        """Chunks text pieces according to config.CHUNK_MODE."""
+        mode = self.config.CHUNK_MODE
+        if mode == "chars":
+            return iter_chunks(pieces, chunk_size)
+        if mode not in ("tokens", "approx"):
+            raise ValueError(f"Unknown CHUNK_MODE: {mode}")
+        return iter_token_chunks(pieces, chunk_size, self._get_token_counter().count)
+
+    def _process_batches(
+        self,
+        batches: Iterable[Sequence[str]],
+        name: str,
+        journal: Optional[ProgressJournal] = None,
+        metrics: Optional[Metrics] = None,
+        total: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Sends every chunk to the LLM, with up to controller.concurrency()
+        requests in flight, and yields the results in chunk order. With
+        config.BATCHED_INFERENCE, each batch is sent as a single call instead.
+        Chunks already completed in the journal are answered from it. A chunk
+        that still fails after retries gets an empty output and an "error".
+        Progress is logged against total batches if known, or for lazily
+        indexed batches (chunk_engine.ChunkBatch) as the share of bytes done."""
+        completed = journal.completed if journal is not None else {}
+        # seq -> time the chunk was read, for its queue wait
+        ready: Dict[int, float] = {}
+
+        def chunks() -> Iterator[Tuple[int, int, int, str, bool]]:
+            seq = 0
+            for batch_idx, batch in enumerate(batches):
+                self.logger.log(
+                    f"Processing batch {_progress(batch_idx, batch, total)} of {name}"
+                )
+                for chunk_idx, chunk in enumerate(batch):
+                    ready[seq] = time.monotonic()
+                    yield seq, batch_idx, chunk_idx, chunk, chunk_idx == len(batch) - 1
+                    seq += 1
+
+        in_flight = [0]
+        in_flight_lock = threading.Lock()
+
+        def tokens(prompt: str, response: str, usage: Usage) -> float:
+            """The tokens a request moved: as reported, or estimated from
+            its characters."""
+            if usage.prompt_tokens is not None and usage.completion_tokens is not None:
+                return usage.prompt_tokens + usage.completion_tokens
+            return (len(prompt) + len(response)) / self.config.CHARS_PER_TOKEN
+
+        def observe(
+            prompts: List[str], responses: List[str], usages: List[Usage], start: float
+        ) -> None:
+            decision = self.controller.observe(
+                sum(map(tokens, prompts, responses, usages)),
+                time.monotonic() - start,
+                in_flight[0],
+            )
+            if decision:
+                self.logger.log(decision)
+
+        def request(item: Tuple[int, int, int, str, bool]) -> Result:
+            seq, prompt = item[0], item[3]
+            read = ready.pop(seq)
+            if seq in completed:
+                return item, completed[seq], None
+            with in_flight_lock:
+                in_flight[0] += 1
+            start = time.monotonic()
+            usage = Usage()
+            try:
+                if self.config.STREAM_TOKENS:
+                    stats = StreamStats()
+                    response = "".join(
+                        stream_llm_response(
+                            prompt, stats=stats, backend=self._backend(), usage=usage
+                        )
+                    )
+                    self._log_stream_stats(item[1], item[2], stats)
+                else:
+                    response = get_llm_response(
+                        prompt, backend=self._backend(), usage=usage
+                    )
+                observe([prompt], [response], [usage], start)
+            except LLMError as e:
+                return item, e, ChunkMetrics(
+                    start - read, time.monotonic() - start, usage, ok=False
+                )
+            finally:
+                with in_flight_lock:
+                    in_flight[0] -= 1
+            return item, response, ChunkMetrics(start - read, time.monotonic() - start, usage)
+
+        def batched() -> Iterator[Result]:
+            seq = 0
+            for batch_idx, batch in enumerate(batches):
+                read = time.monotonic()
+                self.logger.log(
+                    f"Processing batch {_progress(batch_idx, batch, total)} of {name}"
+                )
+                todo = [i for i in range(len(batch)) if seq + i not in completed]
+                prompts = [batch[i] for i in todo]
+                usages = [Usage() for _ in todo]
+                start = time.monotonic()
+                in_flight[0] = len(prompts)
+                try:
+                    generated = get_llm_responses(
+                        prompts, backend=self._backend(), return_errors=True, usages=usages
+                    )
+                    ok = [i for i, r in enumerate(generated) if isinstance(r, str)]
+                    if ok:
+                        observe(
+                            [prompts[i] for i in ok],
+                            [generated[i] for i in ok],
+                            [usages[i] for i in ok],
+                            start,
+                        )
+                finally:
+                    in_flight[0] = 0
+                latency = time.monotonic() - start
+                responses = dict(zip(todo, generated))
+                measured = {
+                    i: ChunkMetrics(start - read, latency, u, ok=isinstance(r, str))
+                    for i, u, r in zip(todo, usages, generated)
+                }
+                for chunk_idx, chunk in enumerate(batch):
+                    response = responses.get(chunk_idx, completed.get(seq))
+                    item = (seq, batch_idx, chunk_idx, chunk, chunk_idx == len(batch) - 1)
+                    yield item, response, measured.get(chunk_idx)
+                    seq += 1
 
-        results: List[Dict[str, Any]] = []
-        for batch_idx, batch in enumerate(batches):
-            self.logger.log(
-                f"Processing batch {batch_idx + 1}/{len(batches)} of {os.path.basename(filepath)}"
+        if self.config.BATCHED_INFERENCE:
+            results = batched()
+        else:
+            results = ordered_map(
+                request,
+                chunks(),
+                self.controller.concurrency,
+                max_workers=self.controller.max_batch_size,
             )
-            batch_results: List[Dict[str, Any]] = []
-            for chunk_idx, chunk in enumerate(batch):
-                prompt = chunk
-                response = get_llm_response(prompt)
-                batch_results.append(
-                    {
-                        "input": chunk,
-                        "output": response,
-                        "chunk_idx": chunk_idx,
-                        "batch_idx": batch_idx,
-                    }
+
+        for item, response, chunk_metrics in results:
+            seq, batch_idx, chunk_idx, chunk, last = item
+            record = {
+                "input": chunk,
+                "output": response,
+                "chunk_idx": chunk_idx,
+                "batch_idx": batch_idx,
+            }
+            if isinstance(response, LLMError):
+                record["output"] = ""
+                record["error"] = str(response)
+                self.logger.log(
+                    f"Failed chunk {chunk_idx + 1} in batch {batch_idx + 1}: {response}"
                 )
+            else:
+                if journal is not None and seq not in completed:
+                    journal.record(seq, response)
                 self.logger.log(
                     f"Processed chunk {chunk_idx + 1} in batch {batch_idx + 1}"
                 )
-            results.extend(batch_results)
-            self.logger.log(f"Finished batch {batch_idx + 1}/{len(batches)}")
-        return results
-
-    def _process_and_save(self, filepath: str) -> None:
-        """Helper function for parallel processing."""
-        results = self.process_file(filepath)
-        base = os.path.basename(filepath)
-        txt_out = f"{base}.llm_output.txt"
-        jsonl_out = f"{base}.llm_output.jsonl"
-
-        with open(txt_out, "w", encoding="utf-8") as f:
-            for r in results:
-                f.write(r["output"].strip() + "\n")
-
-        write_jsonl(results, jsonl_out)
+            if chunk_metrics is not None:
+                if metrics is not None:
+                    metrics.observe(chunk_metrics)
+                if self.config.CHUNK_METRICS:
+                    record["metrics"] = chunk_metrics.as_dict()
+            yield record
+            if last:
+                self.logger.log(f"Finished batch {batch_idx + 1}{total}")
+
+    def _log_stream_stats(self, batch_idx: int, chunk_idx: int, stats: StreamStats) -> None:
+        """Logs the time to first token and inter-token latency of one chunk."""
+        if stats.ttft is None:
+            self.logger.log(f"Chunk {chunk_idx + 1} in batch {batch_idx + 1}: no tokens")
+            return
+        itl = stats.mean_inter_token_latency
+        itl = f"{itl * 1000:.1f} ms" if itl is not None else "n/a"
+        self.logger.log(
+            f"Chunk {chunk_idx + 1} in batch {batch_idx + 1}: TTFT {stats.ttft:.3f} s, "
+            f"{stats.tokens} tokens, mean inter-token latency {itl}"
+        )
+
+    def _process_task(self, task: Task) -> Metrics:
+        """Pool entry point: processes one whole file or one shard of a file.
+        Returns its metrics, which also reach the pool when it fails."""
+        if not self.logger.thread.is_alive():
+            # Forked pool workers inherit the logger without its writer thread
+            self.logger = AsyncLogger()
+        metrics = Metrics()
+        cache = get_response_cache()
+        lookups = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        try:
+            self._process_and_save(
+                task.path, task if task.shards > 1 else None, task.name or None, metrics
+            )
+        except Exception as e:
+            raise TaskFailed(traceback.format_exc(), metrics) from e
+        finally:
+            if cache is not None:
+                metrics.cache_hits = cache.hits - lookups[0]
+                metrics.cache_misses = cache.misses - lookups[1]
+                cache.flush()
+            # Workers may exit right after a task, killing the daemon threads
+            self.logger.flush()
+            get_logger().flush()
+        return metrics
+
+    def _chunking(self, shard: Optional[Task]) -> Dict[str, Any]:
+        """Returns the settings, besides chunk mode and sizes, that decide
+        where iter_process_file cuts chunks, for the progress journal."""
+        if self.config.MMAP_INPUT:
+            read = "mmap"
+        elif shard is not None or self.config.STREAMING:
+            read = "stream"
+        else:
+            read = "whole"
+        return {
+            "read": read,
+            "pre_token_count": self.config.PRE_TOKEN_COUNT,
+            "post_token_count": self.config.POST_TOKEN_COUNT,
+        }
+
+    def _process_and_save(
+        self,
+        filepath: str,
+        shard: Optional[Task] = None,
+        name: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """Helper function for parallel processing.
+
+        Results are written to the .txt output as soon as they arrive. The
+        records output, in config.OUTPUT_FORMAT (.jsonl by default), is
+        streamed to a temporary file (see output_sinks.open_sink,
+        config.JSONL_BUFFER_SIZE and JSONL_FSYNC) that replaces it once every
+        chunk has been written. With config.INPUT_BY_REFERENCE, records hold
+        their input's byte range in the file instead of the input itself (see
+        _inputs_by_reference).
+        A shard writes numbered part files, which process_directory merges.
+        Outputs are named after name, or the file's base name if not given.
+        In resume mode (config.RESUME), progress is journaled per chunk, files
+        whose journal is complete are skipped, and interrupted files continue
+        from their last completed chunk.
+
+        Chunks that fail after retries are left out of the .txt output and
+        recorded with an "error" in the records output; the file then raises
+        RuntimeError. Their journal stays incomplete, so a resumed run only
+        reprocesses the failed chunks.
+
+        Chunk measurements go into metrics, if given, and are summarized in
+        the log.
+        """
+        base = name or os.path.basename(filepath)
+        txt_out, records_out = _output_paths(
+            base, shard.shard if shard else None, self.config.OUTPUT_FORMAT
+        )
+        if shard is not None:
+            base = f"{base} [shard {shard.shard + 1}/{shard.shards}]"
+
+        journal = None
+        if self.config.RESUME:
+            journal = ProgressJournal(
+                self.config.JOURNAL_DIR,
+                filepath,
+                self.config.CHUNK_MODE,
+                (shard.start, shard.end) if shard else None,
+                self._chunking(shard),
+            )
+            if journal.load():
+                if journal.done and os.path.exists(txt_out) and os.path.exists(records_out):
+                    self.logger.log(f"Skipping {base}: already complete")
+                    return
+                journal.resume()
+                self.logger.log(
+                    f"Resuming {base} with {len(journal.completed)} chunks done"
+                )
+
+        failed = 0
+        start = time.monotonic()
+        try:
+            records = self.iter_process_file(filepath, journal, shard, metrics)
+            if self.config.INPUT_BY_REFERENCE:
+                records = self._inputs_by_reference(
+                    records, filepath, shard.start if shard else 0, base
+                )
+            with open(txt_out, "w", encoding="utf-8") as txt_f, open_sink(
+                records_out,
+                file=os.path.abspath(filepath),
+                buffer_size=self.config.JSONL_BUFFER_SIZE,
+                fsync=self.config.JSONL_FSYNC,
+            ) as sink:
+                for r in records:
+                    if "error" in r:
+                        failed += 1
+                    else:
+                        txt_f.write(r["output"].strip() + "\n")
+                    sink.write(r)
+                    txt_f.flush()
+            if journal is not None and not failed:
+                journal.finish()
+        finally:
+            if journal is not None:
+                journal.close()
+            if metrics is not None:
+                metrics.seconds = time.monotonic() - start
+                self.logger.log(f"Metrics for {base}: {metrics.summary()}")
+        if failed:
+            raise RuntimeError(
+                f"{failed} chunk(s) of {base} failed; they are marked with \"error\" "
+                f"in {records_out} (see Harness.retry_failed)"
+            )
         self.logger.log(f"Wrote outputs for {base}")
 
+    def retry_failed(self, output_path: str) -> int:
+        """
+        Re-sends the chunks recorded as failed in a records output.
+
+        The records output and the matching .txt output are rewritten in place
+        with the new results; other chunks are left as they are.
+
+        Args:
+            output_path: A .llm_output records file written by the harness, in
+                         any of output_sinks.FORMATS.
+
+        Returns:
+            The number of chunks that still failed.
+        """
+        records = list(read_records(output_path))
+        failed = [r for r in records if "error" in r]
+        if failed:
+            responses = get_llm_responses(
+                [read_input(r) for r in failed], backend=self._backend(), return_errors=True
+            )
+            for record, response in zip(failed, responses):
+                if isinstance(response, LLMError):
+                    record["error"] = str(response)
+                else:
+                    record["output"] = response
+                    del record["error"]
+
+        txt_path = output_path[: -len(output_format(output_path))] + "txt"
+        with open(txt_path + ".tmp", "w", encoding="utf-8") as f:
+            for record in records:
+                if "error" not in record:
+                    f.write(record["output"].strip() + "\n")
+        with open_sink(output_path, fsync=self.config.JSONL_FSYNC) as sink:
+            sink.write_many(records)
+        os.replace(txt_path + ".tmp", txt_path)
+
+        remaining = sum("error" in r for r in records)
+        self.logger.log(
+            f"Retried {len(failed)} failed chunks in {output_path}; {remaining} still failing"
+        )
+        return remaining
+
+    def _inputs_by_reference(
+        self,
+        records: Iterable[Dict[str, Any]],
+        filepath: str,
+        offset: int,
+        name: str,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Replaces each record's "input" with its byte range in filepath
+        ("file", "input_offset", "input_length"; see output_sinks.read_input).
+
+        Chunks are expected to tile the text from byte offset on. Each one is
+        checked against the file's bytes; from the first that does not match
+        (the text was rewritten by PRE/POST_TOKEN_COUNT, or its newlines were
+        translated), inputs are kept by value.
+        """
+        path = os.path.abspath(filepath)
+        by_reference = True
+        with open(filepath, "rb") as f:
+            for r in records:
+                data = r["input"].encode("utf-8")
+                if by_reference:
+                    f.seek(offset)
+                    by_reference = f.read(len(data)) == data
+                    if not by_reference:
+                        self.logger.log(
+                            f"Storing inputs of {name} by value from chunk "
+                            f"{r['chunk_idx'] + 1} in batch {r['batch_idx'] + 1}: "
+                            "they do not match the file's bytes"
+                        )
+                if by_reference:
+                    del r["input"]
+                    r = {"file": path, "input_offset": offset, "input_length": len(data), **r}
+                offset += len(data)
+                yield r
+
+    def _start_metrics(self) -> RunMetrics:
+        """Creates the run's metrics, serving them over HTTP on
+        config.METRICS_PORT if set."""
+        run_metrics = RunMetrics()
+        if self.config.METRICS_PORT:
+            run_metrics.serve(self.config.METRICS_PORT)
+            self.logger.log(f"Serving metrics on port {self.config.METRICS_PORT}")
+        return run_metrics
+
+    def _add_metrics(self, run_metrics: RunMetrics, task: Task, metrics: Metrics) -> None:
+        """Adds a finished task's metrics to the run and refreshes
+        config.METRICS_PATH, if set."""
+        run_metrics.add(task.name or os.path.basename(task.path), metrics)
+        if self.config.METRICS_PATH:
+            run_metrics.write(self.config.METRICS_PATH)
+
+    def _finish_metrics(self, run_metrics: RunMetrics) -> None:
+        """Logs the run summary, writes the final metrics and stops serving."""
+        self.logger.log(f"Run metrics: {run_metrics.summary()}")
+        if self.config.METRICS_PATH:
+            run_metrics.write(self.config.METRICS_PATH)
+        run_metrics.close()
+
+    def _pool_settings(
+        self, num_workers: Optional[int]
+    ) -> Tuple[int, int, Optional[Callable[[int, int], int]]]:
+        """Returns the initial size, maximum size and resize callback for the
+        worker pool; a fixed num_workers disables resizing."""
+        if num_workers:
+            return num_workers, num_workers, None
+        _, size, _ = self.controller.adjust_parameters()
+
+        def target(current: int, pending: int) -> int:
+            workers = self.controller.target_workers(current, pending)
+            if workers != current:
+                self.logger.log(f"Scaling workers {current} -> {workers}")
+            return workers
+
+        return size, self.config.MAX_PROCESSES, target
+
+    @contextmanager
+    def _shared_local_model(self) -> Iterator[None]:
+        """In local LLM mode, serves one model to all workers for the duration
+        (see local_model_server)."""
+        backend = self._backend()
+        if not isinstance(backend, LocalBackend) or not self.config.SHARED_LOCAL_MODEL:
+            yield
+            return
+        shared_model = llm_wrapper.LLM_SHARED_MODEL
+        ipc = local_model_server.LLM_IPC_ADDRESS, local_model_server.LLM_IPC_AUTHKEY
+        model_server = local_model_server.start_server(model=backend.model)
+        local_model_server.use_server(model_server.address, model_server.authkey)
+        llm_wrapper.LLM_SHARED_MODEL = True
+        os.environ["LLM_SHARED_MODEL"] = "1"
+        if self.backend is not None:
+            self.backend.shared = True
+        self.logger.log("Sharing one local model across workers.")
+        try:
+            yield
+        finally:
+            local_model_server.stop_server(model_server)
+            local_model_server.use_server(*ipc)
+            llm_wrapper.LLM_SHARED_MODEL = shared_model
+            if self.backend is not None:
+                self.backend.shared = shared_model
+            if not shared_model:
+                os.environ.pop("LLM_SHARED_MODEL", None)
+
     def process_directory(
         self, directory: Optional[str] = None, num_workers: Optional[int] = None
     ) -> None:
         """
         Processes all text files in a directory in parallel.
 
+        Input files are found by discovery.scan (recursive unless
+        config.RECURSIVE is off, filtered by config.INCLUDE/EXCLUDE). If
+        config.MANIFEST_PATH is set, only files that are new or changed since
+        the last successful run are processed. Files in subdirectories get
+        outputs named after their relative path, with separators replaced by
+        "__".
+
+        Files are scheduled largest first, one at a time per worker, so idle
+        workers pick up the remaining work. Files larger than config.SHARD_SIZE
+        bytes (if set) are split into shards that run in parallel; their part
+        outputs are merged in order once every shard has finished.
+
+        Chunk metrics are aggregated per file and for the run, summarized in
+        the log, and exported in the Prometheus text format to
+        config.METRICS_PATH and/or on config.METRICS_PORT (see _start_metrics).
+
         Args:
             directory: The directory to process. If None, the directory from the
                        config is used.
-            num_workers: The number of worker processes to use. If None, it defaults
-                         to the number of CPU cores.
+            num_workers: The number of worker processes to use. If None, the pool
+                         starts at the adaptive controller's process count and
+                         grows or shrinks during the run (up to MAX_PROCESSES)
+                         based on measured CPU contention.
+
+        Raises:
+            RuntimeError: If any file failed to process.
         """
         self.logger.log("Harness started.")
         directory = directory or self.config.DATA_DIR
-        data_files = glob.glob(os.path.join(directory, "*"))
+        entries = list(
+            scan(
+                directory,
+                recursive=self.config.RECURSIVE,
+                include=self.config.INCLUDE,
+                exclude=self.config.EXCLUDE,
+                follow_symlinks=self.config.FOLLOW_SYMLINKS,
+            )
+        )
+        manifest = Manifest(self.config.MANIFEST_PATH) if self.config.MANIFEST_PATH else None
+        if manifest is not None:
+            found = len(entries)
+            entries = manifest.changed(entries)
+            self.logger.log(f"{len(entries)} of {found} files are new or changed")
+        names = {e.path: e.relpath.replace(os.sep, "__") for e in entries}
+        tasks = plan_tasks([e.path for e in entries], self.config.SHARD_SIZE, names)
 
-        if not num_workers:
-            num_workers = cpu_count()
+        size, max_size, target = self._pool_settings(num_workers)
+        run_metrics = self._start_metrics()
+        with self._shared_local_model(), ElasticPool(
+            self._process_task,
+            size,
+            max_size=max_size,
+            initializer=_init_worker,
+            on_result=lambda task, metrics: self._add_metrics(run_metrics, task, metrics),
+        ) as pool:
+            errors = pool.run(tasks, target=target)
+        self._finish_metrics(run_metrics)
 
-        with Pool(processes=num_workers) as pool:
-            pool.map(self._process_and_save, data_files)
+        for task, error in errors:
+            self.logger.log(f"Failed: {task.path} (shard {task.shard + 1}/{task.shards}): {error}")
+        failed = {task.path for task, _ in errors}
+        for task in tasks:
+            if task.shards > 1 and task.shard == 0 and task.path not in failed:
+                _merge_shards(task.name, task.shards, self.config.OUTPUT_FORMAT)
+        if manifest is not None:
+            for entry in entries:
+                if entry.path not in failed:
+                    manifest.record(entry)
+            manifest.save()
+        if errors:
+            raise RuntimeError(f"{len(errors)} file(s) failed; see {self.logger.log_file}")
 
         self.logger.log("Harness complete.")
-        self.logger.shutdown()
\ No newline at end of file
+        self.logger.shutdown()
+
+    def watch_directory(
+        self,
+        directory: Optional[str] = None,
+        num_workers: Optional[int] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> None:
+        """
+        Processes files continuously as they land in a directory.
+
+        A DirectoryWatcher (inotify, or polling as a fallback) reports files once
+        they have stopped changing for config.WATCH_SETTLE seconds. They are
+        processed by one long-lived worker pool, so the pool (and, in local
+        mode, the shared model) stays warm between files. When more than
+        config.WATCH_MAX_PENDING tasks are queued, newly settled files wait in
+        a backlog until the pool catches up. Discovery filters, sharding, the
+        manifest and metrics work as in process_directory.
+
+        Args:
+            directory: The directory to watch. If None, the directory from the
+                       config is used.
+            num_workers: The number of worker processes, as in process_directory.
+            stop: An optional event that ends the loop when set; otherwise it runs
+                  until interrupted.
+        """
+        directory = directory or self.config.DATA_DIR
+        stop = stop or threading.Event()
+        watcher = DirectoryWatcher(
+            directory,
+            recursive=self.config.RECURSIVE,
+            include=self.config.INCLUDE,
+            exclude=self.config.EXCLUDE,
+            follow_symlinks=self.config.FOLLOW_SYMLINKS,
+            settle=self.config.WATCH_SETTLE,
+            poll_interval=self.config.WATCH_POLL_INTERVAL,
+        )
+        mode = "inotify" if watcher.uses_inotify else "polling"
+        self.logger.log(f"Watching {directory} ({mode}).")
+        manifest = Manifest(self.config.MANIFEST_PATH) if self.config.MANIFEST_PATH else None
+        size, max_size, target = self._pool_settings(num_workers)
+        max_pending = self.config.WATCH_MAX_PENDING or 2 * max_size
+        backlog: Deque[FileEntry] = deque()
+        # path -> [entry, shards still running, failed]
+        active: Dict[str, List[Any]] = {}
+        waiting = 0
+        next_check = time.monotonic()
+        run_metrics = self._start_metrics()
+
+        with self._shared_local_model(), ElasticPool(
+            self._process_task,
+            size,
+            max_size=max_size,
+            initializer=_init_worker,
+            on_result=lambda task, metrics: self._add_metrics(run_metrics, task, metrics),
+        ) as pool:
+            try:
+                while not stop.is_set():
+                    ready = watcher.poll()
+                    if manifest is not None:
+                        ready = manifest.changed(ready)
+                    backlog.extend(ready)
+
+                    while backlog and pool.pending < max_pending:
+                        entry = backlog.popleft()
+                        if entry.path in active:
+                            backlog.append(entry)  # still running; retry later
+                            break
+                        name = entry.relpath.replace(os.sep, "__")
+                        tasks = plan_tasks(
+                            [entry.path], self.config.SHARD_SIZE, {entry.path: name}
+                        )
+                        active[entry.path] = [entry, len(tasks), False]
+                        for task in tasks:
+                            pool.submit(task)
+                    if backlog and len(backlog) != waiting:
+                        self.logger.log(f"Backpressure: {len(backlog)} files waiting")
+                    waiting = len(backlog)
+
+                    for task, error in pool.poll(timeout=0):
+                        state = active[task.path]
+                        state[1] -= 1
+                        if error:
+                            state[2] = True
+                            self.logger.log(f"Failed: {task.path}: {error}")
+                        if state[1] == 0:
+                            del active[task.path]
+                            if state[2]:
+                                continue
+                            if task.shards > 1:
+                                _merge_shards(task.name, task.shards, self.config.OUTPUT_FORMAT)
+                            if manifest is not None:
+                                manifest.record(state[0])
+                                manifest.save()
+
+                    if target is not None and time.monotonic() >= next_check:
+                        next_check = time.monotonic() + 2.0
+                        pool.resize(target(pool.size, pool.waiting))
+            except KeyboardInterrupt:
+                pass
+            finally:
+                watcher.close()
+        self._finish_metrics(run_metrics)
+        self.logger.log("Watcher stopped.")
+        self.logger.shutdown()
+
+
+def _progress(batch_idx: int, batch: Sequence[str], total: Optional[int]) -> str:
+    """Describes how far into its input a batch is, for the log."""
+    if total is not None:
+        return f"{batch_idx + 1}/{total}"
+    if isinstance(batch, ChunkBatch):
+        index = batch.index
+        done = (batch.end - index.start) / (index.end - index.start)
+        return f"{batch_idx + 1} ({done:.0%} of the bytes)"
+    return str(batch_idx + 1)
+
+def _init_worker(pool_size: int) -> None:
+    """Splits the physical cores between the workers of a pool of the size
+    it had when this worker started, so that workers x llama.cpp threads
+    fits the CPU. The pool only grows while CPU usage is low, and workers
+    started by a later resize get their share of the new size. Only takes
+    effect for models a worker loads itself (not the shared local model)."""
+    cores = psutil.cpu_count(logical=False) or cpu_count()
+    llm_wrapper.N_THREADS = max(1, min(llm_wrapper.N_THREADS, cores // pool_size))
+
+
+def _output_paths(
+    base: str, shard: Optional[int] = None, fmt: str = "jsonl"
+) -> Tuple[str, str]:
+    """Returns the .txt and records output paths for a file, or for one shard."""
+    part = f".part{shard:04d}" if shard is not None else ""
+    return f"{base}.llm_output{part}.txt", f"{base}.llm_output{part}.{fmt}"
+
+def _merge_shards(base: str, shards: int, fmt: str = "jsonl") -> None:
+    """Merges a file's shard outputs in order and removes the parts."""
+    for i, final in enumerate(_output_paths(base, fmt=fmt)):
+        merge_outputs([_output_paths(base, shard, fmt)[i] for shard in range(shards)], final)
@@ -0,0 +1,47 @@
+import os
+import threading
+from typing import Optional
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "180"))
+
+# (connect, read) timeout tuple accepted by requests
+TIMEOUT = (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+
+_session: Optional["requests.Session"] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+def get_session() -> "requests.Session":
+    """
+    Returns the per-process pooled HTTP session, creating it on first use.
+
+    The session keeps connections alive and is reused across all chunks and
+    files handled by a worker, so requests skip the TCP handshake. A forked
+    worker never reuses its parent's sockets; it builds its own session.
+
+    Raises:
+        ImportError: If the requests library is not installed.
+    """
+    global _session, _session_pid
+    if requests is None:
+        raise ImportError("requests library is required for server mode")
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=LLM_POOL_SIZE, pool_maxsize=LLM_POOL_SIZE
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session, _session_pid = session, pid
+    return _session
@@ -1,12 +1,209 @@
+import gzip
 import json
-from typing import List, Dict, Any
+import os
+import time
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Union
 
-def write_jsonl(output_list: List[Dict[str, Any]], output_file: str) -> None:
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def dumps(item: Dict[str, Any]) -> bytes:
+    """
+    Serializes a dict as one JSONL line (UTF-8, with the trailing newline).
+    Uses orjson when it is installed; the stdlib fallback produces the same
+    compact output, up to how floats are spelled.
+    """
+    if orjson is not None:
+        return orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+def parse_fsync_policy(value: Union[str, float]) -> Union[str, float]:
+    """Parses an fsync policy: "never", "close", "always", or a number of
+    seconds between fsyncs."""
+    if isinstance(value, str) and value.strip().lower() in ("never", "close", "always"):
+        return value.strip().lower()
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Unknown fsync policy: {value}") from None
+
+class JsonlWriter:
+    """
+    Streaming JSONL writer.
+
+    Records are serialized as they are written and buffered in memory until
+    buffer_size bytes are pending, so the file sees a few large writes
+    instead of one per record.
+
+    By default the records go to a temporary file next to path ("<path>.tmp"),
+    which close renames over path: path only ever holds a complete output.
+    If the writer is aborted (or its with block raises), path is left as it
+    was and the temporary file keeps the records written so far. With
+    append=True, records are appended to path itself instead.
+
+    The fsync policy sets how durable pending records are: "never" leaves
+    it to the OS, "close" syncs once before the rename (the default), "always"
+    syncs after every record, and a number syncs at most that many seconds
+    apart.
+
+    With compression set to "gzip" or "zstd" (the optional zstandard
+    package), the file is compressed as it is written. Appending adds a
+    new gzip member or zstd frame, which decompressors read as one stream.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        append: bool = False,
+        buffer_size: int = 1 << 20,
+        fsync: Union[str, float] = "close",
+        compression: Optional[str] = None,
+        level: Optional[int] = None,
+    ) -> None:
+        """
+        Initializes the JsonlWriter and opens its file.
+
+        Args:
+            path: The output file.
+            append: Whether to append to path instead of replacing it atomically.
+            buffer_size: Bytes buffered before they are written out.
+            fsync: The fsync policy (see parse_fsync_policy).
+            compression: None, "gzip" or "zstd".
+            level: The compression level; None uses the codec's default.
+
+        Raises:
+            ImportError: If compression is "zstd" and zstandard is not installed.
+        """
+        self.path = path
+        self.append = append
+        self.buffer_size = buffer_size
+        self.fsync = parse_fsync_policy(fsync)
+        self.records = 0
+        self.target = path if append else f"{path}.tmp"
+        self._raw = open(self.target, "ab" if append else "wb", buffering=0)
+        try:
+            self._f = _compressor(self._raw, compression, level)
+        except BaseException:
+            self._raw.close()
+            if not append:
+                os.remove(self.target)
+            raise
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Appends one record."""
+        line = dumps(record)
+        self._pending.append(line)
+        self._pending_size += len(line)
+        self.records += 1
+        if self.fsync == "always" or (
+            isinstance(self.fsync, float) and time.monotonic() - self._last_sync >= self.fsync
+        ):
+            self.sync()
+        elif self._pending_size >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        """Writes the buffered records to the file (not necessarily to disk)."""
+        if self._pending:
+            self._f.write(b"".join(self._pending))
+            self._pending, self._pending_size = [], 0
+
+    def sync(self) -> None:
+        """Flushes and fsyncs the file."""
+        self.flush()
+        if self._f is not self._raw:
+            self._f.flush()  # a decodable point in the compressed stream
+        os.fsync(self._raw.fileno())
+        self._last_sync = time.monotonic()
+
+    @property
+    def closed(self) -> bool:
+        return self._raw.closed
+
+    def _finish(self) -> None:
+        """Writes out the buffered records and ends the compressed stream."""
+        self.flush()
+        if self._f is not self._raw:
+            self._f.close()
+
+    def close(self) -> None:
+        """Writes out every record and, unless appending, moves the file into
+        place."""
+        if self.closed:
+            return
+        self._finish()
+        if self.fsync != "never":
+            os.fsync(self._raw.fileno())
+        self._raw.close()
+        if not self.append:
+            os.replace(self.target, self.path)
+            if self.fsync != "never":
+                _sync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+    def abort(self) -> None:
+        """Writes out the buffered records and closes the file without moving
+        it into place."""
+        if not self.closed:
+            self._finish()
+            self._raw.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def _compressor(raw: BinaryIO, compression: Optional[str], level: Optional[int]) -> BinaryIO:
+    """Wraps raw in a compressing writer that leaves raw open on close."""
+    if not compression:
+        return raw
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6 if level is None else level)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd-compressed output")
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_writer(raw, closefd=False)
+    raise ValueError(f"Unknown compression: {compression}")
+
+def _sync_directory(directory: str) -> None:
+    """Makes a rename in directory durable, where the OS supports it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_jsonl(
+    output_list: Iterable[Dict[str, Any]],
+    output_file: str,
+    fsync: Union[str, float] = "close",
+) -> None:
     """
-    Writes a list of dicts to a JSONL (JSON Lines) file.
-    Each dict in output_list is written as a line in output_file.
+    Writes dicts to a JSONL (JSON Lines) file, one per line.
+    The file is replaced atomically (see JsonlWriter).
     """
-    with open(output_file, "w", encoding="utf-8") as f:
-        for item in output_list:
-            json.dump(item, f)
-            f.write("\n")
\ No newline at end of file
+    with JsonlWriter(output_file, fsync=fsync) as writer:
+        writer.write_many(output_list)
@@ -1,8 +1,7 @@
-import requests
-import os
 from typing import Optional
 
-LLM_SERVER_URL = os.getenv("LLM_SERVER_URL", "http://localhost:8000/generate")
+from .backends import LLMError, ServerBackend
+from .unified_llm_wrapper import server_urls
 
 def get_llm_response(
     prompt: str,
@@ -12,22 +11,16 @@ def get_llm_response(
 ) -> str:
     """
     Sends a prompt to a local LLM server and returns the generated response.
-    Optionally override model, n_threads, and n_ctx per request.
-    """
-    payload = {
-        "prompt": prompt,
-    }
-    if model:
-        payload["model"] = model
-    if n_threads:
-        payload["n_threads"] = n_threads
-    if n_ctx:
-        payload["n_ctx"] = n_ctx
+    Optionally override model, n_threads, and n_ctx per request; settings
+    that are not overridden are left to the server.
 
+    Kept for compatibility: this is the "server" backend of
+    unified_llm_wrapper, without its response cache or prompt prefix. As
+    before, errors are printed and answered with an empty string.
+    """
     try:
-        response = requests.post(LLM_SERVER_URL, json=payload, timeout=180)
-        response.raise_for_status()
-        return response.json().get("response", "")
-    except requests.exceptions.RequestException as e:
-        print(f"Error communicating with LLM server: {e}")
-        return ""
\ No newline at end of file
+        backend = ServerBackend(server_urls(), model, n_threads, n_ctx, max_tokens=None, stop=())
+        return backend.generate(prompt)
+    except LLMError as e:
+        print(e)
+        return ""
@@ -0,0 +1,248 @@
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from .async_logger import get_logger
+from .http_client import LLM_CONNECT_TIMEOUT, get_session
+
+# "least_outstanding" or "latency" (see LoadBalancer)
+LLM_LB_POLICY = os.getenv("LLM_LB_POLICY", "least_outstanding")
+LLM_HEALTH_PATH = os.getenv("LLM_HEALTH_PATH", "/health")
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "5.0"))
+# Consecutive failures before an endpoint is ejected
+LLM_EJECT_FAILURES = int(os.getenv("LLM_EJECT_FAILURES", "3"))
+# Eject endpoints whose smoothed latency exceeds this multiple of the others' median
+LLM_EJECT_SLOW_FACTOR = float(os.getenv("LLM_EJECT_SLOW_FACTOR", "3.0"))
+# Minimum seconds an ejected endpoint stays out before a health check can readmit it
+LLM_EJECT_COOLDOWN = float(os.getenv("LLM_EJECT_COOLDOWN", "30.0"))
+LLM_LATENCY_ALPHA = float(os.getenv("LLM_LATENCY_ALPHA", "0.2"))
+
+class NoEndpointAvailable(Exception):
+    """Every endpoint is ejected and none is due for a trial request.
+    retry_after is the number of seconds until the next one is due."""
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class Endpoint:
+    """Routing state of one server."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.outstanding = 0
+        self.latency: Optional[float] = None  # EWMA of request seconds
+        self.failures = 0  # consecutive
+        self.requests = 0
+        self.ejected = False
+        self.ejected_until = 0.0
+        self.probing = False  # a trial request is in flight
+
+    def health_url(self, path: str) -> str:
+        parts = urlsplit(self.url)
+        return f"{parts.scheme}://{parts.netloc}{path}"
+
+class LoadBalancer:
+    """
+    Spreads requests over one or more servers running the same model.
+
+    Policies:
+    - "least_outstanding": the endpoint with the fewest requests in flight,
+      ties broken by lower latency.
+    - "latency": the lowest expected wait, (in flight + 1) x smoothed latency.
+
+    Each endpoint has a circuit breaker. It is ejected (the circuit opens)
+    after max_failures consecutive failed requests or health checks, or when
+    its smoothed latency exceeds slow_factor times the median of the other
+    endpoints. A background thread checks every endpoint's health URL; an
+    ejected endpoint is readmitted once the cooldown has passed and a check
+    succeeds. If every endpoint is ejected, one whose cooldown has passed
+    gets a single trial request (half-open) that readmits it on success;
+    otherwise acquire raises NoEndpointAvailable.
+
+    Routing state is per process: each worker balances its own requests.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        policy: str = LLM_LB_POLICY,
+        health_path: str = LLM_HEALTH_PATH,
+        health_interval: float = LLM_HEALTH_INTERVAL,
+        max_failures: int = LLM_EJECT_FAILURES,
+        slow_factor: float = LLM_EJECT_SLOW_FACTOR,
+        cooldown: float = LLM_EJECT_COOLDOWN,
+        alpha: float = LLM_LATENCY_ALPHA,
+    ) -> None:
+        if policy not in ("least_outstanding", "latency"):
+            raise ValueError(f"Unknown LLM_LB_POLICY: {policy}")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.policy = policy
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.slow_factor = slow_factor
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if health_interval > 0:
+            self._thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._thread.start()
+
+    def acquire(self) -> Endpoint:
+        """Picks an endpoint for one request and counts it as in flight.
+        Every acquire must be paired with a release."""
+        with self._lock:
+            candidates = [e for e in self.endpoints if not e.ejected]
+            if candidates:
+                # Endpoints without a measurement yet are assumed to be typical
+                known = [e.latency for e in candidates if e.latency is not None]
+                typical = statistics.median(known) if known else 0.0
+
+                def key(e: Endpoint) -> Tuple[float, ...]:
+                    latency = typical if e.latency is None else e.latency
+                    if self.policy == "latency":
+                        return ((e.outstanding + 1) * latency, e.outstanding)
+                    return (e.outstanding, latency)
+
+                endpoint = min(candidates, key=key)
+            else:
+                now = time.monotonic()
+                due = [
+                    e for e in self.endpoints if not e.probing and now >= e.ejected_until
+                ]
+                if not due:
+                    wait = min(e.ejected_until for e in self.endpoints) - now
+                    raise NoEndpointAvailable(
+                        f"All {len(self.endpoints)} LLM endpoints are ejected",
+                        retry_after=max(wait, 0.0),
+                    )
+                endpoint = min(due, key=lambda e: e.failures)
+                endpoint.probing = True
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: float, ok: bool) -> None:
+        """Records the outcome of a request started with acquire."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if endpoint.probing:
+                endpoint.probing = False
+                if ok:
+                    self._readmit(endpoint)
+                else:
+                    self._eject(endpoint, "trial request failed")
+                    return
+            if not ok:
+                self._failed(endpoint, "request failed")
+                return
+            endpoint.failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += self.alpha * (latency - endpoint.latency)
+            others = [
+                e.latency for e in self.endpoints
+                if e is not endpoint and not e.ejected and e.latency is not None
+            ]
+            if (
+                not endpoint.ejected
+                and others
+                and endpoint.latency > self.slow_factor * statistics.median(others)
+            ):
+                self._eject(endpoint, f"slow ({endpoint.latency:.2f} s)")
+
+    def _failed(self, endpoint: Endpoint, reason: str) -> None:
+        """Must hold _lock."""
+        endpoint.failures += 1
+        if not endpoint.ejected and endpoint.failures >= self.max_failures:
+            self._eject(endpoint, f"{reason} {endpoint.failures} times")
+
+    def _eject(self, endpoint: Endpoint, reason: str) -> None:
+        """Must hold _lock."""
+        endpoint.ejected = True
+        endpoint.ejected_until = time.monotonic() + self.cooldown
+        get_logger().log(f"Ejecting LLM endpoint {endpoint.url}: {reason}")
+
+    def _readmit(self, endpoint: Endpoint) -> None:
+        """Must hold _lock."""
+        endpoint.ejected = False
+        endpoint.failures = 0
+        endpoint.latency = None  # judge it on fresh requests
+        get_logger().log(f"Readmitting LLM endpoint {endpoint.url}")
+
+    def _check(self, endpoint: Endpoint) -> bool:
+        """A server that answers with anything but a 5xx is up, even if it has
+        no health route (404)."""
+        try:
+            response = get_session().get(
+                endpoint.health_url(self.health_path), timeout=LLM_CONNECT_TIMEOUT
+            )
+            return response.status_code < 500
+        except Exception:
+            return False
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            for endpoint in self.endpoints:
+                healthy = self._check(endpoint)
+                with self._lock:
+                    if not healthy:
+                        self._failed(endpoint, "health check failed")
+                    elif (
+                        endpoint.ejected
+                        and not endpoint.probing
+                        and time.monotonic() >= endpoint.ejected_until
+                    ):
+                        self._readmit(endpoint)
+
+    def stats(self) -> List[Dict[str, object]]:
+        """Returns a snapshot of every endpoint's routing state."""
+        with self._lock:
+            return [
+                {
+                    "url": e.url,
+                    "outstanding": e.outstanding,
+                    "latency": e.latency,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "ejected": e.ejected,
+                }
+                for e in self.endpoints
+            ]
+
+    def close(self) -> None:
+        """Stops the health checks."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+_balancers: Dict[Tuple[str, ...], LoadBalancer] = {}
+_balancers_pid: Optional[int] = None
+_balancers_lock = threading.Lock()
+
+def get_balancer(urls: Sequence[str]) -> LoadBalancer:
+    """
+    Returns this process's load balancer for a set of endpoints, creating it
+    on first use. A forked worker starts its own, with its own health checks.
+    A single endpoint has nothing to balance and gets no health checks: its
+    circuit breaker alone fails requests fast while it is ejected, and the
+    trial request after the cooldown readmits it.
+    """
+    global _balancers, _balancers_pid
+    key = tuple(urls)
+    pid = os.getpid()
+    with _balancers_lock:
+        if _balancers_pid != pid:
+            _balancers, _balancers_pid = {}, pid
+        balancer = _balancers.get(key)
+        if balancer is None:
+            health_interval = LLM_HEALTH_INTERVAL if len(key) > 1 else 0.0
+            balancer = _balancers[key] = LoadBalancer(key, health_interval=health_interval)
+        return balancer
@@ -0,0 +1,236 @@
+import os
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError, Process
+from multiprocessing.connection import Client, Connection, Listener
+from typing import List, Optional
+
+from . import unified_llm_wrapper as llm
+from .async_logger import AsyncLogger, get_logger
+from .backends import LLMError, LocalBackend, Usage
+
+# Unix socket the model-owning process listens on. Left unset, start_server
+# listens in a private directory created for the run; set it together with
+# LLM_IPC_AUTHKEY to share one server between runs.
+LLM_IPC_ADDRESS = os.getenv("LLM_IPC_ADDRESS", "")
+# Key clients authenticate with; start_server generates one per run if unset
+LLM_IPC_AUTHKEY = os.getenv("LLM_IPC_AUTHKEY", "")
+
+def _handle(conn: Connection, backend: LocalBackend, logger: AsyncLogger) -> None:
+    """Serves requests from one client connection until it closes."""
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == "ping":
+                conn.send(("pong", backend.model))
+            elif message[0] == "complete":
+                prompts: List[str] = message[1]
+                usages = [Usage() for _ in prompts] if message[2:] and message[2] else None
+                try:
+                    responses = backend.generate_batch(prompts, usages)
+                    conn.send((responses, usages) if usages is not None else responses)
+                except LLMError as e:
+                    conn.send(e)
+                except Exception as e:
+                    logger.log(f"Local model server error: {e!r}")
+                    logger.flush()
+                    conn.send(LLMError(f"Local model server error: {e!r}"))
+
+def serve(address: str, model: Optional[str] = None, authkey: str = "") -> None:
+    """
+    Runs the model-owning inference server in the current process.
+
+    The GGUF model is loaded once, on the first request, and shared by every
+    connected worker. Requests are evaluated one at a time.
+
+    Args:
+        address: The Unix socket path to listen on.
+        model: The model path. Defaults to LLM_MODEL_PATH.
+        authkey: The key clients must authenticate with.
+    """
+    # This process owns the model, so it must not forward to itself
+    llm.LLM_SHARED_MODEL = False
+    backend = llm.get_backend("local", model)
+    logger = get_logger()
+    if os.path.exists(address):
+        os.unlink(address)
+    # Only this user may connect to the socket
+    umask = os.umask(0o077)
+    try:
+        listener = Listener(address, authkey=authkey.encode())
+    finally:
+        os.umask(umask)
+    with listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, AuthenticationError):
+                continue
+            threading.Thread(target=_handle, args=(conn, backend, logger), daemon=True).start()
+
+def server_model(address: str, authkey: str) -> Optional[str]:
+    """
+    Returns the model path served on address, or None if no server answers.
+
+    Raises:
+        RuntimeError: If a server answers but rejects authkey.
+    """
+    try:
+        with Client(address, authkey=authkey.encode()) as conn:
+            conn.send(("ping",))
+            reply = conn.recv()
+    except AuthenticationError:
+        raise RuntimeError(
+            f"A local model server with a different LLM_IPC_AUTHKEY listens on {address}"
+        ) from None
+    except (OSError, EOFError):
+        return None
+    return reply[1] if isinstance(reply, tuple) and reply[0] == "pong" else None
+
+def _same_model(a: str, b: str) -> bool:
+    return os.path.realpath(a) == os.path.realpath(b)
+
+class ModelServer:
+    """
+    A shared inference server, as returned by start_server.
+
+    Attributes:
+        process: The server process, or None if an existing server was reused.
+        address: The Unix socket it listens on.
+        authkey: The key clients authenticate with.
+        directory: The private directory holding the socket, if it was
+                   created for this server.
+    """
+
+    def __init__(
+        self,
+        process: Optional[Process],
+        address: str,
+        authkey: str,
+        directory: Optional[str] = None,
+    ) -> None:
+        self.process = process
+        self.address = address
+        self.authkey = authkey
+        self.directory = directory
+
+def start_server(
+    model: Optional[str] = None,
+    address: Optional[str] = None,
+    authkey: Optional[str] = None,
+    timeout: float = 30.0,
+) -> ModelServer:
+    """
+    Starts the shared inference server.
+
+    Without an address (or LLM_IPC_ADDRESS), the server listens on a socket in
+    a new 0700 directory, with a random authkey: nothing outside this run can
+    connect to it. Given an address and the authkey of a server already
+    listening there, that server is reused if it serves the same model.
+
+    Args:
+        model: The model path. Defaults to LLM_MODEL_PATH.
+        address: The Unix socket path. Defaults to LLM_IPC_ADDRESS.
+        authkey: The key clients authenticate with. Defaults to
+                 LLM_IPC_AUTHKEY, or a random key.
+        timeout: Seconds to wait for the server to come up.
+
+    Raises:
+        RuntimeError: If the server does not come up within timeout seconds,
+                      or the server on address serves another model or uses
+                      another authkey.
+    """
+    model = model or llm.MODEL_PATH
+    address = address or LLM_IPC_ADDRESS
+    authkey = authkey or LLM_IPC_AUTHKEY or os.urandom(32).hex()
+    directory = None
+    if address:
+        served = server_model(address, authkey)
+        if served is not None:
+            if not _same_model(served, model):
+                raise RuntimeError(
+                    f"The local model server on {address} serves {served}, not {model}"
+                )
+            return ModelServer(None, address, authkey)
+    else:
+        directory = tempfile.mkdtemp(prefix="mixtral_harness-")
+        address = os.path.join(directory, "llm.sock")
+    process = Process(target=serve, args=(address, model, authkey), daemon=True)
+    process.start()
+    server = ModelServer(process, address, authkey, directory)
+    deadline = time.monotonic() + timeout
+    while server_model(address, authkey) is None:
+        if not process.is_alive() or time.monotonic() > deadline:
+            stop_server(server)
+            raise RuntimeError(f"Local model server failed to start on {address}")
+        time.sleep(0.05)
+    return server
+
+def stop_server(server: ModelServer) -> None:
+    """Stops a server started by start_server and removes its socket."""
+    if server.process is None:
+        return
+    server.process.terminate()
+    server.process.join()
+    if os.path.exists(server.address):
+        os.unlink(server.address)
+    if server.directory is not None:
+        os.rmdir(server.directory)
+
+def use_server(address: str, authkey: str) -> None:
+    """Points complete, in this process and the workers it starts, at the
+    server on address; empty values undo it."""
+    global LLM_IPC_ADDRESS, LLM_IPC_AUTHKEY
+    LLM_IPC_ADDRESS, LLM_IPC_AUTHKEY = address, authkey
+    for name, value in (("LLM_IPC_ADDRESS", address), ("LLM_IPC_AUTHKEY", authkey)):
+        if value:
+            os.environ[name] = value
+        else:
+            os.environ.pop(name, None)
+
+_local = threading.local()
+
+def _connection(address: str) -> Connection:
+    """Returns this thread's connection to the server, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.key != (os.getpid(), address):
+        conn = Client(address, authkey=LLM_IPC_AUTHKEY.encode())
+        _local.conn, _local.key = conn, (os.getpid(), address)
+    return conn
+
+def complete(
+    prompts: List[str],
+    address: Optional[str] = None,
+    usages: Optional[List[Usage]] = None,
+) -> List[str]:
+    """Sends prompts to the shared inference server and returns its responses.
+    If usages is given, it is filled with one Usage per prompt.
+
+    Raises:
+        LLMError: If the server could not run the prompts, or none was
+                  started (see use_server).
+    """
+    address = address or LLM_IPC_ADDRESS
+    if not address:
+        raise LLMError("No local model server is running (LLM_IPC_ADDRESS is unset)")
+    try:
+        conn = _connection(address)
+    except AuthenticationError:
+        raise LLMError(f"The local model server on {address} rejected LLM_IPC_AUTHKEY") from None
+    try:
+        conn.send(("complete", list(prompts), usages is not None))
+        result = conn.recv()
+    except (OSError, EOFError):
+        _local.conn = None
+        raise
+    if isinstance(result, LLMError):
+        raise result
+    if usages is not None:
+        result, received = result
+        for usage, r in zip(usages, received):
+            usage.__dict__.update(r.__dict__)
+    return result
@@ -0,0 +1,303 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .backends import Usage
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+class ChunkMetrics:
+    """
+    Measurements of one chunk request.
+
+    Attributes:
+        queue_wait: Seconds from the chunk being read to its request starting.
+        latency: Seconds the request took, including retries.
+        prompt_tokens, completion_tokens, prompt_eval_ms, eval_ms: As reported
+            by the backend (see backends.Usage); None if it does not.
+        ok: False if the chunk failed.
+    """
+
+    def __init__(
+        self,
+        queue_wait: float,
+        latency: float,
+        usage: Optional[Usage] = None,
+        ok: bool = True,
+    ) -> None:
+        usage = usage or Usage()
+        self.queue_wait = queue_wait
+        self.latency = latency
+        self.prompt_tokens = usage.prompt_tokens
+        self.completion_tokens = usage.completion_tokens
+        self.prompt_eval_ms = usage.prompt_eval_ms
+        self.eval_ms = usage.eval_ms
+        self.ok = ok
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+class Histogram:
+    """A histogram with fixed buckets, as exported to Prometheus."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the q-quantile by interpolating within its bucket, like
+        Prometheus's histogram_quantile. None if nothing was observed."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Returns (le, cumulative count) per bucket, ending with "+Inf"."""
+        total, result = 0, []
+        for bound, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += n
+            result.append((bound if bound == "+Inf" else f"{bound:g}", total))
+        return result
+
+# Exported name -> (ChunkMetrics attribute, buckets, scale to the exported unit)
+_HISTOGRAMS = {
+    "queue_wait_seconds": ("queue_wait", SECONDS_BUCKETS, 1.0),
+    "latency_seconds": ("latency", SECONDS_BUCKETS, 1.0),
+    "prompt_eval_seconds": ("prompt_eval_ms", SECONDS_BUCKETS, 1e-3),
+    "eval_seconds": ("eval_ms", SECONDS_BUCKETS, 1e-3),
+    "prompt_tokens": ("prompt_tokens", TOKEN_BUCKETS, 1.0),
+    "completion_tokens": ("completion_tokens", TOKEN_BUCKETS, 1.0),
+}
+
+class Metrics:
+    """
+    Aggregated chunk measurements of one file or a whole run.
+
+    Only successful chunks are measured into the histograms; failed ones
+    are counted. Measurements a backend does not report are left out of
+    their histogram, so each histogram's count says how many chunks it
+    covers.
+
+    Attributes:
+        histograms: One Histogram per exported name (see _HISTOGRAMS).
+        chunks: Chunks sent to the LLM (not those answered from a journal).
+        failed: Chunks that failed after retries.
+        seconds: Wall-clock processing time.
+        cache_hits, cache_misses: Response cache lookups (see response_cache).
+    """
+
+    def __init__(self) -> None:
+        self.histograms = {
+            name: Histogram(buckets) for name, (_, buckets, _) in _HISTOGRAMS.items()
+        }
+        self.chunks = 0
+        self.failed = 0
+        self.seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe(self, chunk: ChunkMetrics) -> None:
+        self.chunks += 1
+        if not chunk.ok:
+            self.failed += 1
+            return
+        for name, (attr, _, scale) in _HISTOGRAMS.items():
+            value = getattr(chunk, attr)
+            if value is not None:
+                self.histograms[name].observe(value * scale)
+
+    def merge(self, other: "Metrics") -> None:
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+        self.chunks += other.chunks
+        self.failed += other.failed
+        self.seconds += other.seconds
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Completion tokens per wall-clock second, if tokens were reported."""
+        tokens = self.histograms["completion_tokens"]
+        if not tokens.count or self.seconds <= 0:
+            return None
+        return tokens.sum / self.seconds
+
+    def summary(self) -> str:
+        """Returns a one-line human-readable summary."""
+        parts = [f"{self.chunks} chunks ({self.failed} failed) in {self.seconds:.1f} s"]
+        rate = self.tokens_per_second
+        if rate is not None:
+            parts.append(f"{rate:.1f} completion tokens/s")
+        if self.cache_hits or self.cache_misses:
+            parts.append(f"cache {self.cache_hits} hits / {self.cache_misses} misses")
+        for name, label in (
+            ("latency_seconds", "latency"),
+            ("queue_wait_seconds", "queue wait"),
+            ("prompt_eval_seconds", "prompt eval"),
+            ("eval_seconds", "eval"),
+        ):
+            h = self.histograms[name]
+            if h.count:
+                parts.append(
+                    f"{label} p50 {h.quantile(0.5):.3f} s / p95 {h.quantile(0.95):.3f} s"
+                )
+        for name, label in (
+            ("prompt_tokens", "prompt tokens"),
+            ("completion_tokens", "completion tokens"),
+        ):
+            h = self.histograms[name]
+            if h.count:
+                parts.append(f"{label} mean {h.sum / h.count:.0f}")
+        return "; ".join(parts)
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class RunMetrics:
+    """
+    Per-file and whole-run Metrics of a harness run, exported in the
+    Prometheus text format: to a file for node_exporter's textfile
+    collector (write) and/or over HTTP at /metrics (serve).
+
+    Run-wide series are named harness_chunk_*; per-file series are named
+    harness_file_chunk_* and labelled with the file.
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, Metrics] = {}
+        self.total = Metrics()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def add(self, name: str, metrics: Metrics) -> None:
+        """Adds a finished file's (or shard's) metrics."""
+        with self._lock:
+            self.files.setdefault(name, Metrics()).merge(metrics)
+            seconds = self.total.seconds
+            self.total.merge(metrics)
+            self.total.seconds = seconds
+
+    def _elapsed(self) -> None:
+        """Must hold _lock."""
+        self.total.seconds = time.monotonic() - self._start
+
+    def summary(self) -> str:
+        with self._lock:
+            self._elapsed()
+            return f"{len(self.files)} files, {self.total.summary()}"
+
+    def to_prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def histogram(name: str, series: List[Tuple[str, Histogram]]) -> None:
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in series:
+                sep = "," if labels else ""
+                for le, count in h.cumulative():
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {count}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {h.sum:g}")
+                lines.append(f"{name}_count{suffix} {h.count}")
+
+        def scalar(name: str, kind: str, series: List[Tuple[str, float]]) -> None:
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}{suffix} {value:g}")
+
+        with self._lock:
+            self._elapsed()
+            files = [(f'file="{_label(n)}"', m) for n, m in sorted(self.files.items())]
+            scalar("harness_run_seconds", "gauge", [("", self.total.seconds)])
+            scalar("harness_files_total", "counter", [("", len(self.files))])
+            scalar("harness_chunks_total", "counter", [("", self.total.chunks)])
+            scalar("harness_chunks_failed_total", "counter", [("", self.total.failed)])
+            scalar("harness_cache_hits_total", "counter", [("", self.total.cache_hits)])
+            scalar("harness_cache_misses_total", "counter", [("", self.total.cache_misses)])
+            rate = self.total.tokens_per_second
+            if rate is not None:
+                scalar("harness_completion_tokens_per_second", "gauge", [("", rate)])
+            for name in _HISTOGRAMS:
+                histogram(f"harness_chunk_{name}", [("", self.total.histograms[name])])
+            scalar("harness_file_seconds", "gauge", [(l, m.seconds) for l, m in files])
+            scalar("harness_file_chunks_total", "counter", [(l, m.chunks) for l, m in files])
+            scalar(
+                "harness_file_chunks_failed_total", "counter",
+                [(l, m.failed) for l, m in files],
+            )
+            for name in _HISTOGRAMS:
+                histogram(
+                    f"harness_file_chunk_{name}", [(l, m.histograms[name]) for l, m in files]
+                )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Writes the metrics to path atomically, so a scraper never reads a
+        partial file."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = "") -> None:
+        """Serves the metrics at http://host:port/metrics from a background
+        thread until close is called."""
+        run = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = run.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        """Stops the HTTP endpoint, if serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,202 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+class MockLLMServer:
+    """
+    Stand-in for a llama.cpp server, for benchmarking the harness without a model.
+
+    Answers POST /generate (the harness's {"response": ...} shape) and
+    /completion (llama.cpp's {"content": ...} shape), including streamed
+    server-sent events and lists of prompts, and GET /health. Words stand in
+    for tokens: the completion is the first max_tokens words of the prompt (or
+    the request's "n_predict"), produced after prompt_ms_per_token per prompt
+    word and ms_per_token per completion word. Only slots prompts are
+    evaluated at a time, including those of a list; the rest wait, like
+    llama.cpp's parallel slots.
+    Responses carry llama.cpp's "timings", "tokens_evaluated" and
+    "tokens_predicted".
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        slots: int = 4,
+        prompt_ms_per_token: float = 0.5,
+        ms_per_token: float = 20.0,
+        max_tokens: int = 32,
+    ) -> None:
+        """
+        Initializes the server; call start to begin serving.
+
+        Args:
+            host: The interface to listen on.
+            port: The port to listen on; 0 picks a free one (see url).
+            slots: Prompts evaluated in parallel.
+            prompt_ms_per_token: Simulated prompt evaluation time per word.
+            ms_per_token: Simulated generation time per word.
+            max_tokens: Completion length when a request sets no "n_predict".
+        """
+        self.slots = max(1, slots)
+        self.prompt_ms_per_token = prompt_ms_per_token
+        self.ms_per_token = ms_per_token
+        self.max_tokens = max_tokens
+        self.requests = 0
+        self._slots = threading.Semaphore(self.slots)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """The /generate URL, for LLM_SERVER_URL."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/generate"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def _plan(self, prompt: str, n_predict: Optional[int]) -> Tuple[List[str], int]:
+        """Returns the completion's words and the prompt's length in words."""
+        words = prompt.split()
+        limit = self.max_tokens if n_predict is None or n_predict < 0 else n_predict
+        return words[:limit], len(words)
+
+    def _result(self, text: str, prompt_n: int, predicted_n: int, key: str) -> Dict[str, Any]:
+        return {
+            key: text,
+            "stop": True,
+            "tokens_evaluated": prompt_n,
+            "tokens_predicted": predicted_n,
+            "timings": {
+                "prompt_n": prompt_n,
+                "prompt_ms": prompt_n * self.prompt_ms_per_token,
+                "predicted_n": predicted_n,
+                "predicted_ms": predicted_n * self.ms_per_token,
+            },
+        }
+
+    def complete(self, prompt: str, n_predict: Optional[int], key: str) -> Dict[str, Any]:
+        """Simulates one completion, holding a slot for its duration."""
+        words, prompt_n = self._plan(prompt, n_predict)
+        with self._slots:
+            time.sleep(
+                (prompt_n * self.prompt_ms_per_token + len(words) * self.ms_per_token) / 1000
+            )
+        return self._result(" ".join(words), prompt_n, len(words), key)
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive and chunked streaming
+
+            def _send_json(self, status: int, body: Any) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self) -> None:
+                if self.path == "/health":
+                    self._send_json(200, {"status": "ok"})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+                if self.path not in ("/generate", "/completion"):
+                    self._send_json(404, {"error": "not found"})
+                    return
+                with server._lock:
+                    server.requests += 1
+                key = "response" if self.path == "/generate" else "content"
+                prompt = payload.get("prompt", "")
+                n_predict = payload.get("n_predict")
+                if isinstance(prompt, list):
+                    # Spread over the slots, like llama.cpp's batched prompts
+                    with ThreadPoolExecutor(max_workers=max(1, len(prompt))) as pool:
+                        results = list(
+                            pool.map(lambda p: server.complete(str(p), n_predict, key), prompt)
+                        )
+                    self._send_json(200, results)
+                elif payload.get("stream"):
+                    self._stream(str(prompt), n_predict, key)
+                else:
+                    self._send_json(200, server.complete(str(prompt), n_predict, key))
+
+            def _stream(self, prompt: str, n_predict: Optional[int], key: str) -> None:
+                words, prompt_n = server._plan(prompt, n_predict)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                with server._slots:
+                    time.sleep(prompt_n * server.prompt_ms_per_token / 1000)
+                    for i, word in enumerate(words):
+                        time.sleep(server.ms_per_token / 1000)
+                        event = {key: word if i == 0 else " " + word, "stop": False}
+                        self._send_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                final = server._result("", prompt_n, len(words), key)
+                self._send_chunk(f"data: {json.dumps(final)}\n\n".encode())
+                self._send_chunk(b"")
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a stand-in llama.cpp server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--prompt-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--ms-per-token", type=float, default=20.0)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    args = parser.parse_args()
+    server = MockLLMServer(
+        args.host, args.port, args.slots,
+        args.prompt_ms_per_token, args.ms_per_token, args.max_tokens,
+    )
+    print(f"Serving at {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .jsonl_output import JsonlWriter, _sync_directory, parse_fsync_policy
+
+# Output formats, each also the output file's extension
+FORMATS = ("jsonl", "jsonl.gz", "jsonl.zst", "parquet", "arrow")
+_COMPRESSION = {"jsonl": None, "jsonl.gz": "gzip", "jsonl.zst": "zstd"}
+
+# Chunk measurements stored as columns (see metrics.ChunkMetrics)
+TIMINGS = (
+    "queue_wait", "latency", "prompt_tokens", "completion_tokens", "prompt_eval_ms", "eval_ms"
+)
+
+def _schema() -> "pa.Schema":
+    return pa.schema([
+        ("file", pa.string()),
+        ("shard", pa.int32()),
+        ("batch_idx", pa.int32()),
+        ("chunk_idx", pa.int32()),
+        ("input", pa.large_string()),
+        ("input_offset", pa.int64()),
+        ("input_length", pa.int64()),
+        ("output", pa.large_string()),
+        ("error", pa.string()),
+        ("queue_wait", pa.float64()),
+        ("latency", pa.float64()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("prompt_eval_ms", pa.float64()),
+        ("eval_ms", pa.float64()),
+    ])
+
+def output_format(path: str) -> Optional[str]:
+    """Returns the output format path is named for, or None."""
+    for fmt in FORMATS:
+        if path.endswith("." + fmt):
+            return fmt
+    return None
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet and Arrow output")
+
+def _to_row(record: Dict[str, Any], file: Optional[str]) -> Dict[str, Any]:
+    metrics = record.get("metrics") or {}
+    row = {
+        "file": record.get("file", file),
+        "shard": record.get("shard"),
+        "batch_idx": record.get("batch_idx"),
+        "chunk_idx": record.get("chunk_idx"),
+        "input": record.get("input"),
+        "input_offset": record.get("input_offset"),
+        "input_length": record.get("input_length"),
+        "output": record.get("output"),
+        "error": record.get("error"),
+    }
+    row.update((name, metrics.get(name)) for name in TIMINGS)
+    return row
+
+def _from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns a row back into a record shaped like the harness's."""
+    if row["input"] is None:
+        record = {k: row[k] for k in ("file", "input_offset", "input_length")}
+    else:
+        record = {"input": row["input"]}
+    record.update(output=row["output"], chunk_idx=row["chunk_idx"], batch_idx=row["batch_idx"])
+    if row["error"] is not None:
+        record["error"] = row["error"]
+    if any(row[name] is not None for name in TIMINGS):
+        record["metrics"] = {name: row[name] for name in TIMINGS}
+        record["metrics"]["ok"] = row["error"] is None
+    if row["shard"] is not None:
+        record["shard"] = row["shard"]
+    if row["input"] is not None and row["file"] is not None:
+        record["file"] = row["file"]
+    return record
+
+class ColumnarWriter:
+    """
+    Writes harness records as Parquet or Arrow IPC (Feather v2) columns: file,
+    shard, batch_idx, chunk_idx, input (or input_offset and input_length, for
+    inputs stored by reference), output, error, and the chunk's measurements
+    from its "metrics". Other keys are dropped.
+
+    Rows are buffered and written row_group_size at a time, as one Parquet
+    row group or Arrow record batch, compressed with zstd. As with
+    JsonlWriter, the file is written to "<path>.tmp" and renamed over path
+    on close; the fsync policy applies per row group.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fmt: str = "parquet",
+        file: Optional[str] = None,
+        row_group_size: int = 8192,
+        fsync: Union[str, float] = "close",
+    ) -> None:
+        """
+        Initializes the ColumnarWriter and opens its file.
+
+        Args:
+            path: The output file.
+            fmt: "parquet" or "arrow".
+            file: The file column of records without a "file".
+            row_group_size: Rows per row group.
+            fsync: The fsync policy (see jsonl_output.parse_fsync_policy).
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        _require_pyarrow()
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown columnar format: {fmt}")
+        self.path = path
+        self.file = file
+        self.row_group_size = max(1, row_group_size)
+        self.fsync = parse_fsync_policy(fsync)
+        self.records = 0
+        self.target = f"{path}.tmp"
+        self._f = open(self.target, "wb")
+        self._rows: List[Dict[str, Any]] = []
+        self._last_sync = time.monotonic()
+        self._schema = _schema()
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self._f, self._schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(
+                self._f, self._schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+            )
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Appends one record."""
+        self._rows.append(_to_row(record, self.file))
+        self.records += 1
+        if len(self._rows) >= self.row_group_size:
+            self.flush()
+            if self.fsync == "always" or (
+                isinstance(self.fsync, float) and time.monotonic() - self._last_sync >= self.fsync
+            ):
+                self.sync()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        """Writes the buffered rows as a row group."""
+        if self._rows:
+            self._writer.write_batch(pa.RecordBatch.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def sync(self) -> None:
+        """Flushes and fsyncs the file."""
+        self.flush()
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._last_sync = time.monotonic()
+
+    @property
+    def closed(self) -> bool:
+        return self._f.closed
+
+    def close(self) -> None:
+        """Writes out every row, completes the file and moves it into place."""
+        if self.closed:
+            return
+        self.flush()
+        self._writer.close()
+        self._f.flush()
+        if self.fsync != "never":
+            os.fsync(self._f.fileno())
+        self._f.close()
+        os.replace(self.target, self.path)
+        if self.fsync != "never":
+            _sync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+    def abort(self) -> None:
+        """Completes the file with the rows so far, without moving it into place."""
+        if not self.closed:
+            self.flush()
+            self._writer.close()
+            self._f.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def open_sink(
+    path: str,
+    file: Optional[str] = None,
+    buffer_size: int = 1 << 20,
+    fsync: Union[str, float] = "close",
+) -> Union[JsonlWriter, ColumnarWriter]:
+    """
+    Opens a writer for the output format path is named for (see FORMATS).
+
+    Args:
+        path: The output file; its extension picks the format.
+        file: The source file, for the file column of columnar formats.
+        buffer_size: Bytes buffered by JSONL writers.
+        fsync: The fsync policy (see jsonl_output.parse_fsync_policy).
+
+    Raises:
+        ValueError: If path is not named for a known format.
+        ImportError: If the format's optional dependency is not installed.
+    """
+    fmt = output_format(path)
+    if fmt is None:
+        raise ValueError(f"Unknown output format for {path}; expected one of {FORMATS}")
+    if fmt in _COMPRESSION:
+        return JsonlWriter(
+            path, buffer_size=buffer_size, fsync=fsync, compression=_COMPRESSION[fmt]
+        )
+    return ColumnarWriter(path, fmt, file=file, fsync=fsync)
+
+def _open_text(path: str, compression: Optional[str]) -> io.TextIOBase:
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd-compressed output")
+        # Appended or merged outputs hold several frames
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"), read_across_frames=True, closefd=True
+        )
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads back the records of an output in any of FORMATS.
+
+    Raises:
+        ValueError: If path is not named for a known format.
+    """
+    fmt = output_format(path)
+    if fmt is None:
+        raise ValueError(f"Unknown output format for {path}; expected one of {FORMATS}")
+    if fmt in _COMPRESSION:
+        with _open_text(path, _COMPRESSION[fmt]) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    _require_pyarrow()
+    if fmt == "parquet":
+        batches: Iterable[Any] = pq.ParquetFile(path).iter_batches()
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        for row in batch.to_pylist():
+            yield _from_row(row)
+
+def read_input(record: Dict[str, Any]) -> str:
+    """Returns a record's input chunk, reading it from the source file if it
+    is stored by reference."""
+    if "input" in record:
+        return record["input"]
+    with open(record["file"], "rb") as f:
+        f.seek(record["input_offset"])
+        return f.read(record["input_length"]).decode("utf-8")
+
+def merge_outputs(parts: List[str], final: str) -> None:
+    """
+    Concatenates output files in order into final, replacing it atomically,
+    and removes the parts. Columnar outputs are merged row group by row
+    group; other files (including compressed JSONL, whose members or frames
+    decompress as one stream) are concatenated byte for byte.
+    """
+    fmt = output_format(final)
+    tmp = final + ".tmp"
+    if fmt in ("parquet", "arrow"):
+        _require_pyarrow()
+        schema = _schema()
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+            for part in parts:
+                source = pq.ParquetFile(part)
+                for i in range(source.num_row_groups):
+                    writer.write_table(source.read_row_group(i))
+            writer.close()
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd")
+            with pa.ipc.new_file(tmp, schema, options=options) as writer:
+                for part in parts:
+                    with pa.ipc.open_file(pa.memory_map(part)) as reader:
+                        for i in range(reader.num_record_batches):
+                            writer.write_batch(reader.get_batch(i))
+    else:
+        with open(tmp, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+    os.replace(tmp, final)
+    for part in parts:
+        os.remove(part)
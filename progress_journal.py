@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+class ProgressJournal:
+    """
+    Durable, append-only record of the chunks of one input file that have
+    finished processing.
+
+    The journal is a JSONL file: a header line identifying the input file
+    (path, size, mtime) and how it was split (chunk mode and parameters,
+    chunk and batch sizes),
+    one line per completed chunk with its output, and a final "done" line
+    once every output has been written. A truncated last line (from a crash
+    mid-write) is ignored when the journal is loaded.
+    """
+
+    def __init__(
+        self,
+        journal_dir: str,
+        filepath: str,
+        chunk_mode: str = "chars",
+        byte_range: Optional[Tuple[int, int]] = None,
+        chunking: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Initializes the ProgressJournal.
+
+        Args:
+            journal_dir: The directory holding journal files.
+            filepath: The input file this journal tracks.
+            chunk_mode: The chunking mode; a journal started under another mode
+                        is not resumed, since its chunks would not line up.
+            byte_range: The (start, end) byte range if only a shard of the file
+                        is tracked.
+            chunking: Other settings the chunk boundaries depend on (such as
+                      how the file is read and how much is trimmed from it);
+                      like chunk_mode, a journal started with other settings
+                      is discarded.
+        """
+        self.filepath = os.path.abspath(filepath)
+        self.chunk_mode = chunk_mode
+        self.byte_range = list(byte_range) if byte_range else None
+        self.chunking = chunking or {}
+        digest = hashlib.sha1(self.filepath.encode("utf-8")).hexdigest()[:8]
+        stem = f"{os.path.basename(filepath)}.{digest}"
+        if byte_range:
+            stem += f".{byte_range[0]}-{byte_range[1]}"
+        self.path = os.path.join(journal_dir, f"{stem}.journal.jsonl")
+        self.chunk_size: Optional[int] = None
+        self.batch_size: Optional[int] = None
+        self.completed: Dict[int, str] = {}
+        self.done = False
+        self._f = None
+
+    def _identity(self) -> Dict[str, Any]:
+        stat = os.stat(self.filepath)
+        return {
+            "file": self.filepath,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunk_mode": self.chunk_mode,
+            "byte_range": self.byte_range,
+            "chunking": self.chunking,
+        }
+
+    def load(self) -> bool:
+        """
+        Loads previous progress for the input file.
+
+        Returns:
+            True if a journal exists for the unchanged input file, in which case
+            chunk_size, batch_size, completed and done are populated.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return False
+            if any(header.get(k) != v for k, v in self._identity().items()):
+                return False
+            self.chunk_size = header["chunk_size"]
+            self.batch_size = header["batch_size"]
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("done"):
+                    self.done = True
+                else:
+                    self.completed[record["seq"]] = record["output"]
+        return True
+
+    def start(self, chunk_size: int, batch_size: int) -> None:
+        """Starts a fresh journal, discarding any previous progress."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.chunk_size, self.batch_size = chunk_size, batch_size
+        self.completed, self.done = {}, False
+        self._f = open(self.path, "w", encoding="utf-8")
+        header = dict(self._identity(), chunk_size=chunk_size, batch_size=batch_size)
+        self._write(header)
+
+    def resume(self) -> None:
+        """Reopens a loaded journal to append further progress."""
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(record) + "\n")
+        self._f.flush()
+
+    def record(self, seq: int, output: str) -> None:
+        """Records the output of chunk number seq as completed."""
+        self.completed[seq] = output
+        self._write({"seq": seq, "output": output})
+
+    def finish(self) -> None:
+        """Marks the file as fully processed and closes the journal."""
+        self.done = True
+        self._write({"done": True})
+        self.close()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
@@ -1,5 +1,102 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
 import psutil
-from typing import Dict
+
+RESOURCE_SAMPLE_PERIOD = float(os.getenv("RESOURCE_SAMPLE_PERIOD", "1.0"))
+RESOURCE_SAMPLE_WINDOW = int(os.getenv("RESOURCE_SAMPLE_WINDOW", "60"))
+RESOURCE_EWMA_ALPHA = float(os.getenv("RESOURCE_EWMA_ALPHA", "0.3"))
+
+class ResourceSampler:
+    """
+    Samples system resources on a background thread.
+
+    Keeps a rolling window of raw samples and EWMA-smoothed values, so readers
+    get an instant snapshot instead of blocking on psutil.cpu_percent.
+    """
+
+    def __init__(
+        self,
+        period: float = RESOURCE_SAMPLE_PERIOD,
+        window: int = RESOURCE_SAMPLE_WINDOW,
+        alpha: float = RESOURCE_EWMA_ALPHA,
+    ) -> None:
+        """
+        Initializes the ResourceSampler.
+
+        Args:
+            period: Seconds between samples.
+            window: The number of raw samples to keep.
+            alpha: The EWMA smoothing factor (higher reacts faster).
+        """
+        self.period = period
+        self.alpha = alpha
+        self.samples = deque(maxlen=window)
+        self._ewma: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Takes a first sample and starts the sampling thread."""
+        self._sample(psutil.cpu_percent(interval=0.05))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the sampling thread and waits for it to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.period):
+            self._sample()
+
+    def _sample(self, cpu_percent: Optional[float] = None) -> None:
+        if cpu_percent is None:
+            cpu_percent = psutil.cpu_percent(interval=None)
+        sample = {
+            "cpu_percent": cpu_percent,
+            "ram_percent": psutil.virtual_memory().percent,
+            "load_avg": os.getloadavg()[0] if hasattr(os, "getloadavg") else 0.0,
+            "rss_bytes": float(self._process.memory_info().rss),
+        }
+        with self._lock:
+            self.samples.append(sample)
+            for key, value in sample.items():
+                prev = self._ewma.get(key, value)
+                self._ewma[key] = prev + self.alpha * (value - prev)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns the EWMA-smoothed resource usage without blocking:
+        {
+            'cpu_percent': float, 'ram_percent': float,
+            'load_avg': float (1-minute), 'rss_bytes': float (this process)
+        }
+        """
+        with self._lock:
+            return dict(self._ewma)
+
+_sampler: Optional[ResourceSampler] = None
+_sampler_pid: Optional[int] = None
+_sampler_lock = threading.Lock()
+
+def get_sampler() -> ResourceSampler:
+    """Returns this process's shared ResourceSampler, starting it on first use."""
+    global _sampler, _sampler_pid
+    pid = os.getpid()
+    if _sampler is None or _sampler_pid != pid:
+        with _sampler_lock:
+            if _sampler is None or _sampler_pid != pid:
+                sampler = ResourceSampler()
+                sampler.start()
+                _sampler, _sampler_pid = sampler, pid
+    return _sampler
 
 def get_system_resources() -> Dict[str, float]:
     """
@@ -8,10 +105,7 @@ def get_system_resources() -> Dict[str, float]:
         'ram_percent': float (percent of RAM used),
         'cpu_percent': float (percent of CPU used)
     }
+    Values are EWMA-smoothed by the background sampler (see ResourceSampler),
+    which also reports 'load_avg' and 'rss_bytes'. Returns immediately.
     """
-    ram_percent = psutil.virtual_memory().percent
-    cpu_percent = psutil.cpu_percent(interval=0.5)
-    return {
-        'ram_percent': ram_percent,
-        'cpu_percent': cpu_percent
-    }
\ No newline at end of file
+    return get_sampler().snapshot()
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Path of the SQLite response cache; empty disables caching
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "1024"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('bytes', 0);
+"""
+
+# Seconds a hit may leave an entry's last_access stale, and between writes of
+# the shared hit and miss counters, so most lookups are plain reads
+TOUCH_INTERVAL = 5.0
+
+def cache_key(prompt: str, model: str, n_ctx: int, params: Dict[str, Any]) -> str:
+    """Returns the content address of a request: a SHA-256 over the prompt,
+    model path, context size and generation parameters."""
+    material = json.dumps([prompt, model, n_ctx, params], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of LLM responses backed by SQLite.
+
+    Safe to share between Pool workers: every process and thread gets its own
+    connection and the database runs in WAL mode. When the stored responses
+    exceed max_bytes, the least recently used entries are evicted; recency
+    is tracked to within TOUCH_INTERVAL seconds.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        """
+        Initializes the ResponseCache.
+
+        Args:
+            path: The SQLite database file.
+            max_bytes: The maximum total size of cached responses.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self._unsaved = {"hits": 0, "misses": 0}
+        self._saved_at = time.monotonic()
+        self._pid = os.getpid()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for key, or None on a miss."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT response, last_access FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        counter = "hits" if row else "misses"
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self._count(counter)
+            due = time.monotonic() - self._saved_at >= TOUCH_INTERVAL
+        now = time.time()
+        if row and now - row[1] >= TOUCH_INTERVAL:
+            with conn:
+                conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+        if due:
+            self.flush()
+        return row[0] if row else None
+
+    def _count(self, counter: str) -> None:
+        """Counts a lookup towards the shared counters. Must hold _counter_lock."""
+        if self._pid != os.getpid():
+            # Forked: the parent saves its own lookups
+            self._unsaved = {"hits": 0, "misses": 0}
+            self._pid = os.getpid()
+        self._unsaved[counter] += 1
+
+    def flush(self) -> None:
+        """Adds the lookups counted since the last flush to the shared hit
+        and miss counters."""
+        with self._counter_lock:
+            if self._pid != os.getpid():
+                return
+            unsaved = self._unsaved
+            self._unsaved = {"hits": 0, "misses": 0}
+            self._saved_at = time.monotonic()
+        if not any(unsaved.values()):
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "UPDATE stats SET value = value + ? WHERE name = ?",
+                [(n, name) for name, n in unsaved.items()],
+            )
+
+    def put(self, key: str, response: str) -> None:
+        """Stores a response, evicting least recently used entries if needed."""
+        size = len(response.encode("utf-8"))
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()),
+            )
+            conn.execute(
+                "UPDATE stats SET value = value + ? WHERE name = 'bytes'",
+                (size - (old[0] if old else 0),),
+            )
+            total = conn.execute(
+                "SELECT value FROM stats WHERE name = 'bytes'"
+            ).fetchone()[0]
+            while total > self.max_bytes:
+                victims = conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access LIMIT 64"
+                ).fetchall()
+                if not victims:
+                    break
+                for victim, victim_size in victims:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (victim,))
+                    total -= victim_size
+                conn.execute(
+                    "UPDATE stats SET value = ? WHERE name = 'bytes'", (total,)
+                )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns cache counters.
+
+        "hits" and "misses" count lookups in this process; "total_hits",
+        "total_misses", "entries" and "bytes" cover all processes sharing
+        the database.
+        """
+        self.flush()
+        conn = self._conn()
+        totals = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals["hits"],
+            "total_misses": totals["misses"],
+            "entries": entries,
+            "bytes": totals["bytes"],
+        }
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the process-wide response cache, or None if LLM_CACHE_PATH is unset."""
+    global _cache
+    if not LLM_CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(LLM_CACHE_PATH, int(LLM_CACHE_MAX_MB * 1024 * 1024))
+    return _cache
@@ -0,0 +1,68 @@
+import os
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+from .backends import LLMError
+
+# Retries after the first attempt of an LLM call
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "4"))
+# Exponential backoff: attempt n waits a random time up to base * 2**n, capped
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Seconds a chunk may spend on attempts and backoff before it fails; 0 disables
+LLM_CHUNK_DEADLINE = float(os.getenv("LLM_CHUNK_DEADLINE", "600"))
+
+T = TypeVar("T")
+
+def backoff_delay(
+    attempt: int, base: float = LLM_BACKOFF_BASE, cap: float = LLM_BACKOFF_MAX
+) -> float:
+    """Returns the wait before retry number attempt (from 0), with full jitter
+    so that workers hitting the same busy server do not retry in lockstep."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def deadline_from_now(seconds: float = LLM_CHUNK_DEADLINE) -> Optional[float]:
+    """Returns the time.monotonic() deadline for a call starting now, or None
+    if seconds is 0."""
+    return time.monotonic() + seconds if seconds > 0 else None
+
+def call_with_retries(
+    func: Callable[[], T],
+    retries: int = LLM_RETRIES,
+    deadline: Optional[float] = None,
+    base: float = LLM_BACKOFF_BASE,
+    cap: float = LLM_BACKOFF_MAX,
+) -> T:
+    """
+    Calls func, retrying retryable LLMErrors with jittered exponential backoff.
+    A retry never starts before the error's retry_after has passed.
+
+    Args:
+        func: The call to make.
+        retries: The maximum number of retries after the first attempt.
+        deadline: A time.monotonic() value; no retry is started if its backoff
+                  would end after it. An attempt already running is bounded by
+                  the backend's own timeouts.
+        base: The backoff of the first retry, in seconds, before jitter.
+        cap: The maximum backoff, in seconds.
+
+    Returns:
+        The first successful result.
+
+    Raises:
+        LLMError: The last error, once it is not retryable, the retries are
+                  used up, or the deadline would be exceeded.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except LLMError as e:
+            if not e.retryable or attempt >= retries:
+                raise
+            delay = max(backoff_delay(attempt, base, cap), e.retry_after)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise LLMError(f"Deadline exceeded after {attempt + 1} attempts: {e}") from e
+            time.sleep(delay)
+            attempt += 1
@@ -1,11 +1,32 @@
+import argparse
+
 from mixtral_harness.harness import Harness
 
 def main():
     """
     Initializes and runs the processing harness.
     """
+    parser = argparse.ArgumentParser(description="Run the processing harness.")
+    parser.add_argument("directory", nargs="?", help="Input directory (default: config.DATA_DIR)")
+    parser.add_argument(
+        "--watch", action="store_true", help="Keep running and process files as they arrive"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        nargs="+",
+        metavar="OUTPUT",
+        help="Re-send the failed chunks recorded in these records outputs (.jsonl, .parquet, ...)",
+    )
+    args = parser.parse_args()
+
     harness = Harness()
-    harness.process_directory()
+    if args.retry_failed:
+        for path in args.retry_failed:
+            harness.retry_failed(path)
+    elif args.watch:
+        harness.watch_directory(args.directory)
+    else:
+        harness.process_directory(args.directory)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,82 @@
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Bytes scanned past a nominal shard boundary to find whitespace
+_ALIGN_WINDOW = 1 << 16
+
+class Task(NamedTuple):
+    """A unit of work: a whole file, or one byte-range shard of a file."""
+
+    path: str
+    size: int
+    start: int = 0
+    end: int = 0
+    shard: int = 0
+    shards: int = 1
+    name: str = ""
+
+def _align(f, offset: int, size: int) -> int:
+    """Moves offset forward to just after the next whitespace byte, or failing
+    that to the next UTF-8 character boundary, so shards split neither words
+    nor multibyte characters. A CRLF line ending is kept whole, so that it is
+    still read as one newline."""
+    f.seek(offset)
+    window = f.read(min(_ALIGN_WINDOW, size - offset))
+    for i, byte in enumerate(window):
+        if byte in b" \t\n\r\f\v":
+            # At the end of the window, the next byte is the file's next one
+            if byte == 0x0D and (window[i + 1 : i + 2] or f.read(1)) == b"\n":
+                return offset + i + 2
+            return offset + i + 1
+    for i, byte in enumerate(window):
+        if byte & 0xC0 != 0x80:
+            return offset + i
+    return offset + len(window)
+
+def shard_ranges(path: str, shard_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits a file into byte ranges of roughly shard_size bytes.
+
+    Returns:
+        A list of (start, end) ranges covering the whole file in order.
+    """
+    size = os.path.getsize(path)
+    if shard_size <= 0 or size <= shard_size:
+        return [(0, size)]
+    ranges, start = [], 0
+    with open(path, "rb") as f:
+        while size - start > shard_size:
+            end = _align(f, start + shard_size, size)
+            if end >= size:
+                break
+            ranges.append((start, end))
+            start = end
+    ranges.append((start, size))
+    return ranges
+
+def plan_tasks(
+    paths: Iterable[str], shard_size: int = 0, names: Optional[Dict[str, str]] = None
+) -> List[Task]:
+    """
+    Plans the work for a run, largest first.
+
+    Files larger than shard_size (if positive) are split into shards that can be
+    processed in parallel. Tasks are ordered by descending byte size, so the
+    biggest work starts first and small files fill in the tail.
+
+    Args:
+        paths: The input files.
+        shard_size: The shard size in bytes; 0 disables sharding.
+        names: Optional output names by path; defaults to the file's base name.
+
+    Returns:
+        The tasks, ordered largest first.
+    """
+    tasks = []
+    for path in paths:
+        ranges = shard_ranges(path, shard_size)
+        name = (names or {}).get(path) or os.path.basename(path)
+        for shard, (start, end) in enumerate(ranges):
+            tasks.append(Task(path, end - start, start, end, shard, len(ranges), name))
+    tasks.sort(key=lambda task: task.size, reverse=True)
+    return tasks
@@ -0,0 +1,65 @@
+from .adaptive_controller import AdaptiveController
+
+def _controller(**overrides):
+    settings = dict(max_chunk_size=512, max_batch_size=64, hysteresis=0.05, target_latency=10.0)
+    settings.update(overrides)
+    controller = AdaptiveController(**settings)
+    controller.chunk_size, controller.batch_size = 100, 16
+    return controller
+
+def test_first_window_climbs_when_the_batch_was_filled():
+    controller = _controller()
+    controller._step(100.0, 6.0, 16)
+    assert controller.batch_size == 20
+
+def test_changes_within_hysteresis_hold():
+    controller = _controller()
+    controller._step(100.0, 6.0, 16)
+    controller._step(103.0, 6.0, 20)
+    controller._step(99.0, 6.0, 20)
+    assert controller.batch_size == 20
+
+def test_a_drop_in_throughput_reverses_direction():
+    controller = _controller()
+    controller._step(100.0, 6.0, 16)
+    controller._step(80.0, 6.0, 20)
+    assert controller.batch_size == 15
+    # Still heading down while it keeps paying off
+    controller._step(90.0, 6.0, 15)
+    assert controller.batch_size == 12
+    controller._step(70.0, 6.0, 12)
+    assert controller.batch_size == 15
+
+def test_probes_upwards_after_six_stable_windows():
+    controller = _controller()
+    controller._step(100.0, 6.0, 16)
+    controller._step(80.0, 6.0, 20)
+    assert controller.batch_size == 15
+    for _ in range(5):
+        controller._step(80.0, 6.0, 15)
+        assert controller.batch_size == 15
+    controller._step(80.0, 6.0, 15)
+    assert controller.batch_size == 18
+
+def test_does_not_grow_a_batch_that_was_not_filled():
+    controller = _controller()
+    controller._step(100.0, 6.0, 7.9)
+    assert controller.batch_size == 16
+    controller._step(200.0, 6.0, 8)
+    assert controller.batch_size == 20
+
+def test_steers_chunk_size_towards_the_target_latency():
+    controller = _controller()
+    decision = controller._step(100.0, 20.0, 16)
+    assert controller.chunk_size == 75
+    assert decision.endswith("chunk size 75")
+    controller._step(100.0, 10.2, 20)
+    assert controller.chunk_size == 75
+    controller._step(100.0, 2.0, 20)
+    assert controller.chunk_size == 94
+
+def test_chunk_steering_can_be_turned_off():
+    controller = _controller(steer_chunk_size=False)
+    decision = controller._step(100.0, 20.0, 16)
+    assert controller.chunk_size == 100
+    assert "chunk size" not in decision
@@ -0,0 +1,107 @@
+import sys
+import types
+
+import pytest
+
+from . import backends
+from . import config
+from . import unified_llm_wrapper as llm
+from .backends import ServerBackend
+from .harness import Harness
+
+def test_server_payload_carries_generation_limits():
+    backend = ServerBackend("http://x/generate", "m.gguf", 4, 2048, max_tokens=100, stop=["</s>"])
+    assert backend._payload == {
+        "model": "m.gguf", "n_threads": 4, "n_ctx": 2048, "n_predict": 100, "stop": ["</s>"],
+    }
+
+def test_server_payload_leaves_out_unset_settings():
+    backend = ServerBackend("http://x/generate", None, None, None, max_tokens=None, stop=())
+    assert backend._payload == {}
+
+def test_harness_caps_completions_at_its_reserved_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings = {k: v for k, v in vars(config).items() if k.isupper()}
+    settings.update(LLM_BACKEND="server", RESERVED_OUTPUT_TOKENS=77)
+    harness = Harness(types.SimpleNamespace(**settings))
+    backend = harness._backend()
+    assert backend.max_tokens == 77
+    assert backend._payload["n_predict"] == 77
+    assert backend._payload["stop"] == llm.STOP
+
+class FakeState:
+    def __init__(self, n_tokens, llama_state, llama_state_size):
+        self.n_tokens = n_tokens
+        self.llama_state = llama_state
+        self.llama_state_size = llama_state_size
+
+class FakeLlama:
+    """The parts of llama_cpp.Llama that prefix caching uses."""
+
+    model_path = "m.gguf"
+
+    def __init__(self):
+        self.evaluated = []
+
+    def n_ctx(self):
+        return 2048
+
+    def reset(self):
+        pass
+
+    def tokenize(self, text):
+        return text.split()
+
+    def eval(self, tokens):
+        self.evaluated.append(tokens)
+
+    def save_state(self):
+        return FakeState(len(self.evaluated[-1]), b"\x00state\xff", 7)
+
+def _fresh_prefix_states(monkeypatch):
+    monkeypatch.setattr(backends, "_prefix_states", {})
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(LlamaState=FakeState))
+
+def test_prefix_state_is_saved_and_reloaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache_dir = str(tmp_path / "prefix")
+    _fresh_prefix_states(monkeypatch)
+    first = FakeLlama()
+    backends._load_prefix_state(first, "an instruction", cache_dir)
+    (path,) = (tmp_path / "prefix").iterdir()
+    assert path.stat().st_mode & 0o777 == 0o600
+
+    _fresh_prefix_states(monkeypatch)
+    second = FakeLlama()
+    state = backends._load_prefix_state(second, "an instruction", cache_dir)
+    assert second.evaluated == []
+    assert vars(state) == {"n_tokens": 2, "llama_state": b"\x00state\xff", "llama_state_size": 7}
+
+def test_prefix_state_for_another_prefix_is_not_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _fresh_prefix_states(monkeypatch)
+    llm = FakeLlama()
+    state = FakeState(1, b"x", 1)
+    path = backends._prefix_state_path(llm, "a", str(tmp_path))
+    backends._write_prefix_state(path, state, backends._prefix_state_header(llm, "b"))
+    assert backends._read_prefix_state(path, backends._prefix_state_header(llm, "a")) is None
+    assert vars(backends._read_prefix_state(path, backends._prefix_state_header(llm, "b"))) == vars(state)
+
+def test_unsafe_or_corrupt_prefix_states_are_recomputed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache_dir = str(tmp_path / "prefix")
+    _fresh_prefix_states(monkeypatch)
+    backends._load_prefix_state(FakeLlama(), "an instruction", cache_dir)
+    (path,) = (tmp_path / "prefix").iterdir()
+    data = path.read_bytes()
+
+    for mode, content in ((0o666, data), (0o620, data), (0o600, data[:-3]), (0o600, b"junk")):
+        path.write_bytes(content)
+        path.chmod(mode)
+        _fresh_prefix_states(monkeypatch)
+        llm = FakeLlama()
+        backends._load_prefix_state(llm, "an instruction", cache_dir)
+        assert len(llm.evaluated) == 1, (oct(mode), content)
+    path.chmod(0o622)
+    with pytest.raises(ValueError, match="writable"):
+        backends._read_prefix_state(str(path), backends._prefix_state_header(llm, "an instruction"))
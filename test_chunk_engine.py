@@ -0,0 +1,71 @@
+import mmap
+
+from .chunk_engine import ChunkIndex, align_to_char
+from .chunk_manager import batch_chunks, chunk_blocks
+
+TEXTS = {
+    "ascii": "The quick brown fox\njumps over the lazy dog. " * 40,
+    "utf8": "grüße 东京 naïve x😀y\nþorn\tü " * 40,
+    "crlf": "first line\r\nsecond lïne\r\n\r\nthird 東\r\n" * 40,
+    "mixed": "plain ascii " * 30 + "ünïcödé 😀 " * 30 + "\r\nback to ascii " * 30,
+}
+
+def test_chunk_index_matches_chunk_blocks():
+    for name, text in TEXTS.items():
+        data = text.encode("utf-8")
+        for block_size in (1, 3, 7, 64, len(text) + 1):
+            for window in (4, 5, 13, 1 << 22):
+                index = ChunkIndex(data, block_size, window=window)
+                assert list(index) == chunk_blocks(text, block_size), (name, block_size, window)
+
+def test_chunk_index_spans_are_byte_ranges_of_the_chunks():
+    data = TEXTS["utf8"].encode("utf-8")
+    index = ChunkIndex(data, 11, window=9)
+    spans = list(index.spans())
+    assert [data[start:end].decode("utf-8") for start, end in spans] == list(index)
+    for batch in index.batches(3):
+        for i, (start, end) in enumerate(batch.spans):
+            assert bytes(batch.chunk_view(i)) == data[start:end]
+        assert batch.end == batch.spans[-1][1]
+    assert spans[0][0] == 0 and spans[-1][1] == len(data)
+
+def test_chunk_index_finds_boundaries_as_it_goes():
+    data = TEXTS["mixed"].encode("utf-8")
+    index = ChunkIndex(data, 5, window=16)
+    windows = []
+    find = index._window_starts
+    index._window_starts = lambda *args: windows.append(args[0]) or find(*args)
+    batches = index.batches(2)
+    assert windows == []
+    first = next(batches)
+    assert list(first) == chunk_blocks(TEXTS["mixed"], 5)[:2]
+    assert len(windows) == 1
+    rest = [list(batch) for batch in batches]
+    assert [list(first)] + rest == batch_chunks(chunk_blocks(TEXTS["mixed"], 5), 2)
+    assert len(windows) > 10
+
+def test_chunk_index_of_a_byte_range():
+    data = TEXTS["mixed"].encode("utf-8")
+    start = align_to_char(data, len(data) // 3)
+    end = align_to_char(data, 2 * len(data) // 3)
+    text = data[start:end].decode("utf-8")
+    assert list(ChunkIndex(data, 9, start, end, window=16)) == chunk_blocks(text, 9)
+
+def test_chunk_index_over_an_mmap(tmp_path):
+    text = TEXTS["crlf"]
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(text.encode("utf-8"))
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with ChunkIndex(mapped, 10, window=32) as index:
+            assert list(index) == chunk_blocks(text, 10)
+            batches = [list(batch) for batch in index.batches(4)]
+    assert batches == batch_chunks(chunk_blocks(text, 10), 4)
+
+def test_chunk_index_of_empty_text():
+    assert list(ChunkIndex(b"", 8)) == []
+    assert list(ChunkIndex(b"abc", 8, 3, 3).batches(2)) == []
+
+def test_align_to_char_backs_off_continuation_bytes():
+    data = "a😀b".encode("utf-8")
+    assert [align_to_char(data, i) for i in range(len(data) + 1)] == [0, 1, 1, 1, 1, 5, 6]
+    assert align_to_char(data, 3, start=2) == 2
@@ -0,0 +1,73 @@
+import io
+import random
+
+from .chunk_manager import (
+    batch_chunks, chunk_blocks, iter_batches, iter_chunks, iter_text, iter_token_chunks,
+)
+
+TEXT = "alpha  beta\ngrüße 东京\t x😀y\n\nnaïve   z " * 37
+
+def _pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_iter_text_without_trimming_yields_the_text():
+    for window in (1, 3, 7, 64, 10_000):
+        assert "".join(iter_text(io.StringIO(TEXT), window)) == TEXT
+
+def test_iter_text_trims_like_split_and_join():
+    words = TEXT.split()
+    for window in (1, 5, 16, 10_000):
+        for pre, post in ((0, 0), (2, 0), (0, 3), (4, 5), (len(words), 1)):
+            got = "".join(
+                iter_text(io.StringIO(TEXT), window, pre, post, normalize=True)
+            )
+            assert got == " ".join(words[pre:len(words) - post]), (window, pre, post)
+
+def test_iter_text_keeps_words_split_across_windows_whole():
+    got = "".join(iter_text(io.StringIO("abcdef ghijkl"), 4, 1, 0))
+    assert got == "ghijkl"
+
+def test_iter_chunks_matches_chunk_blocks_for_any_pieces():
+    rng = random.Random(0)
+    for _ in range(200):
+        text = TEXT[: rng.randint(0, len(TEXT))]
+        block_size = rng.randint(1, 40)
+        pieces = _pieces(text, rng.randint(1, 50))
+        assert list(iter_chunks(pieces, block_size)) == chunk_blocks(text, block_size)
+
+def test_iter_chunks_of_empty_input():
+    assert list(iter_chunks([], 8)) == []
+    assert list(iter_chunks(["", ""], 8)) == []
+
+def test_iter_batches_matches_batch_chunks():
+    chunks = chunk_blocks(TEXT, 11)
+    for batch_size in (1, 3, 10, len(chunks), len(chunks) + 1):
+        assert list(iter_batches(iter(chunks), batch_size)) == batch_chunks(chunks, batch_size)
+
+def _approx_tokens(text):
+    return (len(text) + 3) // 4
+
+def test_iter_token_chunks_reproduce_the_text_within_budget():
+    for max_tokens in (1, 2, 5, 40):
+        for size in (1, 7, 1000):
+            chunks = list(iter_token_chunks(_pieces(TEXT, size), max_tokens, _approx_tokens))
+            assert "".join(chunks) == TEXT
+            assert all(_approx_tokens(c) <= max_tokens for c in chunks), (max_tokens, size)
+
+def test_iter_token_chunks_do_not_depend_on_pieces():
+    expected = list(iter_token_chunks([TEXT], 9, _approx_tokens))
+    for size in (1, 2, 13, 64):
+        assert list(iter_token_chunks(_pieces(TEXT, size), 9, _approx_tokens)) == expected
+
+def test_iter_token_chunks_end_on_word_boundaries():
+    chunks = list(iter_token_chunks(_pieces(TEXT, 5), 12, _approx_tokens))
+    for chunk, following in zip(chunks, chunks[1:]):
+        assert chunk[-1].isspace() or following[0].isspace(), (chunk, following)
+
+def test_iter_token_chunks_split_overlong_words():
+    word = "x" * 50
+    chunks = list(iter_token_chunks(["ab ", word, " cd"], 4, _approx_tokens))
+    assert chunks[0] == "ab"
+    assert "".join(chunks[1:-1]) == " " + word
+    assert all(_approx_tokens(c) <= 4 for c in chunks)
+    assert chunks[-1] == " cd"
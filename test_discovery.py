@@ -0,0 +1,90 @@
+import os
+
+from . import config
+from . import discovery
+from .discovery import Manifest, path_matches, scan
+
+def _tree(root, files):
+    for relpath, text in files.items():
+        path = root / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+def _relpaths(directory, **kwargs):
+    return sorted(e.relpath for e in scan(str(directory), **kwargs))
+
+def test_path_matches_relpath_or_name():
+    assert path_matches(os.path.join("a", "b.txt"), ["*.txt"])
+    assert path_matches(os.path.join("a", "b.txt"), ["a/*"])
+    assert not path_matches(os.path.join("a", "b.txt"), ["b", "*.md"])
+
+def test_include_and_exclude(tmp_path):
+    _tree(tmp_path, {"a.txt": "a", "b.md": "b", "sub/c.txt": "c", "skip/d.txt": "d"})
+    assert _relpaths(tmp_path) == ["a.txt", "b.md", "skip/d.txt", "sub/c.txt"]
+    assert _relpaths(tmp_path, include=["*.txt"]) == ["a.txt", "skip/d.txt", "sub/c.txt"]
+    # An excluded directory is not descended into
+    assert _relpaths(tmp_path, include=["*.txt"], exclude=["skip"]) == ["a.txt", "sub/c.txt"]
+    assert _relpaths(tmp_path, recursive=False) == ["a.txt", "b.md"]
+
+def test_default_exclude_skips_outputs_and_hidden_entries(tmp_path):
+    _tree(tmp_path, {
+        "in.txt": "x",
+        "in.txt.llm_output.txt": "x",
+        "in.txt.llm_output.jsonl": "x",
+        "in.txt.llm_output.part0001.txt": "x",
+        ".hidden.txt": "x",
+        ".cache/inner.txt": "x",
+        "sub/in.txt": "x",
+    })
+    assert _relpaths(tmp_path, exclude=config.EXCLUDE) == ["in.txt", "sub/in.txt"]
+
+def test_symlinks(tmp_path):
+    _tree(tmp_path, {"real/a.txt": "a"})
+    os.symlink(tmp_path / "real" / "a.txt", tmp_path / "link.txt")
+    os.symlink(tmp_path / "real", tmp_path / "real" / "loop")
+    assert _relpaths(tmp_path) == ["real/a.txt"]
+    # The loop back into real/ is visited once, not forever
+    assert _relpaths(tmp_path, follow_symlinks=True) == ["link.txt", "real/a.txt"]
+
+def test_missing_directory_yields_nothing(tmp_path):
+    assert _relpaths(tmp_path / "missing") == []
+
+def test_manifest_skips_recorded_files(tmp_path):
+    _tree(tmp_path, {"data/a.txt": "alpha", "data/b.txt": "beta"})
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest = Manifest(manifest_path)
+    entries = list(scan(str(tmp_path / "data")))
+    assert manifest.changed(entries) == entries
+    for entry in entries:
+        manifest.record(entry)
+    manifest.save()
+
+    reloaded = Manifest(manifest_path)
+    assert reloaded.changed(list(scan(str(tmp_path / "data")))) == []
+    (tmp_path / "data" / "b.txt").write_text("beta, longer")
+    (tmp_path / "data" / "c.txt").write_text("new")
+    changed = reloaded.changed(list(scan(str(tmp_path / "data"))))
+    assert [e.relpath for e in changed] == ["b.txt", "c.txt"]
+
+def test_manifest_rehashes_touched_files(tmp_path, monkeypatch):
+    _tree(tmp_path, {"data/a.txt": "alpha", "data/b.txt": "bravo"})
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    entries = list(scan(str(tmp_path / "data")))
+    manifest.changed(entries)
+    for entry in entries:
+        manifest.record(entry)
+
+    path_a, path_b = tmp_path / "data" / "a.txt", tmp_path / "data" / "b.txt"
+    os.utime(path_a, (1, 1))
+    path_b.write_text("BRAVO")  # same size, new content
+    os.utime(path_b, (2, 2))
+    hashed = []
+    real_hash = discovery.file_hash
+    monkeypatch.setattr(discovery, "file_hash", lambda p: hashed.append(p) or real_hash(p))
+    changed = manifest.changed(list(scan(str(tmp_path / "data"))))
+    assert [e.relpath for e in changed] == ["b.txt"]
+    assert sorted(hashed) == sorted([str(path_a), str(path_b)])
+    # The touched file's new mtime is remembered, so it is not hashed again
+    hashed.clear()
+    assert manifest.changed([e for e in scan(str(tmp_path / "data")) if e.relpath == "a.txt"]) == []
+    assert hashed == []
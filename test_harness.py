@@ -1,6 +1,13 @@
 import time
 import os
+import types
+
+from . import config
+from . import harness as harness_module
+from . import scheduler
+from .backends import MockBackend
 from .harness import Harness
+from .scheduler import plan_tasks, shard_ranges
 
 def test_throughput():
     print("=== Starting harness throughput test ===")
@@ -14,8 +21,63 @@ def test_throughput():
     for out in output_files:
         print(f"Output file: {out} | Size: {os.path.getsize(out)/1024:.1f} KB")
 
+TEXT = "first line\r\nsecond lïne with 東京\r\n\r\nthird\tline\rold mac\r\n" * 50
+
+def _inputs(path, shard_size=0, **overrides):
+    settings = {k: v for k, v in vars(config).items() if k.isupper()}
+    settings.update(
+        FEEDBACK_CONTROL=False, BATCHED_INFERENCE=False, STREAM_TOKENS=False,
+        BASE_CHUNK_SIZE=37, BASE_BATCH_SIZE=4, CHUNK_MODE="chars", STREAM_WINDOW_SIZE=64,
+    )
+    settings.update(overrides)
+    harness = Harness(types.SimpleNamespace(**settings), MockBackend())
+    tasks = plan_tasks([str(path)], shard_size)
+    shards = [t if t.shards > 1 else None for t in sorted(tasks, key=lambda t: t.shard)]
+    inputs = [
+        r["input"] for shard in shards for r in harness.iter_process_file(str(path), None, shard)
+    ]
+    harness.logger.flush()
+    return inputs
+
+def test_read_paths_agree_on_crlf_input(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(TEXT.encode("utf-8"))
+    expected = _inputs(path)
+    # Every path translates line endings, like the default text mode read
+    assert "".join(expected) == TEXT.replace("\r\n", "\n").replace("\r", "\n")
+    assert _inputs(path, STREAMING=True) == expected
+    assert _inputs(path, MMAP_INPUT=True) == expected
+    for overrides in ({"POST_TOKEN_COUNT": 2}, {"PRE_TOKEN_COUNT": 3, "POST_TOKEN_COUNT": 2}):
+        expected = _inputs(path, **overrides)
+        assert _inputs(path, STREAMING=True, **overrides) == expected, overrides
+        assert _inputs(path, MMAP_INPUT=True, **overrides) == expected, overrides
+
+def test_shard_read_paths_agree_on_crlf_input(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(TEXT.encode("utf-8"))
+    assert "".join(_inputs(path, 500)) == TEXT.replace("\r\n", "\n").replace("\r", "\n")
+    for overrides in ({}, {"PRE_TOKEN_COUNT": 3, "POST_TOKEN_COUNT": 2}):
+        expected = _inputs(path, 500, **overrides)
+        assert _inputs(path, 500, MMAP_INPUT=True, **overrides) == expected, overrides
+
+def test_shards_do_not_split_crlf(tmp_path, monkeypatch):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(b"a" * 9 + b"\r\n" + b"b" * 5)
+    assert shard_ranges(str(path), 9) == [(0, 11), (11, 16)]
+    # Also when the \r is the last byte scanned for whitespace
+    monkeypatch.setattr(scheduler, "_ALIGN_WINDOW", 1)
+    assert shard_ranges(str(path), 9) == [(0, 11), (11, 16)]
+
 def run():
     test_throughput()
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
+def test_worker_threads_split_the_cores_by_pool_size(monkeypatch):
+    monkeypatch.setattr(harness_module.psutil, "cpu_count", lambda logical=True: 8)
+    for pool_size, threads in ((1, 8), (2, 4), (3, 2), (16, 1)):
+        monkeypatch.setattr(harness_module.llm_wrapper, "N_THREADS", 8)
+        harness_module._init_worker(pool_size)
+        assert harness_module.llm_wrapper.N_THREADS == threads
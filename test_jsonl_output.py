@@ -0,0 +1,131 @@
+import gzip
+import json
+import multiprocessing
+import os
+import types
+
+import pytest
+
+from . import jsonl_output
+from .jsonl_output import JsonlWriter, parse_fsync_policy, write_jsonl
+
+RECORDS = [{"seq": i, "text": f"récord {i} 東京"} for i in range(50)]
+
+def _lines(data):
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    """Counts fsync calls instead of making them."""
+    calls = []
+    monkeypatch.setattr(jsonl_output.os, "fsync", lambda fd: calls.append(fd))
+    return calls
+
+def test_output_is_replaced_atomically(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"old": true}\n')
+    writer = JsonlWriter(str(path), buffer_size=64)
+    writer.write_many(RECORDS)
+    assert writer.target == f"{path}.tmp"
+    assert os.path.getsize(writer.target) > 0
+    assert _lines(path.read_bytes()) == [{"old": True}]
+    writer.close()
+    assert _lines(path.read_bytes()) == RECORDS
+    assert not os.path.exists(f"{path}.tmp")
+    assert writer.records == len(RECORDS)
+
+def test_abort_keeps_the_temporary_file(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"old": true}\n')
+    with pytest.raises(RuntimeError):
+        with JsonlWriter(str(path)) as writer:
+            writer.write_many(RECORDS[:10])
+            raise RuntimeError("interrupted")
+    assert writer.closed
+    assert _lines(path.read_bytes()) == [{"old": True}]
+    assert _lines((tmp_path / "out.jsonl.tmp").read_bytes()) == RECORDS[:10]
+
+def test_append(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_jsonl(RECORDS[:5], str(path))
+    with JsonlWriter(str(path), append=True) as writer:
+        assert writer.target == str(path)
+        writer.write_many(RECORDS[5:])
+    assert _lines(path.read_bytes()) == RECORDS
+    assert not os.path.exists(f"{path}.tmp")
+
+def test_parse_fsync_policy():
+    assert parse_fsync_policy("close") == "close"
+    assert parse_fsync_policy(" Always ") == "always"
+    assert parse_fsync_policy("NEVER") == "never"
+    assert parse_fsync_policy("2.5") == 2.5
+    assert parse_fsync_policy(3) == 3.0
+    with pytest.raises(ValueError, match="Unknown fsync policy"):
+        parse_fsync_policy("sometimes")
+
+def test_fsync_policies(tmp_path, fsyncs):
+    def run(policy):
+        fsyncs.clear()
+        with JsonlWriter(str(tmp_path / f"{policy}.jsonl"), fsync=policy) as writer:
+            writer.write_many(RECORDS[:10])
+        return len(fsyncs)
+
+    assert run("never") == 0
+    # The file before the rename, then its directory
+    assert run("close") == 2
+    assert run("always") == 10 + 2
+
+def test_fsync_interval(tmp_path, fsyncs, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(jsonl_output, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    path = tmp_path / "out.jsonl"
+    writer = JsonlWriter(str(path), fsync="5")
+    for record in RECORDS[:10]:
+        writer.write(record)
+        now[0] += 1
+    # Synced once, after 5 seconds, with everything written so far
+    assert len(fsyncs) == 1
+    assert _lines((tmp_path / "out.jsonl.tmp").read_bytes()) == RECORDS[:6]
+    writer.close()
+    assert _lines(path.read_bytes()) == RECORDS[:10]
+
+def test_gzip_round_trip(tmp_path):
+    path = tmp_path / "out.jsonl.gz"
+    with JsonlWriter(str(path), compression="gzip", buffer_size=64) as writer:
+        writer.write_many(RECORDS[:20])
+    with JsonlWriter(str(path), append=True, compression="gzip") as writer:
+        writer.write_many(RECORDS[20:])
+    with gzip.open(path, "rb") as f:
+        assert _lines(f.read()) == RECORDS
+
+def test_zstd_round_trip(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "out.jsonl.zst"
+    with JsonlWriter(str(path), compression="zstd", buffer_size=64, fsync="always") as writer:
+        writer.write_many(RECORDS[:20])
+    with JsonlWriter(str(path), append=True, compression="zstd") as writer:
+        writer.write_many(RECORDS[20:])
+    with open(path, "rb") as f:
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        assert _lines(reader.read()) == RECORDS
+
+def test_unknown_compression_leaves_no_file(tmp_path):
+    with pytest.raises(ValueError, match="Unknown compression"):
+        JsonlWriter(str(tmp_path / "out.jsonl"), compression="lz4")
+    assert os.listdir(tmp_path) == []
+
+def _write_then_die(path):
+    writer = JsonlWriter(path, buffer_size=64)
+    writer.write_many(RECORDS)
+    writer.flush()
+    os._exit(1)  # no close, no cleanup
+
+def test_a_killed_writer_leaves_no_truncated_output(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_jsonl(RECORDS[:3], str(path))
+    process = multiprocessing.get_context("fork").Process(target=_write_then_die, args=(str(path),))
+    process.start()
+    process.join()
+    assert process.exitcode == 1
+    assert _lines(path.read_bytes()) == RECORDS[:3]
+    assert _lines((tmp_path / "out.jsonl.tmp").read_bytes()) == RECORDS
@@ -0,0 +1,87 @@
+import types
+
+import pytest
+
+from . import load_balancer
+from .backends import LLMError, ServerBackend
+from .load_balancer import LoadBalancer, NoEndpointAvailable, get_balancer
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # ejections are logged to harness.log
+    now = [1000.0]
+    monkeypatch.setattr(load_balancer, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def _request(balancer, ok, latency=1.0):
+    endpoint = balancer.acquire()
+    balancer.release(endpoint, latency, ok)
+    return endpoint.url
+
+def test_circuit_opens_then_half_opens_and_readmits(clock):
+    balancer = LoadBalancer(["http://a"], health_interval=0, max_failures=2, cooldown=10)
+    _request(balancer, ok=False)
+    assert not balancer.endpoints[0].ejected
+    _request(balancer, ok=False)
+    assert balancer.endpoints[0].ejected
+
+    # Open: fail fast until the cooldown has passed
+    with pytest.raises(NoEndpointAvailable) as info:
+        balancer.acquire()
+    assert info.value.retry_after == 10
+    clock[0] += 4
+    with pytest.raises(NoEndpointAvailable) as info:
+        balancer.acquire()
+    assert info.value.retry_after == 6
+
+    # Half-open: one trial request; a failed trial opens the circuit again
+    clock[0] += 6
+    trial = balancer.acquire()
+    with pytest.raises(NoEndpointAvailable):
+        balancer.acquire()
+    balancer.release(trial, 1.0, ok=False)
+    assert balancer.endpoints[0].ejected
+    with pytest.raises(NoEndpointAvailable) as info:
+        balancer.acquire()
+    assert info.value.retry_after == 10
+
+    # A successful trial closes it
+    clock[0] += 10
+    _request(balancer, ok=True)
+    assert balancer.stats()[0]["ejected"] is False
+    assert balancer.stats()[0]["failures"] == 0
+    assert _request(balancer, ok=True) == "http://a"
+
+def test_failing_and_slow_endpoints_are_ejected(clock):
+    balancer = LoadBalancer(
+        ["http://a", "http://b", "http://c"], health_interval=0, max_failures=1, slow_factor=3
+    )
+    # In flight at once, the requests spread over all three
+    a, b, c = (balancer.acquire() for _ in range(3))
+    assert [a.url, b.url, c.url] == ["http://a", "http://b", "http://c"]
+    balancer.release(a, 1.0, ok=True)
+    balancer.release(c, 1.2, ok=True)
+    balancer.release(b, 4.0, ok=True)
+    assert [e.ejected for e in balancer.endpoints] == [False, True, False]
+    assert _request(balancer, ok=False) == "http://a"
+    assert [e.ejected for e in balancer.endpoints] == [True, True, False]
+    assert {_request(balancer, ok=True) for _ in range(3)} == {"http://c"}
+
+def test_a_single_server_gets_a_breaker_without_health_checks(monkeypatch):
+    monkeypatch.setattr(load_balancer, "_balancers", {})
+    balancer = get_balancer(["http://only/generate"])
+    assert balancer._thread is None
+    assert get_balancer(["http://only/generate"]) is balancer
+
+def test_single_server_requests_fail_fast_once_the_circuit_opens(clock, monkeypatch):
+    monkeypatch.setattr(load_balancer, "_balancers", {})
+    # Nothing listens on the discard port: every request is a connection error
+    backend = ServerBackend("http://127.0.0.1:9/generate", None, None, None)
+    for _ in range(load_balancer.LLM_EJECT_FAILURES):
+        with pytest.raises(LLMError) as info:
+            backend.generate("hello")
+        assert "ejected" not in str(info.value)
+    with pytest.raises(LLMError, match="ejected") as info:
+        backend.generate("hello")
+    assert info.value.retryable
+    assert info.value.retry_after == load_balancer.LLM_EJECT_COOLDOWN
@@ -0,0 +1,120 @@
+import types
+
+import pytest
+
+from . import config
+from . import output_sinks
+from .backends import MockBackend
+from .harness import Harness, _merge_shards
+from .output_sinks import FORMATS, TIMINGS, merge_outputs, open_sink, read_input, read_records
+from .scheduler import plan_tasks
+
+METRICS = dict({name: float(i) for i, name in enumerate(TIMINGS)}, ok=True)
+RECORDS = [
+    {"input": "first chunk", "output": "FIRST", "chunk_idx": 0, "batch_idx": 0},
+    {"input": "sëcond 東京", "output": "", "chunk_idx": 1, "batch_idx": 0, "error": "timed out"},
+    {"input": "third", "output": "THIRD", "chunk_idx": 0, "batch_idx": 1, "metrics": METRICS},
+]
+
+def _require(fmt):
+    if fmt in ("parquet", "arrow") and output_sinks.pa is None:
+        pytest.skip("pyarrow is not installed")
+    if fmt == "jsonl.zst" and output_sinks.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+def _write(path, records):
+    with open_sink(str(path)) as sink:
+        sink.write_many(records)
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_read_records_round_trips(tmp_path, fmt):
+    _require(fmt)
+    path = tmp_path / f"out.{fmt}"
+    _write(path, RECORDS)
+    assert list(read_records(str(path))) == RECORDS
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_inputs_by_reference_round_trip(tmp_path, fmt):
+    _require(fmt)
+    source = tmp_path / "in.txt"
+    source.write_bytes("abc dëf".encode("utf-8"))
+    records = [
+        {"file": str(source), "input_offset": 0, "input_length": 4, "output": "x",
+         "chunk_idx": 0, "batch_idx": 0, "shard": 2},
+        {"file": str(source), "input_offset": 4, "input_length": 4, "output": "y",
+         "chunk_idx": 1, "batch_idx": 0, "shard": 2},
+    ]
+    path = tmp_path / f"out.{fmt}"
+    _write(path, records)
+    back = list(read_records(str(path)))
+    assert back == records
+    assert [read_input(r) for r in back] == ["abc ", "dëf"]
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_merge_outputs(tmp_path, fmt):
+    _require(fmt)
+    parts = [str(tmp_path / f"part{i}.{fmt}") for i in range(3)]
+    for i, part in enumerate(parts):
+        _write(part, [dict(r, shard=i) for r in RECORDS])
+    final = tmp_path / f"out.{fmt}"
+    merge_outputs(parts, str(final))
+    assert list(read_records(str(final))) == [dict(r, shard=i) for i in range(3) for r in RECORDS]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"out.{fmt}"]
+
+def test_unknown_formats_are_refused(tmp_path):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        open_sink(str(tmp_path / "out.csv"))
+    with pytest.raises(ValueError, match="Unknown output format"):
+        list(read_records(str(tmp_path / "out.csv")))
+
+def _harness(**overrides):
+    settings = {k: v for k, v in vars(config).items() if k.isupper()}
+    settings.update(
+        FEEDBACK_CONTROL=False, BATCHED_INFERENCE=False, STREAM_TOKENS=False, RESUME=False,
+        BASE_CHUNK_SIZE=16, BASE_BATCH_SIZE=4, CHUNK_MODE="chars", STREAM_WINDOW_SIZE=64,
+    )
+    settings.update(overrides)
+    return Harness(types.SimpleNamespace(**settings), MockBackend())
+
+def _process(tmp_path, text, fmt, shard_size=0, **overrides):
+    path = tmp_path / "in.txt"
+    path.write_bytes(text.encode("utf-8"))
+    harness = _harness(OUTPUT_FORMAT=fmt, **overrides)
+    tasks = plan_tasks([str(path)], shard_size)
+    for task in tasks:
+        harness._process_and_save(str(path), task if task.shards > 1 else None)
+    if len(tasks) > 1:
+        _merge_shards("in.txt", len(tasks), fmt)
+    harness.logger.flush()
+    return list(read_records(str(tmp_path / f"in.txt.llm_output.{fmt}")))
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_harness_stores_inputs_by_reference(tmp_path, monkeypatch, fmt):
+    _require(fmt)
+    monkeypatch.chdir(tmp_path)
+    text = "".join(f"word{i} ünïcode 東京 " for i in range(40))
+    for shard_size in (0, 200):
+        by_value = _process(tmp_path, text, fmt, shard_size)
+        records = _process(tmp_path, text, fmt, shard_size, INPUT_BY_REFERENCE=True)
+        assert all("input" not in r for r in records)
+        assert [read_input(r) for r in records] == [r["input"] for r in by_value]
+        assert "".join(read_input(r) for r in records) == text
+        assert [r["output"] for r in records] == [r["output"] for r in by_value]
+        if shard_size:
+            assert len({r["shard"] for r in records}) > 1
+
+@pytest.mark.parametrize("fmt", ("jsonl", "parquet"))
+def test_inputs_fall_back_to_by_value_once_chunks_stop_matching(tmp_path, monkeypatch, fmt):
+    _require(fmt)
+    monkeypatch.chdir(tmp_path)
+    # Line endings are translated, so the chunks stop matching at the first \r\n
+    text = "plain words " * 10 + "a line\r\nanother\r\n" * 5
+    records = _process(tmp_path, text, fmt, INPUT_BY_REFERENCE=True)
+    switch = next(i for i, r in enumerate(records) if "input" in r)
+    assert switch > 0
+    assert all("input" not in r for r in records[:switch])
+    assert all("input" in r for r in records[switch:])
+    assert "".join(read_input(r) for r in records) == text.replace("\r\n", "\n")
+    # Rewritten text is kept by value from the start
+    records = _process(tmp_path, text, fmt, INPUT_BY_REFERENCE=True, PRE_TOKEN_COUNT=1)
+    assert all("input" in r for r in records)
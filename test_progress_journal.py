@@ -0,0 +1,96 @@
+import types
+
+from . import config
+from .backends import LLMError, MockBackend
+from .harness import Harness
+from .progress_journal import ProgressJournal
+
+TEXT = "".join(f"line {i} with some words\r\n" for i in range(60))
+
+class CountingBackend(MockBackend):
+    """Echoes prompts, failing those listed in fail."""
+
+    def __init__(self, fail=()):
+        super().__init__()
+        self.fail = set(fail)
+        self.prompts = []
+
+    def generate(self, prompt, usage=None):
+        self.prompts.append(prompt)
+        if prompt in self.fail:
+            raise LLMError("unavailable")
+        return prompt.upper()
+
+def _config(**overrides):
+    settings = {k: v for k, v in vars(config).items() if k.isupper()}
+    settings.update(
+        RESUME=True, FEEDBACK_CONTROL=False, BATCHED_INFERENCE=False, STREAM_TOKENS=False,
+        BASE_CHUNK_SIZE=40, BASE_BATCH_SIZE=4, CHUNK_MODE="chars",
+    )
+    settings.update(overrides)
+    return types.SimpleNamespace(**settings)
+
+def _journal(tmp_path, path, harness):
+    return ProgressJournal(
+        str(tmp_path / "journal"), str(path), "chars", None, harness._chunking(None)
+    )
+
+def _run(tmp_path, path, settings, backend):
+    harness = Harness(settings, backend)
+    journal = _journal(tmp_path, path, harness)
+    if journal.load():
+        journal.resume()
+    records = list(harness.iter_process_file(str(path), journal))
+    journal.close()
+    harness.logger.flush()
+    return records
+
+def test_journal_reload_ignores_a_truncated_line(tmp_path):
+    path = tmp_path / "in.txt"
+    path.write_text(TEXT)
+    journal = ProgressJournal(str(tmp_path), str(path), chunking={"read": "whole"})
+    journal.start(40, 4)
+    journal.record(0, "a")
+    journal.record(1, "b")
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "out')
+    loaded = ProgressJournal(str(tmp_path), str(path), chunking={"read": "whole"})
+    assert loaded.load()
+    assert (loaded.chunk_size, loaded.batch_size) == (40, 4)
+    assert loaded.completed == {0: "a", 1: "b"}
+    assert not loaded.done
+
+def test_journal_of_other_chunking_is_not_resumed(tmp_path):
+    path = tmp_path / "in.txt"
+    path.write_text(TEXT)
+    journal = ProgressJournal(str(tmp_path), str(path), chunking={"read": "whole"})
+    journal.start(40, 4)
+    journal.close()
+    assert not ProgressJournal(str(tmp_path), str(path), chunking={"read": "mmap"}).load()
+    assert not ProgressJournal(str(tmp_path), str(path), "tokens", chunking={"read": "whole"}).load()
+
+def test_resume_only_resends_failed_chunks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "in.txt"
+    path.write_bytes(TEXT.encode("utf-8"))
+    for overrides in ({}, {"STREAMING": True}, {"MMAP_INPUT": True}, {"PRE_TOKEN_COUNT": 2}):
+        settings = _config(**overrides)
+        reference = _run(tmp_path / "ref", path, settings, CountingBackend())
+        inputs = [r["input"] for r in reference]
+        failing = set(inputs[3:5] + inputs[-1:])
+
+        first = CountingBackend(fail=failing)
+        partial = _run(tmp_path / "j", path, settings, first)
+        assert [r["input"] for r in partial] == inputs
+        assert sum("error" in r for r in partial) == len(failing)
+
+        # The controller's sizes may differ on resume; the journal's win
+        resumed = CountingBackend()
+        again = _run(tmp_path / "j", path, _config(BASE_CHUNK_SIZE=64, **overrides), resumed)
+        assert sorted(resumed.prompts) == sorted(failing), overrides
+        assert [(r["input"], r["output"]) for r in again] == [
+            (r["input"], r["output"]) for r in reference
+        ]
+        for journal in (tmp_path / "j" / "journal").iterdir():
+            journal.unlink()
@@ -0,0 +1,118 @@
+from . import response_cache
+from . import unified_llm_wrapper as llm
+from .backends import MockBackend
+from .response_cache import ResponseCache, cache_key
+
+class CountingBackend(MockBackend):
+    """Echoes prompts, counting the requests that reach it."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def stream(self, prompt, usage=None):
+        self.calls += 1
+        return super().stream(prompt, usage)
+
+def _use_cache(monkeypatch, path):
+    monkeypatch.setattr(response_cache, "LLM_CACHE_PATH", str(path))
+    monkeypatch.setattr(response_cache, "_cache", None)
+    monkeypatch.setattr(llm, "PROMPT_PREFIX", "")
+
+def test_cache_key_covers_every_input():
+    base = cache_key("prompt", "model.gguf", 4096, {"max_tokens": 512})
+    assert base == cache_key("prompt", "model.gguf", 4096, {"max_tokens": 512})
+    assert len({
+        base,
+        cache_key("prompt ", "model.gguf", 4096, {"max_tokens": 512}),
+        cache_key("prompt", "other.gguf", 4096, {"max_tokens": 512}),
+        cache_key("prompt", "model.gguf", 2048, {"max_tokens": 512}),
+        cache_key("prompt", "model.gguf", 4096, {"max_tokens": 256}),
+        cache_key("prompt", "model.gguf", 4096, {"max_tokens": 512, "stop": ["</s>"]}),
+    }) == 6
+
+def test_get_and_put(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.db"), 1 << 20)
+    assert cache.get("k") is None
+    cache.put("k", "response")
+    assert cache.get("k") == "response"
+    cache.put("k", "replaced")
+    assert cache.get("k") == "replaced"
+    assert cache.stats()["bytes"] == len("replaced")
+
+def test_eviction_drops_least_recently_used_past_the_byte_limit(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: clock[0])
+    cache = ResponseCache(str(tmp_path / "c.db"), 30)
+    for key in "abc":
+        cache.put(key, key * 10)
+        clock[0] += 10
+    # A hit older than TOUCH_INTERVAL makes "a" the most recently used
+    assert cache.get("a") == "a" * 10
+    clock[0] += 10
+    cache.put("d", "d" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["a" * 10, "c" * 10, "d" * 10]
+    assert cache.stats()["bytes"] == 30
+    cache.put("e", "e" * 25)
+    assert cache.stats()["entries"] == 1
+    assert cache.get("e") == "e" * 25
+
+def test_recent_hits_do_not_rewrite_last_access(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: clock[0])
+    cache = ResponseCache(str(tmp_path / "c.db"), 1 << 20)
+    cache.put("k", "v")
+
+    def last_access():
+        return cache._conn().execute(
+            "SELECT last_access FROM responses WHERE key = 'k'"
+        ).fetchone()[0]
+
+    clock[0] += response_cache.TOUCH_INTERVAL / 2
+    cache.get("k")
+    assert last_access() == 1000.0
+    clock[0] += response_cache.TOUCH_INTERVAL
+    cache.get("k")
+    assert last_access() == clock[0]
+
+def test_counters_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / "c.db")
+    first, second = ResponseCache(path, 1 << 20), ResponseCache(path, 1 << 20)
+    first.put("k", "v")
+    first.get("k")
+    first.get("missing")
+    second.get("k")
+    second.get("k")
+    # Lookups are saved lazily; stats saves this instance's own
+    assert second.stats()["total_hits"] == 2
+    first.flush()
+    stats = second.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 0)
+    assert (stats["total_hits"], stats["total_misses"]) == (3, 1)
+    assert stats["entries"] == 1
+
+def test_responses_are_served_from_the_cache(tmp_path, monkeypatch):
+    _use_cache(monkeypatch, tmp_path / "c.db")
+    backend = CountingBackend()
+    assert llm.get_llm_response("a b c", backend=backend) == "a b c"
+    assert llm.get_llm_response("a b c", backend=backend) == "a b c"
+    assert backend.calls == 1
+
+def test_empty_responses_are_not_cached(tmp_path, monkeypatch):
+    _use_cache(monkeypatch, tmp_path / "c.db")
+    backend = CountingBackend()
+    assert llm.get_llm_response("", backend=backend) == ""
+    assert llm.get_llm_response("", backend=backend) == ""
+    assert backend.calls == 2
+
+def test_streams_stopped_early_are_not_cached(tmp_path, monkeypatch):
+    _use_cache(monkeypatch, tmp_path / "c.db")
+    backend = CountingBackend()
+    stopped = "".join(
+        llm.stream_llm_response("one two three", backend=backend, stop_when=lambda t: "two" in t)
+    )
+    assert stopped == "one two"
+    assert "".join(llm.stream_llm_response("one two three", backend=backend)) == "one two three"
+    assert "".join(llm.stream_llm_response("one two three", backend=backend)) == "one two three"
+    assert backend.calls == 2
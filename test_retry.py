@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from . import retry
+from .backends import LLMError
+from .retry import call_with_retries, deadline_from_now
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the backoff delays on a fake clock, with jitter at its maximum."""
+    now = [100.0]
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(retry, "time", types.SimpleNamespace(monotonic=lambda: now[0], sleep=sleep))
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    return delays
+
+def _failing(errors, result="ok"):
+    calls = []
+
+    def func():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return func, calls
+
+def test_backoff_doubles_up_to_the_cap(sleeps):
+    func, calls = _failing([LLMError("busy", retryable=True)] * 4)
+    assert call_with_retries(func, retries=4, base=1.0, cap=3.0) == "ok"
+    assert len(calls) == 5
+    assert sleeps == [1.0, 2.0, 3.0, 3.0]
+
+def test_retry_after_is_a_floor(sleeps):
+    func, _ = _failing([
+        LLMError("slow down", retryable=True, retry_after=5.0),
+        LLMError("slow down", retryable=True, retry_after=0.1),
+    ])
+    assert call_with_retries(func, base=1.0) == "ok"
+    assert sleeps == [5.0, 2.0]
+
+def test_gives_up_after_the_retries(sleeps):
+    errors = [LLMError(f"busy {i}", retryable=True) for i in range(3)]
+    func, calls = _failing(errors)
+    with pytest.raises(LLMError, match="busy 2"):
+        call_with_retries(func, retries=2, base=1.0)
+    assert len(calls) == 3
+
+def test_non_retryable_errors_are_raised_at_once(sleeps):
+    func, calls = _failing([LLMError("bad request")])
+    with pytest.raises(LLMError, match="bad request"):
+        call_with_retries(func)
+    assert len(calls) == 1
+    assert sleeps == []
+
+def test_no_retry_starts_that_would_end_past_the_deadline(sleeps):
+    func, calls = _failing([LLMError("busy", retryable=True)] * 3)
+    with pytest.raises(LLMError, match="Deadline exceeded after 2 attempts") as info:
+        call_with_retries(func, base=1.0, deadline=retry.time.monotonic() + 2.5)
+    assert not info.value.retryable
+    assert len(calls) == 2
+    assert sleeps == [1.0]
+
+def test_deadline_from_now(sleeps):
+    assert deadline_from_now(0) is None
+    assert deadline_from_now(30) == retry.time.monotonic() + 30
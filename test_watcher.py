@@ -0,0 +1,112 @@
+import os
+import time
+import types
+
+import pytest
+
+from . import watcher
+from .watcher import DirectoryWatcher
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Runs the polling backend on a fake clock that sleep advances."""
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(watcher, "INotify", None)
+    monkeypatch.setattr(watcher, "time", types.SimpleNamespace(monotonic=lambda: now[0], sleep=sleep))
+    return now
+
+def _names(entries):
+    return sorted(e.relpath for e in entries)
+
+def _poll_until_settled(w, polls=5):
+    ready = []
+    for _ in range(polls):
+        ready += w.poll()
+    return _names(ready)
+
+def test_files_are_reported_once_settled(tmp_path, clock):
+    (tmp_path / "a.txt").write_text("first")
+    w = DirectoryWatcher(str(tmp_path), settle=2.0, poll_interval=1.0)
+    assert not w.uses_inotify
+    assert w.poll() == []
+    # Still being written: the settle delay starts over
+    with open(tmp_path / "a.txt", "a") as f:
+        f.write(" more")
+    assert w.poll() == []
+    assert w.poll() == []
+    assert _names(w.poll()) == ["a.txt"]
+    assert _poll_until_settled(w) == []
+
+def test_changed_files_are_reported_again(tmp_path, clock):
+    (tmp_path / "a.txt").write_text("first")
+    w = DirectoryWatcher(str(tmp_path), settle=2.0, poll_interval=1.0)
+    assert _poll_until_settled(w) == ["a.txt"]
+    (tmp_path / "a.txt").write_text("second version")
+    assert _poll_until_settled(w) == ["a.txt"]
+
+def test_deleted_and_moved_files_are_forgotten(tmp_path, clock):
+    path = tmp_path / "a.txt"
+    path.write_text("first")
+    w = DirectoryWatcher(str(tmp_path), settle=2.0, poll_interval=1.0)
+    assert _poll_until_settled(w) == ["a.txt"]
+    mtime = path.stat().st_mtime
+
+    os.rename(path, tmp_path / "b.txt")
+    assert _poll_until_settled(w) == ["b.txt"]
+    os.rename(tmp_path / "b.txt", path)
+    assert _poll_until_settled(w) == ["a.txt"]
+
+    # Deleted and recreated identically, it is still a new file
+    path.unlink()
+    w.poll()
+    path.write_text("first")
+    os.utime(path, (mtime, mtime))
+    assert _poll_until_settled(w) == ["a.txt"]
+
+def test_files_deleted_before_settling_are_dropped(tmp_path, clock):
+    (tmp_path / "a.txt").write_text("first")
+    w = DirectoryWatcher(str(tmp_path), settle=2.0, poll_interval=1.0)
+    w.poll()
+    (tmp_path / "a.txt").unlink()
+    assert _poll_until_settled(w) == []
+    assert w._candidates == {}
+
+def test_filters_apply(tmp_path, clock):
+    for name in ("a.txt", "b.md", "a.txt.llm_output.txt"):
+        (tmp_path / name).write_text("x")
+    w = DirectoryWatcher(
+        str(tmp_path), include=["*.txt"], exclude=["*.llm_output.*"], settle=2.0
+    )
+    assert _poll_until_settled(w) == ["a.txt"]
+
+@pytest.mark.skipif(watcher.INotify is None, reason="inotify_simple is not installed")
+def test_inotify_reports_new_files_in_new_directories(tmp_path):
+    w = DirectoryWatcher(str(tmp_path), settle=0.2, poll_interval=0.1)
+    try:
+        assert w.uses_inotify
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "a.txt").write_text("x")
+        ready = []
+        deadline = time.monotonic() + 5
+        while not ready and time.monotonic() < deadline:
+            ready = w.poll()
+        assert _names(ready) == [os.path.join("sub", "a.txt")]
+    finally:
+        w.close()
+
+@pytest.mark.skipif(watcher.INotify is None, reason="inotify_simple is not installed")
+def test_inotify_queue_overflow_rescans(tmp_path, monkeypatch):
+    w = DirectoryWatcher(str(tmp_path), settle=0.0, poll_interval=0.1)
+    try:
+        assert w.poll() == []
+        # Files written while events were dropped are found by the rescan
+        (tmp_path / "a.txt").write_text("x")
+        overflow = types.SimpleNamespace(wd=-1, mask=watcher.flags.Q_OVERFLOW, cookie=0, name="")
+        monkeypatch.setattr(w._inotify, "read", lambda timeout=None: [overflow])
+        assert _names(w.poll()) == ["a.txt"]
+    finally:
+        w.close()
@@ -0,0 +1,48 @@
+import math
+from functools import lru_cache
+from typing import Optional
+
+class TokenCounter:
+    """
+    Counts model tokens in text, with an in-process cache of recent results.
+
+    In exact mode the model's own tokenizer is loaded from the GGUF file
+    (vocabulary only, no weights). In approximate mode tokens are estimated
+    from the character count, which is much faster on large files.
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        approximate: bool = False,
+        chars_per_token: float = 4.0,
+        cache_size: int = 1 << 16,
+    ) -> None:
+        """
+        Initializes the TokenCounter.
+
+        Args:
+            model_path: The GGUF model whose tokenizer to use. Required unless
+                        approximate is True.
+            approximate: Estimate token counts instead of tokenizing.
+            chars_per_token: The average characters per token in approximate mode.
+            cache_size: The number of distinct texts whose counts are cached.
+
+        Raises:
+            ImportError: If llama-cpp-python is not installed in exact mode.
+        """
+        self.approximate = approximate
+        self.chars_per_token = chars_per_token
+        self._vocab = None
+        if not approximate:
+            try:
+                from llama_cpp import Llama
+            except ImportError:
+                raise ImportError("llama-cpp-python is required for token-aware chunking")
+            self._vocab = Llama(model_path=model_path, vocab_only=True, verbose=False)
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.approximate:
+            return math.ceil(len(text) / self.chars_per_token)
+        return len(self._vocab.tokenize(text.encode("utf-8"), add_bos=False))
@@ -42,6 +42,13 @@ SAVE_SMALLER_SCRIPTS = False  # Set to True to also save individual fragmented s
 MERGE_ALL_CODE_BLOCKS = True  # Always merge multiple code blocks into one script
 # ============================================================
 
+# Talk to Ollama over HTTP through the harness's backend when the package is
+# installed; otherwise fall back to the `ollama run` CLI
+try:
+    from mixtral_harness.backends import OllamaBackend
+except ImportError:
+    OllamaBackend = None
+
 class CodeQualityValidator:
     """Comprehensive code quality validator with auto-fixing capabilities."""
     
@@ -883,25 +890,31 @@ class UltimatePythonCodeGenerator:
             progress_thread = threading.Thread(target=show_thinking_progress, daemon=True)
             progress_thread.start()
             
-            process = subprocess.Popen(
-                ["ollama", "run", self.model_name],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            stdout, stderr = process.communicate(input=prompt.encode())
+            if OllamaBackend is not None:
+                # Ollama's HTTP API, through the harness backend (no timeout)
+                output = OllamaBackend(self.model_name, max_tokens=None, timeout=None).generate(prompt)
+                error_msg = "" if output else "empty response from Ollama"
+            else:
+                # Start the subprocess without timeout
+                process = subprocess.Popen(
+                    ["ollama", "run", self.model_name],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                stdout, stderr = process.communicate(input=prompt.encode())
+                output = stdout.decode()
+                error_msg = (stderr.decode().strip() or f"exit code {process.returncode}") if process.returncode != 0 else ""
             
             thinking_active.clear()
             if progress_thread:
                 progress_thread.join(timeout=1)
             
-            if process.returncode != 0:
-                error_msg = stderr.decode().strip()
+            if error_msg:
                 print(f"Error calling model: {error_msg}")
                 return None
             
-            output = stdout.decode().strip()
+            output = output.strip()
             if purpose == "generation":
                 print("✓ Model finished thinking!")
             else:
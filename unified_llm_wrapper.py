@@ -1,37 +1,181 @@
 import os
-from typing import Optional
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
-try:
-    import requests
-except ImportError:
-    requests = None
+from . import config
+from .backends import (
+    LLMBackend,
+    LLMError,
+    LocalBackend,
+    MockBackend,
+    OllamaBackend,
+    ServerBackend,
+    Usage,
+)
+from .dispatcher import ordered_map
+from .response_cache import cache_key, get_response_cache
+from .retry import call_with_retries, deadline_from_now
 
-LLM_MODE = os.getenv("LLM_MODE", "server")  # "server" or "local"
+LLM_MODE = os.getenv("LLM_MODE", "server")  # "server", "local", "ollama" or "mock"
+# Comma-separated to spread requests over several servers (see load_balancer)
 LLM_SERVER_URL = os.getenv("LLM_SERVER_URL", "http://localhost:8000/generate")
 MODEL_PATH = os.getenv("LLM_MODEL_PATH", "Mixtral-8x7B-Instruct-v0.1.Q6_K.gguf")
 N_THREADS = int(os.getenv("LLM_THREADS", "8"))
 N_CTX = int(os.getenv("LLM_CTX", "4096"))
+# Generation parameters; also part of the response cache key. Completions are
+# capped at the output space chunks leave free in the context.
+MAX_TOKENS = config.RESERVED_OUTPUT_TOKENS
+STOP = ["</s>"]
+# Send whole batches in one request to servers that accept a list of prompts
+LLM_SERVER_BATCH = os.getenv("LLM_SERVER_BATCH", "0").strip().lower() in ("1", "true", "yes", "on")
+# In local mode, send prompts to the shared model process (see local_model_server)
+LLM_SHARED_MODEL = os.getenv("LLM_SHARED_MODEL", "0").strip().lower() in ("1", "true", "yes", "on")
 
-_llm_cache = {}
+# Instruction preamble prepended to every prompt. In local mode it is evaluated
+# once per model and its llama.cpp state is restored before each prompt, so
+# only the chunk-specific suffix pays prompt-eval cost.
+PROMPT_PREFIX = os.getenv("LLM_PROMPT_PREFIX", "")
+if os.getenv("LLM_PROMPT_PREFIX_FILE"):
+    with open(os.environ["LLM_PROMPT_PREFIX_FILE"], encoding="utf-8") as _f:
+        PROMPT_PREFIX = _f.read()
+# Directory where evaluated prefix states are saved between runs; empty keeps
+# them in memory only
+PREFIX_CACHE_DIR = os.getenv("LLM_PREFIX_CACHE_DIR", "")
+
+# Ollama mode
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mixtral")
+
+# Mock mode: seconds before the first token, tokens per second (0 = instant)
+# and requests served in parallel, plus the share of requests that fail
+MOCK_LATENCY = float(os.getenv("LLM_MOCK_LATENCY", "0.05"))
+MOCK_TOKENS_PER_SECOND = float(os.getenv("LLM_MOCK_TOKENS_PER_SECOND", "0"))
+MOCK_SLOTS = int(os.getenv("LLM_MOCK_SLOTS", "4"))
+MOCK_FAILURE_RATE = float(os.getenv("LLM_MOCK_FAILURE_RATE", "0"))
+
+# Backends by name and settings, so per-backend state (the server batching
+# fallback, the mock's slots) lasts for the process
+_backends: Dict[Tuple[Any, ...], LLMBackend] = {}
+_backends_lock = threading.Lock()
+
+def server_urls() -> Tuple[str, ...]:
+    """Returns the servers listed in LLM_SERVER_URL."""
+    return tuple(u.strip() for u in LLM_SERVER_URL.split(",") if u.strip())
+
+def get_backend(
+    name: Optional[str] = None,
+    model: Optional[str] = None,
+    n_threads: Optional[int] = None,
+    n_ctx: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+) -> LLMBackend:
+    """
+    Returns the backend called name, configured from this module's settings.
+
+    The settings are read on every call, so changes made after import (for
+    example by the harness) apply to the next request.
+
+    Args:
+        name: "server", "local", "ollama" or "mock". Defaults to LLM_MODE.
+        model: The path or name of the model to use. Overrides the default.
+        n_threads: The number of threads to use for inference. Overrides the default.
+        n_ctx: The context size to use for inference. Overrides the default.
+        max_tokens: The longest completion, in tokens. Defaults to MAX_TOKENS.
+
+    Raises:
+        ValueError: If name is not a known backend.
+    """
+    name = name or LLM_MODE
+    max_tokens = max_tokens or MAX_TOKENS
+    if name == "server":
+        cls: Any = ServerBackend
+        kwargs: Dict[str, Any] = dict(
+            url=server_urls(),
+            model=model or MODEL_PATH, n_threads=n_threads or N_THREADS,
+            n_ctx=n_ctx or N_CTX, batch=LLM_SERVER_BATCH, max_tokens=max_tokens, stop=tuple(STOP),
+        )
+    elif name == "local":
+        cls = LocalBackend
+        kwargs = dict(
+            model_path=model or MODEL_PATH, n_threads=n_threads or N_THREADS,
+            n_ctx=n_ctx or N_CTX, max_tokens=max_tokens, stop=tuple(STOP),
+            shared=LLM_SHARED_MODEL, prefix=PROMPT_PREFIX, prefix_cache_dir=PREFIX_CACHE_DIR,
+        )
+    elif name == "ollama":
+        cls = OllamaBackend
+        kwargs = dict(
+            model=model or OLLAMA_MODEL, url=OLLAMA_URL, n_ctx=n_ctx or N_CTX,
+            max_tokens=max_tokens, stop=tuple(STOP),
+        )
+    elif name == "mock":
+        cls = MockBackend
+        kwargs = dict(
+            latency=MOCK_LATENCY, tokens_per_second=MOCK_TOKENS_PER_SECOND,
+            slots=MOCK_SLOTS, failure_rate=MOCK_FAILURE_RATE,
+        )
+    else:
+        raise ValueError(f"Unknown LLM_MODE: {name}")
+    key = (name,) + tuple(sorted(kwargs.items()))
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _backends[key] = cls(**kwargs)
+    return backend
+
+def _resolve(
+    backend: Optional[LLMBackend],
+    model: Optional[str],
+    n_threads: Optional[int],
+    n_ctx: Optional[int],
+) -> LLMBackend:
+    """Returns the backend a request should use."""
+    return backend if backend is not None else get_backend(None, model, n_threads, n_ctx)
+
+def _cache_key(prompt: str, backend: LLMBackend) -> str:
+    """Returns the response cache key for a prompt on a backend."""
+    return cache_key(prompt, backend.model, backend.n_ctx, backend.cache_params())
 
 def get_llm_response(
     prompt: str,
     model: Optional[str] = None,
     n_threads: Optional[int] = None,
     n_ctx: Optional[int] = None,
+    backend: Optional[LLMBackend] = None,
+    usage: Optional[Usage] = None,
 ) -> str:
     """
     Unified LLM client interface.
 
-    This function can operate in two modes, determined by the LLM_MODE environment variable:
+    The prompt goes to backend, or if None, to the backend selected by
+    LLM_MODE (see backends):
     - "server": Sends the prompt to a remote LLM server.
-    - "local": Loads a local GGUF model and runs inference directly.
+    - "local": Loads a local GGUF model and runs inference directly. If
+      LLM_SHARED_MODEL is set, the prompt goes to the shared model process
+      instead (see local_model_server).
+    - "ollama": Sends the prompt to an Ollama server.
+    - "mock": Echoes the prompt after a configurable delay, for measuring the
+      harness without a model.
 
     Args:
         prompt: The text prompt to send to the LLM.
         model: The path or name of the model to use. Overrides the default.
         n_threads: The number of threads to use for inference. Overrides the default.
         n_ctx: The context size to use for inference. Overrides the default.
+        backend: The backend to use instead of the LLM_MODE default; model,
+                 n_threads and n_ctx are then ignored.
+        usage: If given, filled with the token counts and timings the backend
+               reports (left empty for a cached response).
+
+    If LLM_CACHE_PATH is set, responses are looked up in and stored to the
+    persistent response cache (see response_cache), so unchanged chunks
+    return without calling the model.
+
+    PROMPT_PREFIX (LLM_PROMPT_PREFIX) is prepended to the prompt. In local
+    mode, its evaluated state is reused instead of evaluating it again.
+
+    Transient failures are retried with jittered exponential backoff, within
+    LLM_CHUNK_DEADLINE seconds (see retry).
 
     Returns:
         The LLM's response as a string.
@@ -39,50 +183,237 @@ def get_llm_response(
     Raises:
         ImportError: If a required library is not installed for the selected mode.
         ValueError: If an unknown LLM_MODE is set.
-        requests.exceptions.RequestException: If there is an error communicating with the server.
+        LLMError: If no response could be produced.
     """
-    if LLM_MODE == "server":
-        if not requests:
-            raise ImportError("requests library is required for server mode")
-        payload = {
-            "prompt": prompt,
-            "model": model or MODEL_PATH,
-            "n_threads": n_threads or N_THREADS,
-            "n_ctx": n_ctx or N_CTX,
-        }
-        try:
-            response = requests.post(LLM_SERVER_URL, json=payload, timeout=180)
-            response.raise_for_status()
-            return response.json().get("response", "")
-        except requests.exceptions.RequestException as e:
-            print(f"Error communicating with LLM server: {e}")
-            return ""
-    elif LLM_MODE == "local":
-        try:
-            from llama_cpp import Llama
-        except ImportError:
-            raise ImportError("llama-cpp-python is required for local mode")
-
-        model_path = model or MODEL_PATH
-        if model_path in _llm_cache:
-            llm = _llm_cache[model_path]
-        else:
-            try:
-                llm = Llama(
-                    model_path=model_path,
-                    n_ctx=n_ctx or N_CTX,
-                    n_threads=n_threads or N_THREADS,
-                    verbose=False,
-                )
-                _llm_cache[model_path] = llm
-            except Exception as e:
-                print(f"Error loading local LLM model: {e}")
-                return ""
+    backend = _resolve(backend, model, n_threads, n_ctx)
+    prompt = PROMPT_PREFIX + prompt
+    cache = get_response_cache()
+    key = _cache_key(prompt, backend) if cache is not None else None
+    response = cache.get(key) if cache is not None else None
+    if response is None:
+        response = call_with_retries(
+            lambda: backend.generate(prompt, usage), deadline=deadline_from_now()
+        )
+        if cache is not None and response:
+            cache.put(key, response)
+    return response
+
+def _generate_batch(
+    backend: LLMBackend, prompts: List[str], usages: Optional[List[Usage]] = None
+) -> List[Union[str, LLMError]]:
+    """Runs a batch with retries. If the batch as a whole fails, the prompts are
+    retried one by one, so one bad prompt only fails itself."""
+    try:
+        return list(
+            call_with_retries(
+                lambda: backend.generate_batch(prompts, usages),
+                deadline=deadline_from_now(),
+            )
+        )
+    except LLMError as e:
+        if len(prompts) == 1:
+            return [e]
+
+    def single(item: Tuple[str, Optional[Usage]]) -> Union[str, LLMError]:
         try:
-            result = llm(prompt=prompt, max_tokens=512, stop=["</s>"])
-            return result["choices"][0]["text"]
-        except Exception as e:
-            print(f"Error during local LLM inference: {e}")
-            return ""
+            return call_with_retries(
+                lambda: backend.generate(*item), deadline=deadline_from_now()
+            )
+        except LLMError as e:
+            return e
+
+    items = zip(prompts, usages if usages is not None else [None] * len(prompts))
+    return list(ordered_map(single, items, max(1, backend.max_concurrency)))
+
+def get_llm_responses(
+    prompts: List[str],
+    model: Optional[str] = None,
+    n_threads: Optional[int] = None,
+    n_ctx: Optional[int] = None,
+    backend: Optional[LLMBackend] = None,
+    return_errors: bool = False,
+    usages: Optional[List[Usage]] = None,
+) -> List[Union[str, LLMError]]:
+    """
+    Batched LLM client interface: returns one response per prompt, in order.
+
+    How a batch is run depends on the backend:
+    - "server": If LLM_SERVER_BATCH is enabled, sends the whole batch in one
+      request with "prompt" set to the list of prompts. If the server rejects
+      the request or answers with an unexpected shape, batching is disabled for
+      this process and the prompts are sent as concurrent single requests.
+    - "local": Holds the model for the whole batch and evaluates the prompts
+      back to back.
+    - "ollama" and "mock": Concurrent single requests.
+
+    Cached prompts (see get_llm_response) are answered from the cache and only
+    the misses are sent to the model. Failures are retried as in
+    get_llm_response; if the whole batch keeps failing, its prompts are
+    retried one by one.
+
+    Args:
+        prompts: The text prompts to send to the LLM.
+        model: The path or name of the model to use. Overrides the default.
+        n_threads: The number of threads to use for inference. Overrides the default.
+        n_ctx: The context size to use for inference. Overrides the default.
+        backend: The backend to use instead of the LLM_MODE default.
+        return_errors: If True, a prompt that failed gets its LLMError in the
+                       result list instead of failing the whole call.
+        usages: If given, one Usage per prompt, filled as in get_llm_response.
+
+    Returns:
+        A list with the LLM's response to each prompt.
+
+    Raises:
+        LLMError: If a prompt failed and return_errors is False.
+    """
+    backend = _resolve(backend, model, n_threads, n_ctx)
+    prompts = [PROMPT_PREFIX + p for p in prompts]
+    cache = get_response_cache()
+    keys = [_cache_key(p, backend) for p in prompts] if cache is not None else []
+    responses = [cache.get(key) for key in keys] if cache is not None else [None] * len(prompts)
+    misses = [i for i, r in enumerate(responses) if r is None]
+    if misses:
+        generated = _generate_batch(
+            backend,
+            [prompts[i] for i in misses],
+            [usages[i] for i in misses] if usages is not None else None,
+        )
+        for i, response in zip(misses, generated):
+            if isinstance(response, LLMError) and not return_errors:
+                raise response
+            responses[i] = response
+            if cache is not None and isinstance(response, str) and response:
+                cache.put(keys[i], response)
+    return responses
+
+def _open_stream(
+    backend: LLMBackend, prompt: str, usage: Optional[Usage] = None
+) -> Iterator[str]:
+    """Starts a stream and waits for its first piece, so that failing to
+    connect raises here, where it can still be retried."""
+    stream = backend.stream(prompt, usage)
+    try:
+        first = next(stream)
+    except StopIteration:
+        return iter(())
+    except BaseException:
+        stream.close()
+        raise
+    return _chain_stream(first, stream)
+
+def _chain_stream(first: str, stream: Iterator[str]) -> Iterator[str]:
+    """Yields first, then the rest of stream; closing it closes stream."""
+    try:
+        yield first
+        yield from stream
+    finally:
+        stream.close()
+
+class StreamStats:
+    """Timing of one streamed completion.
+
+    Attributes:
+        ttft: Seconds from sending the prompt to the first token, or None if
+              no token arrived.
+        token_times: Arrival time of each token, relative to the request.
+        stopped_early: True if the caller's stop_when predicate ended the stream.
+    """
+
+    def __init__(self) -> None:
+        self.ttft: Optional[float] = None
+        self.token_times: List[float] = []
+        self.stopped_early = False
+
+    @property
+    def tokens(self) -> int:
+        return len(self.token_times)
+
+    @property
+    def inter_token_latencies(self) -> List[float]:
+        """Gaps in seconds between consecutive tokens."""
+        t = self.token_times
+        return [b - a for a, b in zip(t, t[1:])]
+
+    @property
+    def mean_inter_token_latency(self) -> Optional[float]:
+        gaps = self.inter_token_latencies
+        return sum(gaps) / len(gaps) if gaps else None
+
+def stream_llm_response(
+    prompt: str,
+    model: Optional[str] = None,
+    n_threads: Optional[int] = None,
+    n_ctx: Optional[int] = None,
+    stop_when: Optional[Callable[[str], bool]] = None,
+    stats: Optional[StreamStats] = None,
+    backend: Optional[LLMBackend] = None,
+    usage: Optional[Usage] = None,
+) -> Iterator[str]:
+    """
+    Streaming variant of get_llm_response: yields the completion piece by piece.
+
+    - "server": Sends the request with "stream": true and reads the
+      server-sent events (llama.cpp server and OpenAI-compatible servers).
+    - "local": Runs llama-cpp-python with stream=True. The model stays locked
+      until the stream is exhausted or closed.
+    - "ollama": Reads Ollama's streamed JSON lines.
+
+    Closing the generator early (or returning True from stop_when) abandons
+    the rest of the completion. Cached responses are yielded whole, and only
+    completions that ran to the end are stored in the cache. Failures before
+    the first piece are retried as in get_llm_response; a failure after it
+    raises, since the caller has already seen part of the response.
+
+    Args:
+        prompt: The text prompt to send to the LLM.
+        model: The path or name of the model to use. Overrides the default.
+        n_threads: The number of threads to use for inference. Overrides the default.
+        n_ctx: The context size to use for inference. Overrides the default.
+        stop_when: Called with the text generated so far after each piece;
+                   returning True ends the stream.
+        stats: If given, filled with time-to-first-token and inter-token
+               latencies as pieces arrive.
+        backend: The backend to use instead of the LLM_MODE default.
+        usage: If given, filled as in get_llm_response once the stream ends.
+
+    Yields:
+        Pieces of the response, usually one token each.
+
+    Raises:
+        ImportError: If a required library is not installed for the selected mode.
+        ValueError: If an unknown LLM_MODE is set.
+        LLMError: If no response could be produced.
+    """
+    start = time.monotonic()
+    backend = _resolve(backend, model, n_threads, n_ctx)
+    prompt = PROMPT_PREFIX + prompt
+    cache = get_response_cache()
+    key = _cache_key(prompt, backend) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        pieces: Iterator[str] = iter([cached])
     else:
-        raise ValueError(f"Unknown LLM_MODE: {LLM_MODE}")
\ No newline at end of file
+        pieces = call_with_retries(
+            lambda: _open_stream(backend, prompt, usage), deadline=deadline_from_now()
+        )
+
+    text = ""
+    try:
+        for piece in pieces:
+            if stats is not None:
+                elapsed = time.monotonic() - start
+                if stats.ttft is None:
+                    stats.ttft = elapsed
+                stats.token_times.append(elapsed)
+            text += piece
+            yield piece
+            if stop_when is not None and stop_when(text):
+                if stats is not None:
+                    stats.stopped_early = True
+                return
+    finally:
+        if hasattr(pieces, "close"):
+            pieces.close()
+    if cache is not None and cached is None and text:
+        cache.put(key, text)
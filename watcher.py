@@ -0,0 +1,190 @@
+import os
+import time
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+from .discovery import FileEntry, path_matches, scan
+
+class DirectoryWatcher:
+    """
+    Watches a directory tree for new or modified files.
+
+    Uses inotify (via the optional inotify_simple package) on Linux, and falls
+    back to rescanning the tree every poll_interval seconds. Either way a file
+    is only reported once its size and mtime have not changed for settle
+    seconds, so partially written files are not picked up. Files already in
+    the tree when the watcher starts are reported too. If the inotify event
+    queue overflows, the whole tree is rescanned.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        recursive: bool = True,
+        include: Sequence[str] = ("*",),
+        exclude: Sequence[str] = (),
+        follow_symlinks: bool = False,
+        settle: float = 2.0,
+        poll_interval: float = 1.0,
+    ) -> None:
+        """
+        Initializes the DirectoryWatcher.
+
+        Args:
+            directory: The directory to watch.
+            recursive: Whether to watch subdirectories.
+            include: Files must match one of these fnmatch patterns.
+            exclude: Files and directories matching any of these are ignored.
+            follow_symlinks: Whether to follow symlinks.
+            settle: Seconds a file must stay unchanged before it is reported.
+            poll_interval: The longest poll waits for activity, in seconds.
+        """
+        self.directory = directory
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.follow_symlinks = follow_symlinks
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._reported: Dict[str, Tuple[int, float]] = {}
+        self._candidates: Dict[str, Tuple[FileEntry, float]] = {}
+        self._inotify = None
+        self._watches: Dict[int, str] = {}
+        if INotify is not None:
+            self._inotify = INotify()
+            self._mask = (
+                flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+                | flags.DELETE | flags.MOVED_FROM
+            )
+            self._watch_tree("")
+        self._rescan()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def _watch_tree(self, rel_dir: str) -> None:
+        """Adds inotify watches for rel_dir and, if recursive, its subdirectories."""
+        for root, dirs, _ in os.walk(
+            os.path.join(self.directory, rel_dir), followlinks=self.follow_symlinks
+        ):
+            rel_root = os.path.relpath(root, self.directory)
+            rel_root = "" if rel_root == "." else rel_root
+            try:
+                wd = self._inotify.add_watch(root, self._mask)
+            except OSError:
+                continue
+            self._watches[wd] = rel_root
+            dirs[:] = [
+                d for d in dirs
+                if self.recursive
+                and not path_matches(os.path.join(rel_root, d), self.exclude)
+            ]
+
+    def _rescan(self) -> None:
+        """Scans the whole tree and marks new or modified files as candidates.
+        Files that are gone are forgotten."""
+        seen = set()
+        for entry in scan(
+            self.directory, self.recursive, self.include, self.exclude,
+            self.follow_symlinks,
+        ):
+            seen.add(entry.path)
+            self._consider(entry)
+        for path in self._reported.keys() - seen:
+            del self._reported[path]
+
+    def _forget(self, path: str) -> None:
+        """Forgets a removed file, or every file under a removed directory."""
+        prefix = os.path.join(path, "")
+        for known in (self._reported, self._candidates):
+            for p in [p for p in known if p == path or p.startswith(prefix)]:
+                del known[p]
+
+    def _consider(self, entry: FileEntry) -> None:
+        if self._reported.get(entry.path) == (entry.size, entry.mtime):
+            return
+        known = self._candidates.get(entry.path)
+        if known is None or (known[0].size, known[0].mtime) != (entry.size, entry.mtime):
+            self._candidates[entry.path] = (entry, time.monotonic())
+
+    def _read_events(self, timeout: float) -> None:
+        """Turns inotify events into candidates, watching new directories."""
+        overflow = False
+        for event in self._inotify.read(timeout=int(timeout * 1000)):
+            if event.mask & flags.Q_OVERFLOW:
+                overflow = True
+                continue
+            if event.mask & flags.IGNORED:
+                self._watches.pop(event.wd, None)
+                continue
+            rel_dir = self._watches.get(event.wd)
+            if rel_dir is None or not event.name:
+                continue
+            relpath = os.path.join(rel_dir, event.name)
+            if path_matches(relpath, self.exclude):
+                continue
+            path = os.path.join(self.directory, relpath)
+            if event.mask & (flags.DELETE | flags.MOVED_FROM):
+                self._forget(path)
+                continue
+            if event.mask & flags.ISDIR:
+                if self.recursive:
+                    self._watch_tree(relpath)
+                    for entry in scan(
+                        path, True, self.include, self.exclude, self.follow_symlinks
+                    ):
+                        self._consider(entry._replace(relpath=os.path.join(relpath, entry.relpath)))
+                continue
+            if not path_matches(relpath, self.include):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            self._consider(FileEntry(path, relpath, st.st_size, st.st_mtime))
+        if overflow:
+            # Events were dropped: catch up on directories and files
+            self._watch_tree("")
+            self._rescan()
+
+    def poll(self, timeout: float = None) -> List[FileEntry]:
+        """
+        Waits up to timeout seconds (default poll_interval) for activity.
+
+        Returns:
+            The files that have settled since the last call.
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        if self._candidates:
+            # Wake up in time to report the earliest settling candidate
+            timeout = min(timeout, self.settle)
+        if self._inotify is not None:
+            self._read_events(timeout)
+        else:
+            time.sleep(timeout)
+            self._rescan()
+
+        now = time.monotonic()
+        ready = []
+        for path, (entry, since) in list(self._candidates.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._candidates[path]
+                continue
+            if (st.st_size, st.st_mtime) != (entry.size, entry.mtime):
+                self._candidates[path] = (entry._replace(size=st.st_size, mtime=st.st_mtime), now)
+            elif now - since >= self.settle:
+                del self._candidates[path]
+                self._reported[path] = (entry.size, entry.mtime)
+                ready.append(entry)
+        return ready
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
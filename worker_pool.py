@@ -0,0 +1,250 @@
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+class TaskFailed(Exception):
+    """Raised by a task function to fail a task while still reporting a
+    result (see ElasticPool's on_result)."""
+
+    def __init__(self, error: str, result: Any = None) -> None:
+        super().__init__(error)
+        self.error = error
+        self.result = result
+
+def _worker(
+    worker_id: int,
+    func: Callable[[Any], Any],
+    tasks: "mp.Queue",
+    results: "mp.Queue",
+    stop: "mp.synchronize.Event",
+    initializer: Optional[Callable[[int], None]],
+    pool_size: int,
+) -> None:
+    """Runs the tasks assigned to this worker until told to stop while idle."""
+    if initializer is not None:
+        initializer(pool_size)
+    while True:
+        try:
+            idx, item = tasks.get(timeout=0.2)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        try:
+            result = func(item)
+            results.put((worker_id, idx, None, result))
+        except TaskFailed as e:
+            results.put((worker_id, idx, e.error, e.result))
+        except Exception:
+            results.put((worker_id, idx, traceback.format_exc(), None))
+
+class ElasticPool:
+    """
+    A process pool that can grow and shrink while tasks are running.
+
+    Tasks wait in this process and are handed to idle workers one at a
+    time, so a worker that finishes early takes the next task instead of
+    idling, and the pool always knows which task each worker holds: a task
+    whose worker crashes fails instead of being lost. Growing starts new
+    workers; shrinking asks idle or busy workers to exit after their current
+    task, so no work is interrupted.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Any], Any],
+        size: int,
+        min_size: int = 1,
+        max_size: Optional[int] = None,
+        initializer: Optional[Callable[[int], None]] = None,
+        on_result: Optional[Callable[[Any, Any], None]] = None,
+    ) -> None:
+        """
+        Initializes the ElasticPool and starts size workers.
+
+        Args:
+            func: The picklable function each task is passed to.
+            size: The initial number of workers.
+            min_size: The smallest size resize will shrink to.
+            max_size: The largest size resize will grow to. Defaults to size.
+            initializer: Called in each new worker with the size the pool
+                         was being resized to when it started.
+            on_result: Called in this process with each finished item and the
+                       value func returned for it (or the result of the
+                       TaskFailed it raised), unless that is None.
+        """
+        self.func = func
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size or size)
+        self.initializer = initializer
+        self.on_result = on_result
+        self.results: "mp.Queue" = mp.Queue()
+        self._workers: Dict[int, Any] = {}
+        self._stops: Dict[int, Any] = {}
+        self._inboxes: Dict[int, "mp.Queue"] = {}
+        self._running: Dict[int, int] = {}
+        self._items: Dict[int, Any] = {}
+        self._queue: Deque[int] = deque()
+        self._next_id = 0
+        self._next_task = 0
+        self.resize(size)
+
+    @property
+    def size(self) -> int:
+        """The number of workers not asked to stop."""
+        return sum(1 for wid in self._workers if not self._stops[wid].is_set())
+
+    def resize(self, size: int) -> None:
+        """Grows or shrinks the pool to size workers, within its bounds."""
+        size = max(self.min_size, min(self.max_size, size))
+        active = [wid for wid in self._workers if not self._stops[wid].is_set()]
+        for _ in range(size - len(active)):
+            wid, self._next_id = self._next_id, self._next_id + 1
+            stop, inbox = mp.Event(), mp.Queue()
+            process = mp.Process(
+                target=_worker,
+                args=(wid, self.func, inbox, self.results, stop,
+                      self.initializer, size),
+                daemon=True,
+            )
+            process.start()
+            self._workers[wid], self._stops[wid], self._inboxes[wid] = process, stop, inbox
+        # Stop idle workers first
+        active.sort(key=lambda wid: wid in self._running)
+        for wid in active[: max(0, len(active) - size)]:
+            self._stops[wid].set()
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hands queued tasks to idle workers, recording who holds which."""
+        for wid in self._workers:
+            if not self._queue:
+                return
+            if wid not in self._running and not self._stops[wid].is_set():
+                idx = self._queue.popleft()
+                self._running[wid] = idx
+                self._inboxes[wid].put((idx, self._items[idx]))
+
+    def _collect(
+        self, block: bool, timeout: float, finished: List[Tuple[Any, Optional[str]]]
+    ) -> None:
+        """Adds the results that arrived to finished, waiting up to timeout
+        seconds for the first if block is set."""
+        while True:
+            try:
+                wid, idx, error, result = self.results.get(block, timeout)
+            except queue.Empty:
+                return
+            block = False
+            self._running.pop(wid, None)
+            item = self._items.pop(idx)
+            if self.on_result is not None and result is not None:
+                self.on_result(item, result)
+            finished.append((item, error))
+
+    def _reap(self, finished: List[Tuple[Any, Optional[str]]]) -> None:
+        """Removes exited workers. A task a worker held when it exited is
+        failed if the worker crashed, or queued again if it exited before
+        taking it."""
+        exited = [wid for wid, process in self._workers.items() if not process.is_alive()]
+        if not exited:
+            return
+        # Everything an exited worker reported is in the pipe by now
+        self._collect(False, 0, finished)
+        for wid in exited:
+            process = self._workers.pop(wid)
+            process.join()
+            del self._stops[wid]
+            self._inboxes.pop(wid).close()
+            idx = self._running.pop(wid, None)
+            if idx is None:
+                continue
+            if process.exitcode != 0:
+                finished.append((self._items.pop(idx), "worker exited unexpectedly"))
+            else:
+                self._queue.appendleft(idx)
+
+    @property
+    def pending(self) -> int:
+        """The number of submitted tasks that have not finished."""
+        return len(self._items)
+
+    @property
+    def waiting(self) -> int:
+        """The number of submitted tasks no worker has started yet."""
+        return len(self._queue)
+
+    def submit(self, item: Any) -> None:
+        """Queues one task without waiting for it."""
+        idx, self._next_task = self._next_task, self._next_task + 1
+        self._items[idx] = item
+        self._queue.append(idx)
+        self._dispatch()
+
+    def poll(self, timeout: float = 0.2) -> List[Tuple[Any, Optional[str]]]:
+        """
+        Collects finished tasks, waiting up to timeout seconds for the first.
+
+        Returns:
+            An (item, error) pair per finished task; error is None on success,
+            else a traceback or message.
+        """
+        finished: List[Tuple[Any, Optional[str]]] = []
+        self._collect(True, timeout, finished)
+        self._reap(finished)
+        if self.size == 0 and self._items:
+            # Every worker died or was stopped; keep the work going
+            self.resize(self.min_size)
+        self._dispatch()
+        return finished
+
+    def run(
+        self,
+        items: Iterable[Any],
+        target: Optional[Callable[[int, int], int]] = None,
+        interval: float = 2.0,
+    ) -> List[Tuple[Any, str]]:
+        """
+        Runs func on every item and waits for all of them to finish.
+
+        Args:
+            items: The tasks.
+            target: Called every interval seconds with the current size and the
+                    number of tasks not yet started; the pool is resized to its
+                    return value.
+            interval: Seconds between target checks.
+
+        Returns:
+            An (item, error message or traceback) pair per failed task.
+        """
+        for item in items:
+            self.submit(item)
+        errors: List[Tuple[Any, str]] = []
+        next_check = time.monotonic() + interval
+        while self.pending:
+            errors.extend((item, e) for item, e in self.poll() if e)
+            if target is not None and time.monotonic() >= next_check:
+                next_check = time.monotonic() + interval
+                self.resize(target(self.size, self.waiting))
+        return errors
+
+    def close(self) -> None:
+        """Stops all workers and waits for them to exit."""
+        for stop in self._stops.values():
+            stop.set()
+        for process in self._workers.values():
+            process.join()
+        for inbox in self._inboxes.values():
+            inbox.close()
+        self._workers.clear()
+        self._stops.clear()
+        self._inboxes.clear()
+
+    def __enter__(self) -> "ElasticPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()